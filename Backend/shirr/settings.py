@@ -97,6 +97,66 @@ DATABASES = {
 
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The 'dashboard' cache holds rendered /api/sales-data/ responses keyed by data
+# generation and filter scope (one entry per distinct scope). Set DASHBOARD_CACHE_BACKEND to
+# 'django.core.cache.backends.filebased.FileBasedCache' (and
+# DASHBOARD_CACHE_LOCATION to a directory) to share it between worker processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dashboard': {
+        'BACKEND': os.getenv('DASHBOARD_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DASHBOARD_CACHE_LOCATION', 'shirr-dashboard'),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('DASHBOARD_CACHE_MAX_ENTRIES', '256')),
+        },
+    },
+}
+
+
+# Ingest
+# Number of worker processes used to hash and parse the files of a multi-file
+# upload in parallel (see shirr_data/parse_pool.py). 1 disables the pool.
+
+SHIRR_PARSE_WORKERS = int(os.getenv('SHIRR_PARSE_WORKERS', min(4, os.cpu_count() or 1)))
+
+# An ingested file is parsed completely before its database transaction starts
+# (see shirr_data/ingest.py). Its batches stay in memory up to this size and
+# are spilled to a temp file beyond it; 0 always spills.
+
+SHIRR_INGEST_SPOOL_BYTES = int(os.getenv('SHIRR_INGEST_SPOOL_BYTES', 64 * 1024 * 1024))
+
+# Parsed files analyzed through /api/analyze-session/ are cached as Parquet in
+# this directory (see shirr_data/parse_cache.py), least recently used first out
+# once it holds more than SHIRR_PARSE_CACHE_BYTES. 0 disables the cache.
+
+SHIRR_PARSE_CACHE_DIR = os.getenv('SHIRR_PARSE_CACHE_DIR', os.path.join(BASE_DIR, 'parse_cache'))
+SHIRR_PARSE_CACHE_BYTES = int(os.getenv('SHIRR_PARSE_CACHE_BYTES', 512 * 1024 * 1024))
+
+# /api/analyze-session/ parses requests up to this size straight from memory;
+# bigger ones are spilled to a temp file first.
+
+SHIRR_ANALYZE_MEMORY_BYTES = int(os.getenv('SHIRR_ANALYZE_MEMORY_BYTES', 64 * 1024 * 1024))
+
+# Where /api/sales-data/ computes its widgets: 'rollups' runs SQL on the daily
+# rollup tables; 'memory' runs pandas over a columnar copy of the transactions
+# held by each process (see shirr_data/sales_store.py).
+
+SHIRR_DASHBOARD_SOURCE = os.getenv('SHIRR_DASHBOARD_SOURCE', 'rollups')
+
+# Threads that run the CPU-bound steps of the async views (parsing uploads,
+# rendering PDFs, compressing dashboards) off the event loop, see
+# shirr_data/blocking.py. Serve the project with an ASGI server, e.g.
+# `uvicorn shirr.asgi:application`, for those views to share one process.
+
+SHIRR_BLOCKING_WORKERS = int(os.getenv('SHIRR_BLOCKING_WORKERS', min(4, os.cpu_count() or 1)))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
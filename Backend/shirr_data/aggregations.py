@@ -0,0 +1,277 @@
+# shirr_data/aggregations.py
+"""
+Dashboard widgets computed as grouped ORM queries.
+
+Every method of ``SalesAggregates`` mirrors one of the pandas
+``FrameAggregates`` methods in analytics.py (used for analyze-session) and
+returns exactly the same structure. The database does the grouping, so only
+the final (small) result sets are pulled into Python; the last formatting
+steps reuse the same pandas operations so the JSON stays identical.
+
+Queries group by the integer dimension ids (see dimensions.py). The few ids
+in each result are turned back into names afterwards; only the top-N lists,
+which break ties by name, order by the joined name in the database.
+"""
+import numpy as np
+import pandas as pd
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce, ExtractDay, TruncMonth, TruncWeek
+from django.utils.functional import cached_property
+
+from . import dimensions
+from .models import Area, DailyBillRollup, DailySalesRollup, Item, SalesTransaction
+from .widgets import widget
+
+
+def format_currency(value):
+    if value >= 1_000_000: return f"₹{(value / 1_000_000):.1f}M"
+    if value >= 1_000: return f"₹{(value / 1_000):.1f}K"
+    return f"₹{value:.0f}"
+
+
+def _round2(value):
+    # The pandas helpers round numpy floats, which uses numpy's rounding rules.
+    return round(np.float64(value), 2)
+
+
+def _area_names(ids):
+    return dimensions.names(Area, ids)
+
+
+class SalesAggregates:
+    """
+    Computes the dashboard widgets from a sales queryset and a bills queryset.
+
+    ``queryset`` needs date, area, item, customer, value and free_quantity;
+    ``bills`` needs date, area and bill_no. Both can be the raw
+    SalesTransaction table (``from_transactions``) or the daily rollups
+    (``from_rollups``), which give the same results at a fraction of the rows.
+
+    Intermediate results shared by several widgets (overall totals, weekly
+    sales) are computed once per instance.
+    """
+
+    def __init__(self, queryset, bills, record_count=Count('id')):
+        # Meta.ordering must not leak into the GROUP BY / DISTINCT queries.
+        self.queryset = queryset.order_by()
+        self.bills = bills.order_by()
+        self.record_count_expression = record_count
+
+    @classmethod
+    def from_transactions(cls, queryset=None):
+        queryset = SalesTransaction.objects.all() if queryset is None else queryset
+        return cls(queryset, queryset)
+
+    @classmethod
+    def from_rollups(cls, filters=None):
+        """
+        The rollups, narrowed to a filters.SalesFilters slice if given. Bill
+        rollups only exist per day and area, so with item, customer or
+        manufacturer filters the order counts come from the (equally
+        filtered) transactions.
+        """
+        if not filters:
+            return cls(DailySalesRollup.objects.all(), DailyBillRollup.objects.all(), record_count=Sum('order_count'))
+        bills = DailyBillRollup.objects.all() if filters.fits_bill_rollups else SalesTransaction.objects.all()
+        return cls(filters.apply(DailySalesRollup.objects.all()), filters.apply(bills), record_count=Sum('order_count'))
+
+    @cached_property
+    def totals(self):
+        totals = self.queryset.aggregate(
+            records=self.record_count_expression,
+            total_sales=Sum('value'),
+            total_free=Sum('free_quantity'),
+            products=Count('item', distinct=True),
+            stockists=Count('customer', distinct=True),
+            first_date=Min('date'),
+            last_date=Max('date'),
+        )
+        totals.update(self.bills.aggregate(orders=Count('bill_no', distinct=True)))
+        totals['records'] = totals['records'] or 0
+        return totals
+
+    @property
+    def record_count(self):
+        return self.totals['records']
+
+    @cached_property
+    def weekly_sales(self):
+        """Total value per calendar week (Mon-Sun), as a Series indexed by weekly Period."""
+        rows = list(
+            self.queryset.annotate(week=TruncWeek('date'))
+            .values('week').annotate(total=Sum('value')).order_by('week')
+        )
+        index = pd.PeriodIndex([r['week'] for r in rows], freq='W')
+        return pd.Series([r['total'] for r in rows], index=index, dtype='float64')
+
+    @property
+    def _with_area(self):
+        # pandas drops NaN keys when grouping, so rows without an area never show up.
+        return self.queryset.exclude(area__isnull=True)
+
+    @widget('kpiMetrics', needs=('totals', 'weekly_sales'))
+    def kpi_metrics(self):
+        totals = self.totals
+        if not totals['records']:
+            return {'totalSales': 0, 'totalProducts': 0, 'totalStockists': 0, 'totalOrders': 0, 'salesChangePercentage': 0}
+        kpis = {
+            # Rounded like the other money figures: SUM adds the values in no fixed order, which shows in the last digits.
+            'totalSales': _round2(totals['total_sales']), 'totalProducts': totals['products'],
+            'totalStockists': totals['stockists'], 'totalOrders': totals['orders'], 'salesChangePercentage': 0,
+        }
+        weekly_sales = self.weekly_sales
+        if len(weekly_sales) >= 2:
+            last_week_sales, prev_week_sales = weekly_sales.iloc[-1], weekly_sales.iloc[-2]
+            if prev_week_sales > 0: kpis['salesChangePercentage'] = round(((last_week_sales - prev_week_sales) / prev_week_sales) * 100, 1)
+            elif last_week_sales > 0: kpis['salesChangePercentage'] = 100.0
+        return kpis
+
+    @widget('salesReport', needs=('totals', 'weekly_sales'))
+    def sales_report_summary(self):
+        if not self.record_count: return {}
+        output_data = {}
+        latest_date = self.totals['last_date']
+
+        weekly_sales = self.weekly_sales.tail(4)
+        if not weekly_sales.empty:
+            output_data['Weekly'] = {
+                'title': format_currency(weekly_sales.sum()),
+                'labels': weekly_sales.index.map(lambda p: p.start_time.strftime('%b %d')).tolist(),
+                'data': [round(v, 2) for v in weekly_sales.values],
+                'color': '#3b82f6'
+            }
+
+        rows = list(
+            self.queryset.filter(date__year=latest_date.year, date__month=latest_date.month)
+            .annotate(day=ExtractDay('date')).values('day').annotate(total=Sum('value')).order_by('day')
+        )
+        if rows:
+            daily_sales = pd.Series([r['total'] for r in rows], index=[r['day'] for r in rows], dtype='float64')
+            output_data['Monthly'] = {
+                'title': format_currency(daily_sales.sum()),
+                'labels': daily_sales.index.tolist(),
+                'data': [round(v, 2) for v in daily_sales.values],
+                'color': '#10b981'
+            }
+
+        rows = list(
+            self.queryset.filter(date__year=latest_date.year)
+            .annotate(month=TruncMonth('date')).values('month').annotate(total=Sum('value')).order_by('month')
+        )
+        if rows:
+            monthly_sales_of_year = pd.Series([r['total'] for r in rows], index=[r['month'] for r in rows], dtype='float64')
+            output_data['Yearly'] = {
+                'title': format_currency(monthly_sales_of_year.sum()),
+                'labels': [m.strftime('%b') for m in monthly_sales_of_year.index],
+                'data': [round(v, 2) for v in monthly_sales_of_year.values],
+                'color': '#8b5cf6'
+            }
+
+        return output_data
+
+    @widget('revenueByArea', needs=('totals',))
+    def revenue_by_area(self):
+        if not self.record_count: return []
+        rows = list(self._with_area.values('area').annotate(total=Sum('value')).values_list('area', 'total'))
+        names = _area_names(area for area, _ in rows)
+        rows = sorted((names[area], total) for area, total in rows)
+        revenue = pd.Series([t for _, t in rows], index=[a for a, _ in rows], dtype='float64')
+        revenue = revenue.sort_values(ascending=False).round(2)
+        return [{'name': area, 'revenue': value} for area, value in revenue.items()]
+
+    @widget('salesTrendsByArea', needs=('totals',))
+    def sales_trends_by_area(self):
+        if not self.record_count: return {}
+        rows = list(
+            self._with_area.annotate(week=TruncWeek('date'))
+            .values('area', 'week').annotate(total=Sum('value')).order_by()
+        )
+        if not rows: return {}
+        frame = pd.DataFrame.from_records(rows)
+        frame['area'] = frame['area'].map(_area_names(frame['area'].unique()))
+        frame['week'] = pd.PeriodIndex(frame['week'], freq='W').astype(str)
+        trends = frame.groupby(['area', 'week'])['total'].sum().unstack(fill_value=0)
+        all_weeks = trends.columns.tolist()
+        return {area: {'labels': all_weeks, 'data': [round(v, 2) for v in row.values]} for area, row in trends.iterrows()}
+
+    @widget('topMedicinesByArea', needs=('totals',))
+    def top_medicines_by_area(self, top_n=10):
+        if not self.record_count: return {}
+        # One row per (area, item): bounded by the catalogue size, not by the number of sales.
+        rows = list(self._with_area.values('area', 'item').annotate(total=Sum('value')).values_list('area', 'item', 'total'))
+        if not rows: return {}
+        areas, items = _area_names({a for a, _, _ in rows}), dimensions.names(Item, {i for _, i, _ in rows})
+        rows = sorted((areas[a], items[i], t) for a, i, t in rows)
+        totals = pd.Series([t for _, _, t in rows], index=pd.MultiIndex.from_tuples([(a, i) for a, i, _ in rows], names=['area', 'item_name']), dtype='float64')
+        top_items = totals.groupby('area', group_keys=False).nlargest(top_n)
+        chart_data = {}
+        for (area, item), value in top_items.items():
+            if area not in chart_data: chart_data[area] = {'labels': [], 'data': []}
+            chart_data[area]['labels'].append(item); chart_data[area]['data'].append(round(value, 2))
+        return chart_data
+
+    @widget('growingMedicines', needs=('weekly_sales',))
+    def growing_medicines(self, top_n=10):
+        empty = {'labels': [], 'previous_week_sales': [], 'last_week_sales': []}
+        if len(self.weekly_sales) < 2:
+            return empty
+        prev_week, last_week = self.weekly_sales.index[-2], self.weekly_sales.index[-1]
+        prev_range = (prev_week.start_time.date(), prev_week.end_time.date())
+        last_range = (last_week.start_time.date(), last_week.end_time.date())
+        growing = list(
+            self.queryset.filter(date__range=(prev_range[0], last_range[1]))
+            .values('item')
+            .annotate(
+                prev=Coalesce(Sum('value', filter=Q(date__range=prev_range)), 0.0),
+                last=Coalesce(Sum('value', filter=Q(date__range=last_range)), 0.0),
+            )
+            .filter(last__gt=F('prev'))
+            .order_by('-last', 'item__name')
+            .values_list('item__name', 'prev', 'last')[:top_n]
+        )
+        return {
+            'labels': [item for item, _, _ in growing],
+            'previous_week_sales': [_round2(prev) for _, prev, _ in growing],
+            'last_week_sales': [_round2(last) for _, _, last in growing]
+        }
+
+    @widget('prescriberAnalysis', needs=('totals',))
+    def prescriber_analysis(self, top_n=15):
+        if not self.record_count: return {'labels': [], 'data': []}
+        prescribers = list(
+            self.queryset.values('customer').annotate(total=Sum('value'))
+            .order_by('-total', 'customer__name').values_list('customer__name', 'total')[:top_n]
+        )
+        return {'labels': [name for name, _ in prescribers], 'data': [_round2(v) for _, v in prescribers]}
+
+    @widget('highFreeQuantity', needs=('totals',))
+    def high_free_quantity_products(self, top_n=15):
+        if not self.record_count or not self.totals['total_free']:
+            return {'labels': [], 'data': []}
+        free_items = list(
+            self.queryset.values('item').annotate(free=Sum('free_quantity')).filter(free__gt=0)
+            .order_by('-free', 'item__name').values_list('item__name', 'free')[:top_n]
+        )
+        return {'labels': [item for item, _ in free_items], 'data': [int(v) for _, v in free_items]}
+
+    @widget('weeklyGrowthTrends', needs=('weekly_sales',))
+    def weekly_growth_trends(self):
+        weekly_sales = self.weekly_sales
+        if len(weekly_sales) < 2: return None
+        growth_rates = weekly_sales.pct_change().fillna(0) * 100
+        return {'labels': [f"Week {i+1} vs {i}" for i in range(1, len(weekly_sales.index))], 'data': [round(v, 2) for v in growth_rates.values[1:]]}
+
+    @widget('areaPerformance', needs=('totals',))
+    def area_performance_comparison(self):
+        if not self.record_count: return None
+        sales = dict(self._with_area.values('area').annotate(total=Sum('value')).values_list('area', 'total'))
+        orders = dict(
+            self.bills.exclude(area__isnull=True).values('area')
+            .annotate(orders=Count('bill_no', distinct=True)).values_list('area', 'orders')
+        )
+        names = _area_names(sales)
+        rows = sorted((names[area], sales[area], orders.get(area, 0)) for area in sales)
+        area_stats = pd.DataFrame(rows, columns=['name', 'totalSales', 'orderCount'])
+        area_stats['totalSales'] = area_stats['totalSales'].astype('float64')
+        area_stats['orderCount'] = area_stats['orderCount'].astype('int64')
+        return area_stats.round(2).to_dict('list')
@@ -0,0 +1,221 @@
+# shirr_data/analytics.py
+"""
+Dashboard widgets computed from a parsed batch, for the analyze-session endpoint.
+
+``FrameAggregates`` has the same methods as ``aggregations.SalesAggregates``,
+and they return the same structures, but it works on a typed batch (see
+schema.py) in memory. The batch is never copied. Day, week and month keys
+are derived once as integer day numbers, and text columns are grouped by
+their categorical codes. The sums over (area, item, week) and over days are
+computed once and shared: revenue, trends, top medicines, growing medicines
+and the weekly series all come from the first, and the monthly and yearly
+charts from the second.
+"""
+import numpy as np
+import pandas as pd
+from django.utils.functional import cached_property
+
+from .aggregations import format_currency
+from .widgets import widget
+
+# 1970-01-01 (day 0) was a Thursday; weeks run Monday to Sunday like Period('W').
+_EPOCH_WEEKDAY = 3
+
+
+def _weeks(days):
+    """Weekly Periods for week-start day numbers."""
+    return pd.to_datetime(np.asarray(days), unit='D').to_period('W')
+
+
+class FrameAggregates:
+    """
+    Computes the dashboard widgets from one typed batch, or from a frame of the
+    sales store (sales_store.py) together with its precomputed ``days``.
+    """
+
+    def __init__(self, df, days=None):
+        self.df = df
+        if days is not None:
+            self.days = np.asarray(days, dtype=np.int64)
+
+    @property
+    def record_count(self):
+        return len(self.df)
+
+    @cached_property
+    def days(self):
+        """Day number (days since 1970-01-01) of every row."""
+        return self.df['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+
+    @cached_property
+    def weeks(self):
+        """Day number of the Monday starting each row's week."""
+        return self.days - (self.days + _EPOCH_WEEKDAY) % 7
+
+    def codes(self, column):
+        """Categorical codes of a text column; -1 where the value is missing."""
+        return self.df[column].cat.codes.to_numpy()
+
+    def names(self, column, codes):
+        return self.df[column].cat.categories[np.asarray(codes)].tolist()
+
+    @cached_property
+    def area_item_week(self):
+        """Total value per (area code, item code, week); missing areas and items keep code -1."""
+        values = pd.Series(self.df['value'].to_numpy())
+        return values.groupby([self.codes('area'), self.codes('item_name'), self.weeks]).sum()
+
+    @cached_property
+    def _with_area(self):
+        # pandas drops NaN keys when grouping, so rows without an area never show up.
+        return self.area_item_week[self.area_item_week.index.get_level_values(0) >= 0]
+
+    @cached_property
+    def area_sales(self):
+        return self._with_area.groupby(level=0).sum()
+
+    @cached_property
+    def weekly_sales(self):
+        """Total value per calendar week (Mon-Sun), as a Series indexed by weekly Period."""
+        weekly = self.area_item_week.groupby(level=2).sum()
+        return pd.Series(weekly.to_numpy(), index=_weeks(weekly.index))
+
+    @cached_property
+    def daily_sales(self):
+        """Total value per day number."""
+        return pd.Series(self.df['value'].to_numpy()).groupby(self.days).sum()
+
+    @widget('kpiMetrics', needs=('weekly_sales',))
+    def kpi_metrics(self):
+        df = self.df
+        if df.empty: return {'totalSales': 0, 'totalProducts': 0, 'totalStockists': 0, 'totalOrders': 0, 'salesChangePercentage': 0}
+        kpis = {'totalSales': round(df['value'].sum(), 2), 'totalProducts': df['item_name'].nunique(), 'totalStockists': df['customer_name'].nunique(), 'totalOrders': df['bill_no'].nunique(), 'salesChangePercentage': 0}
+        weekly_sales = self.weekly_sales
+        if len(weekly_sales) >= 2:
+            last_week_sales, prev_week_sales = weekly_sales.iloc[-1], weekly_sales.iloc[-2]
+            if prev_week_sales > 0: kpis['salesChangePercentage'] = round(((last_week_sales - prev_week_sales) / prev_week_sales) * 100, 1)
+            elif last_week_sales > 0: kpis['salesChangePercentage'] = 100.0
+        return kpis
+
+    @widget('salesReport', needs=('weekly_sales', 'daily_sales'))
+    def sales_report_summary(self):
+        if self.df.empty: return {}
+        output_data = {}
+
+        weekly_sales = self.weekly_sales.tail(4)
+        if not weekly_sales.empty:
+            output_data['Weekly'] = {
+                'title': format_currency(weekly_sales.sum()),
+                'labels': weekly_sales.index.map(lambda p: p.start_time.strftime('%b %d')).tolist(),
+                'data': [round(v, 2) for v in weekly_sales.values],
+                'color': '#3b82f6'
+            }
+
+        daily = self.daily_sales
+        dates = daily.index.to_numpy().astype('datetime64[D]')
+        months = dates.astype('datetime64[M]')
+        latest_month = months[-1]
+
+        in_month = months == latest_month
+        if in_month.any():
+            daily_sales = pd.Series(daily.to_numpy()[in_month], index=(dates[in_month] - latest_month.astype('datetime64[D]')).astype(np.int64) + 1)
+            output_data['Monthly'] = {
+                'title': format_currency(daily_sales.sum()),
+                'labels': daily_sales.index.tolist(),
+                'data': [round(v, 2) for v in daily_sales.values],
+                'color': '#10b981'
+            }
+
+        in_year = months.astype('datetime64[Y]') == latest_month.astype('datetime64[Y]')
+        if in_year.any():
+            monthly_sales_of_year = pd.Series(daily.to_numpy()[in_year]).groupby(months[in_year].astype('datetime64[s]')).sum()
+            output_data['Yearly'] = {
+                'title': format_currency(monthly_sales_of_year.sum()),
+                'labels': monthly_sales_of_year.index.strftime('%b').tolist(),
+                'data': [round(v, 2) for v in monthly_sales_of_year.values],
+                'color': '#8b5cf6'
+            }
+
+        return output_data
+
+    @widget('revenueByArea', needs=('area_sales',))
+    def revenue_by_area(self):
+        if self.df.empty: return []
+        revenue = pd.Series(self.area_sales.to_numpy(), index=self.names('area', self.area_sales.index))
+        revenue = revenue.sort_values(ascending=False).round(2)
+        return [{'name': area, 'revenue': value} for area, value in revenue.items()]
+
+    @widget('salesTrendsByArea', needs=('_with_area',))
+    def sales_trends_by_area(self):
+        if self.df.empty: return {}
+        trends = self._with_area.groupby(level=[0, 2]).sum().unstack(fill_value=0)
+        all_weeks = _weeks(trends.columns).astype(str).tolist()
+        return {area: {'labels': all_weeks, 'data': [round(v, 2) for v in row]} for area, row in zip(self.names('area', trends.index), trends.to_numpy())}
+
+    @widget('topMedicinesByArea', needs=('_with_area',))
+    def top_medicines_by_area(self, top_n=10):
+        if self.df.empty: return {}
+        totals = self._with_area[self._with_area.index.get_level_values(1) >= 0].groupby(level=[0, 1]).sum()
+        if totals.empty: return {}
+        top_items = totals.groupby(level=0, group_keys=False).nlargest(top_n)
+        areas = self.names('area', top_items.index.get_level_values(0))
+        items = self.names('item_name', top_items.index.get_level_values(1))
+        chart_data = {}
+        for area, item, value in zip(areas, items, top_items.to_numpy()):
+            if area not in chart_data: chart_data[area] = {'labels': [], 'data': []}
+            chart_data[area]['labels'].append(item); chart_data[area]['data'].append(round(value, 2))
+        return chart_data
+
+    @widget('growingMedicines', needs=('weekly_sales', 'area_item_week'))
+    def growing_medicines(self, top_n=10):
+        empty = {'labels': [], 'previous_week_sales': [], 'last_week_sales': []}
+        if self.df.empty or len(self.weekly_sales) < 2:
+            return empty
+        with_item = self.area_item_week[self.area_item_week.index.get_level_values(1) >= 0]
+        sales = with_item.groupby(level=[1, 2]).sum().unstack(fill_value=0).sort_index(axis=1)
+        if sales.shape[1] < 2:
+            return empty
+        last_week_col, prev_week_col = sales.columns[-1], sales.columns[-2]
+        growing = sales[sales[last_week_col] > sales[prev_week_col]]
+        growing = growing.sort_values(by=last_week_col, ascending=False).head(top_n)
+        return {
+            'labels': self.names('item_name', growing.index),
+            'previous_week_sales': [round(v, 2) for v in growing[prev_week_col]],
+            'last_week_sales': [round(v, 2) for v in growing[last_week_col]]
+        }
+
+    @widget('prescriberAnalysis')
+    def prescriber_analysis(self, top_n=15):
+        if self.df.empty: return {'labels': [], 'data': []}
+        codes = self.codes('customer_name')
+        totals = pd.Series(self.df['value'].to_numpy()).groupby(codes).sum()
+        prescribers = totals[totals.index >= 0].nlargest(top_n)
+        return {'labels': self.names('customer_name', prescribers.index), 'data': [round(v, 2) for v in prescribers.values]}
+
+    @widget('highFreeQuantity')
+    def high_free_quantity_products(self, top_n=15):
+        free = self.df['free_quantity'].to_numpy().astype(np.int64)
+        if self.df.empty or free.sum() == 0:
+            return {'labels': [], 'data': []}
+        totals = pd.Series(free).groupby(self.codes('item_name')).sum()
+        free_items = totals[totals.index >= 0].nlargest(top_n)
+        free_items = free_items[free_items > 0]
+        return {'labels': self.names('item_name', free_items.index), 'data': [int(v) for v in free_items.values]}
+
+    @widget('weeklyGrowthTrends', needs=('weekly_sales',))
+    def weekly_growth_trends(self):
+        if self.df.empty or len(self.weekly_sales) < 2: return None
+        weekly_sales = self.weekly_sales
+        growth_rates = weekly_sales.pct_change().fillna(0) * 100
+        return {'labels': [f"Week {i+1} vs {i}" for i in range(1, len(weekly_sales.index))], 'data': [round(v, 2) for v in growth_rates.values[1:]]}
+
+    @widget('areaPerformance', needs=('area_sales',))
+    def area_performance_comparison(self):
+        if self.df.empty: return None
+        orders = self.df.groupby('area', observed=True)['bill_no'].nunique()
+        area_stats = pd.DataFrame({
+            'name': self.names('area', self.area_sales.index),
+            'totalSales': self.area_sales.to_numpy(),
+            'orderCount': orders.to_numpy().astype(np.int64),
+        })
+        return area_stats.round(2).to_dict('list')
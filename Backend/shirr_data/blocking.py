@@ -0,0 +1,61 @@
+# shirr_data/blocking.py
+"""
+Bounded thread pool for the CPU-bound and blocking steps of the async views.
+
+Under ASGI the upload, analyze-session, sales-data and PDF views are
+coroutines sharing one event loop. Work that would stall that loop (parsing
+a report, rendering a PDF with WeasyPrint, compressing a dashboard, reading
+a multipart body) is handed to this pool with ``await run(...)``; database
+work goes through the async ORM or ``sync_to_async`` instead, so that
+Django manages its connections. The pool size comes from
+``settings.SHIRR_BLOCKING_WORKERS``: more concurrent parses or renders than
+that wait their turn rather than compete for the CPU, while dashboard reads
+served from the cache keep flowing.
+
+``iter_in_pool`` lets synchronous code (an ingest running in
+``sync_to_async``) pull the batches of a parser generator from the pool one
+at a time, so a large report is still inserted batch by batch.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+_executor = None
+_executor_lock = threading.Lock()
+_DONE = object()
+
+
+def pool_size():
+    return max(1, int(getattr(settings, 'SHIRR_BLOCKING_WORKERS', 1)))
+
+
+def get_executor():
+    """The process-wide pool, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=pool_size(), thread_name_prefix='shirr-blocking')
+        return _executor
+
+
+async def run(func, *args, **kwargs):
+    """Runs ``func(*args, **kwargs)`` in the pool and returns its result. Must not touch the database."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def iter_in_pool(iterable):
+    """
+    Yields the items of ``iterable``, each one produced in the pool. For
+    synchronous callers; the iterable must not touch the database.
+    """
+    executor = get_executor()
+    iterator = iter(iterable)
+    while True:
+        item = executor.submit(next, iterator, _DONE).result()
+        if item is _DONE:
+            return
+        yield item
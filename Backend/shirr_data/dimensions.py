@@ -0,0 +1,109 @@
+# shirr_data/dimensions.py
+"""
+Name <-> id lookups for the Customer, Item, Area and Manufacturer dimension
+tables.
+
+Transactions and rollups store the integer id of each name. Ingest resolves
+the names of a batch with one query per dimension (the categories of the
+batch's categorical columns, not its rows). Names it has not seen before are
+looked up in the database, and inserted with ``ON CONFLICT DO NOTHING`` when
+they are new. Resolved ids are cached in-process only once the surrounding
+transaction commits, so a rolled back upload cannot leave ids in the cache
+that no longer exist.
+
+The dashboards group by id and turn the (few) resulting ids back into names
+with ``names``. Dimension rows are never deleted, so cached names stay valid.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+
+from .models import Area, Customer, Item, Manufacturer
+from .schema import MODEL_COLUMNS
+
+# Batch column -> (transaction column, dimension model).
+DIMENSIONS = {
+    'customer_name': ('customer_id', Customer),
+    'item_name': ('item_id', Item),
+    'area': ('area_id', Area),
+    'manufacturer': ('manufacturer_id', Manufacturer),
+}
+# The batch columns as stored in SalesTransaction, in MODEL_COLUMNS order.
+FACT_COLUMNS = [DIMENSIONS[col][0] if col in DIMENSIONS else col for col in MODEL_COLUMNS]
+LOOKUP_CHUNK = 500
+
+
+class DimensionCache:
+    """Name -> id and id -> name of every dimension, filled as names are resolved."""
+
+    def __init__(self):
+        self._ids = {model: {} for _, model in DIMENSIONS.values()}
+        self._names = {model: {} for _, model in DIMENSIONS.values()}
+        self._lock = threading.Lock()
+
+    def _publish(self, model, ids):
+        with self._lock:
+            self._ids[model].update(ids)
+            self._names[model].update((pk, name) for name, pk in ids.items())
+
+    def _fetch(self, model, names):
+        ids = {}
+        for start in range(0, len(names), LOOKUP_CHUNK):
+            ids.update(model.objects.filter(name__in=names[start:start + LOOKUP_CHUNK]).values_list('name', 'id'))
+        return ids
+
+    def resolve(self, model, names):
+        """Name -> id for ``names``, creating the missing dimension rows."""
+        cached = self._ids[model]
+        ids = {name: cached[name] for name in names if name in cached}
+        missing = [name for name in names if name not in ids]
+        if not missing:
+            return ids
+        found = self._fetch(model, missing)
+        new = [name for name in missing if name not in found]
+        if new:
+            # ignore_conflicts: another upload may insert the same names concurrently.
+            model.objects.bulk_create([model(name=name) for name in new], batch_size=LOOKUP_CHUNK, ignore_conflicts=True)
+            found.update(self._fetch(model, new))
+        transaction.on_commit(lambda: self._publish(model, found))
+        ids.update(found)
+        return ids
+
+    def names(self, model, ids):
+        """Id -> name for ``ids``; ids not cached yet are read from the database."""
+        ids, cached = set(ids), self._names[model]
+        missing = [pk for pk in ids if pk is not None and pk not in cached]
+        if missing:
+            found = {}
+            for start in range(0, len(missing), LOOKUP_CHUNK):
+                found.update(model.objects.filter(id__in=missing[start:start + LOOKUP_CHUNK]).values_list('name', 'id'))
+            self._publish(model, found)
+        return {pk: cached.get(pk) for pk in ids}
+
+    def fact_frame(self, batch):
+        """
+        A typed batch (see schema.py) with its name columns replaced by
+        nullable Int64 id columns, in FACT_COLUMNS order.
+        """
+        columns = {}
+        for col in MODEL_COLUMNS:
+            if col not in DIMENSIONS:
+                columns[col] = batch[col]
+                continue
+            id_column, model = DIMENSIONS[col]
+            values = batch[col].array
+            ids = self.resolve(model, values.categories.tolist())
+            lookup = np.array([ids[name] for name in values.categories] + [0], dtype=np.int64)
+            codes = values.codes
+            # Code -1 (missing) picks the trailing placeholder and is masked.
+            columns[id_column] = pd.arrays.IntegerArray(lookup[codes], codes < 0)
+        return pd.DataFrame(columns, index=batch.index)[FACT_COLUMNS]
+
+
+cache = DimensionCache()
+
+
+def names(model, ids):
+    return cache.names(model, ids)
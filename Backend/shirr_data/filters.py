@@ -0,0 +1,100 @@
+# shirr_data/filters.py
+"""
+Query-string filters for the stored-data dashboard (/api/sales-data/).
+
+``from`` and ``to`` bound the date (inclusive, YYYY-MM-DD). ``area``,
+``item``, ``customer`` and ``manufacturer`` select exact values and can be
+repeated to select several. The filters are applied in the database before
+any grouping, on columns covered by composite (column, date) indexes on the
+transaction and rollup tables. Scoped requests therefore only read the rows
+of their slice. Selected names are matched against the small dimension
+tables (see dimensions.py) and the fact tables are filtered by id.
+"""
+import datetime
+import hashlib
+from urllib.parse import urlencode
+
+import numpy as np
+
+from .models import Area, Customer, Item, Manufacturer
+
+# Query parameter -> SalesTransaction / rollup foreign key.
+VALUE_FILTERS = {'area': 'area', 'item': 'item', 'customer': 'customer', 'manufacturer': 'manufacturer'}
+# Foreign key -> (dimension model, sales store column).
+DIMENSIONS = {
+    'area': (Area, 'area'),
+    'item': (Item, 'item_name'),
+    'customer': (Customer, 'customer_name'),
+    'manufacturer': (Manufacturer, 'manufacturer'),
+}
+# Columns that DailyBillRollup also has; other filters need the transactions for order counts.
+BILL_ROLLUP_COLUMNS = {'date', 'area'}
+
+
+def _parse_date(name, value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be a date in YYYY-MM-DD format, got '{value}'.") from None
+
+
+class SalesFilters:
+    """A date range and value selections, parsed from the query string."""
+
+    def __init__(self, date_from=None, date_to=None, values=None):
+        self.date_from = date_from
+        self.date_to = date_to
+        # Foreign key -> sorted tuple of selected names; only keys with a selection.
+        self.values = {column: tuple(sorted(set(selected))) for column, selected in (values or {}).items() if selected}
+
+    @classmethod
+    def from_query(cls, query):
+        """Parses a QueryDict. Raises ValueError with a message for the client on bad input."""
+        date_from = _parse_date('from', query['from']) if query.get('from') else None
+        date_to = _parse_date('to', query['to']) if query.get('to') else None
+        if date_from and date_to and date_from > date_to:
+            raise ValueError("'from' must not be after 'to'.")
+        values = {
+            column: [value.strip() for value in query.getlist(param) if value.strip()]
+            for param, column in VALUE_FILTERS.items()
+        }
+        return cls(date_from, date_to, values)
+
+    def __bool__(self):
+        return bool(self.date_from or self.date_to or self.values)
+
+    @property
+    def fits_bill_rollups(self):
+        """True when DailyBillRollup can answer the order counts for this slice."""
+        return set(self.values) <= BILL_ROLLUP_COLUMNS
+
+    def apply(self, queryset):
+        """Narrows a SalesTransaction or rollup queryset to the slice."""
+        if self.date_from:
+            queryset = queryset.filter(date__gte=self.date_from)
+        if self.date_to:
+            queryset = queryset.filter(date__lte=self.date_to)
+        for column, selected in self.values.items():
+            model, _ = DIMENSIONS[column]
+            queryset = queryset.filter(**{f"{column}__in": model.objects.filter(name__in=selected).values('id')})
+        return queryset
+
+    def frame_mask(self, frame):
+        """Boolean mask of the sales store rows (see sales_store.py) in the slice."""
+        mask = np.ones(len(frame), dtype=bool)
+        days = frame['day'].to_numpy()
+        if self.date_from:
+            mask &= days >= (self.date_from - datetime.date(1970, 1, 1)).days
+        if self.date_to:
+            mask &= days <= (self.date_to - datetime.date(1970, 1, 1)).days
+        for column, selected in self.values.items():
+            mask &= frame[DIMENSIONS[column][1]].isin(selected).to_numpy()
+        return mask
+
+    def cache_key(self):
+        """Short stable key for the response cache and ETag; '' when nothing is filtered."""
+        if not self:
+            return ''
+        params = [('from', self.date_from.isoformat() if self.date_from else ''), ('to', self.date_to.isoformat() if self.date_to else '')]
+        params += [(column, value) for column in sorted(self.values) for value in self.values[column]]
+        return hashlib.sha1(urlencode(params).encode()).hexdigest()[:16]
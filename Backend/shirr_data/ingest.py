@@ -0,0 +1,350 @@
+# shirr_data/ingest.py
+"""
+Writes parsed sales rows to the database.
+
+On PostgreSQL each batch is streamed with ``COPY FROM STDIN`` into a
+temporary staging table and merged with a single
+``INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING``, which tells us
+exactly which rows were new. Other backends (SQLite for local development)
+filter out already stored keys first and use ``bulk_create``. Either way
+the customer, item, area and manufacturer names are first resolved to their
+dimension ids (see dimensions.py), which is what the table stores.
+
+Every inserted row records the DataFile it came from (``source_file``), so
+``delete_file_rows`` can remove exactly one file's rows with an indexed
+delete, and ``ingest_file(..., replace=True)`` reprocesses a single file.
+A row belongs to the first file that inserted it; later files that contain
+the same (bill_no, date, item) count it as already stored.
+
+Upsert mode is for re-sent reports with corrected lines. Every row carries a
+fingerprint of its content, and a stored row whose fingerprint differs from
+the incoming one with the same key is updated in place
+(``ON CONFLICT DO UPDATE ... WHERE`` the fingerprints differ on PostgreSQL)
+and moves to the new file; identical rows are left alone.
+"""
+import contextlib
+import hashlib
+import io
+import pickle
+import tempfile
+import time
+import traceback
+from dataclasses import dataclass
+
+import pandas as pd
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import dimensions, rollups, txt_parser, versioning
+from .dimensions import FACT_COLUMNS
+from .models import IngestJob, SalesTransaction
+from .schema import batch_records
+
+UNIQUE_KEY = ['bill_no', 'date', 'item_id']
+STAGING_TABLE = 'shirr_data_salestransaction_staging'
+# Columns handed back by the merge, i.e. what the rollups need.
+RETURNED_COLUMNS = ['date', 'area_id', 'item_id', 'customer_id', 'manufacturer_id', 'bill_no', 'value', 'quantity', 'free_quantity']
+# Columns written per row: the batch columns plus the lineage.
+LOAD_COLUMNS = FACT_COLUMNS + ['source_file_id']
+# The content a fingerprint covers: every batch column but the key.
+FINGERPRINT_COLUMNS = [col for col in FACT_COLUMNS if col not in UNIQUE_KEY]
+# PostgreSQL fingerprints the text form of the row itself; migration 0009 filled in the stored rows.
+FINGERPRINT_SQL = f"hashtextextended(ROW({', '.join(FINGERPRINT_COLUMNS)})::text, 0)"
+# Columns an upsert overwrites.
+UPDATED_COLUMNS = [col for col in LOAD_COLUMNS if col not in UNIQUE_KEY] + ['fingerprint']
+COPY_NULL = r'\N'
+INSERT, UPSERT = IngestJob.INSERT, IngestJob.UPSERT
+MODES = [INSERT, UPSERT]
+
+
+@dataclass
+class LoadResult:
+    inserted: int = 0
+    # Stored rows that an upsert changed; ``duplicates`` are the unchanged ones.
+    updated: int = 0
+    duplicates: int = 0
+    parsed: int = 0
+    # Rows of the file deleted before it was reprocessed.
+    deleted: int = 0
+    parse_seconds: float = 0.0
+    load_seconds: float = 0.0
+
+    def __add__(self, other):
+        return LoadResult(
+            self.inserted + other.inserted, self.updated + other.updated, self.duplicates + other.duplicates,
+            self.parsed + other.parsed, self.deleted + other.deleted, self.parse_seconds + other.parse_seconds, self.load_seconds + other.load_seconds,
+        )
+
+
+def row_fingerprint(values):
+    """
+    The fingerprint of a row's FINGERPRINT_COLUMNS values (plain Python
+    values, as the ORM reads them) as a signed 64-bit integer. Used on
+    backends other than PostgreSQL, which computes FINGERPRINT_SQL itself.
+    """
+    digest = hashlib.blake2b(repr(tuple(values)).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def _stored_versions(df, fields, chunk_size=500):
+    """(bill_no, date, item_id) -> ``fields`` of the stored rows sharing a key with ``df``."""
+    date_range = (df['date'].min().date(), df['date'].max().date())
+    bills = df['bill_no'].astype(str).unique().tolist()
+    stored = {}
+    for start in range(0, len(bills), chunk_size):
+        rows = (
+            SalesTransaction.objects.filter(date__range=date_range, bill_no__in=bills[start:start + chunk_size])
+            .order_by().values_list('bill_no', 'date', 'item_id', *fields)
+        )
+        stored.update((row[:3], row[3:]) for row in rows)
+    return stored
+
+
+def _write_with_orm(df, mode):
+    """
+    Portable path: inserts the rows whose key is not stored yet and, in
+    upsert mode, updates the stored rows whose fingerprint differs. Rows
+    repeated within ``df`` count once (the first wins). Returns the written
+    rows and the replaced versions of the updated ones.
+    """
+    df = df.drop_duplicates(subset=UNIQUE_KEY, keep='first')
+    if df.empty:
+        return df, df
+    records = batch_records(df)
+    for rec in records:
+        rec['fingerprint'] = row_fingerprint(rec[col] for col in FINGERPRINT_COLUMNS)
+    fields = ['id', 'fingerprint', *RETURNED_COLUMNS] if mode == UPSERT else []
+    stored = _stored_versions(df, fields)
+    keys = [(rec['bill_no'], rec['date'].date(), rec['item_id']) for rec in records]
+    is_new = [key not in stored for key in keys]
+    # No ignore_conflicts: a row inserted concurrently by another upload must
+    # abort this transaction rather than be counted twice in the rollups.
+    SalesTransaction.objects.bulk_create(
+        [SalesTransaction(**rec) for rec, new in zip(records, is_new) if new], batch_size=500
+    )
+    written, replaced = is_new, []
+    if mode == UPSERT:
+        changed = [not new and stored[key][1] != rec['fingerprint'] for key, rec, new in zip(keys, records, is_new)]
+        updates = [SalesTransaction(id=stored[key][0], **rec) for key, rec, change in zip(keys, records, changed) if change]
+        field_names = [SalesTransaction._meta.get_field(col).name for col in UPDATED_COLUMNS]
+        SalesTransaction.objects.bulk_update(updates, field_names, batch_size=500)
+        replaced = [stored[key][2:] for key, change in zip(keys, changed) if change]
+        written = [new or change for new, change in zip(is_new, changed)]
+    return df[written], pd.DataFrame(replaced, columns=RETURNED_COLUMNS)
+
+
+def _copy_frame(df):
+    """The batch as COPY will read it; the schema already fixed the column types."""
+    out = df[LOAD_COLUMNS].copy()
+    out['date'] = out['date'].dt.strftime('%Y-%m-%d')
+    # Keep the input order so the first occurrence of a duplicated key wins, as with bulk_create.
+    out['row_position'] = range(len(out))
+    return out
+
+
+def _copy_into_staging(cursor, frame):
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False, na_rep=COPY_NULL)
+    buffer.seek(0)
+    columns = ', '.join(frame.columns)
+    sql = f"COPY {STAGING_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+    raw_cursor = cursor.cursor
+    if hasattr(raw_cursor, 'copy_expert'):  # psycopg2
+        raw_cursor.copy_expert(sql, buffer)
+    else:  # psycopg 3
+        with raw_cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+
+
+def _write_with_copy(df, mode):
+    """
+    PostgreSQL path: COPY into a staging table and merge with ON CONFLICT.
+    Returns the written rows and, in upsert mode, the replaced versions of
+    the updated ones.
+    """
+    table = SalesTransaction._meta.db_table
+    columns = ', '.join(LOAD_COLUMNS)
+    key = ', '.join(UNIQUE_KEY)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} AS "
+            f"SELECT {columns}, 0::bigint AS row_position FROM {table} WITH NO DATA"
+        )
+        cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+        _copy_into_staging(cursor, _copy_frame(df))
+        incoming = (
+            f"SELECT DISTINCT ON ({key}) {columns}, {FINGERPRINT_SQL} AS fingerprint "
+            f"FROM {STAGING_TABLE} ORDER BY {key}, row_position"
+        )
+        replaced = []
+        on_conflict = "DO NOTHING"
+        if mode == UPSERT:
+            # Other writers wait for this transaction, so the stored versions read
+            # here are exactly the ones the upsert replaces; readers are not blocked.
+            cursor.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+            cursor.execute(
+                f"SELECT {', '.join(f'stored.{col}' for col in RETURNED_COLUMNS)} "
+                f"FROM {table} stored JOIN ({incoming}) incoming USING ({key}) "
+                f"WHERE stored.fingerprint IS DISTINCT FROM incoming.fingerprint"
+            )
+            replaced = cursor.fetchall()
+            assignments = ', '.join(f"{col} = EXCLUDED.{col}" for col in UPDATED_COLUMNS)
+            on_conflict = f"DO UPDATE SET {assignments} WHERE {table}.fingerprint IS DISTINCT FROM EXCLUDED.fingerprint"
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}, fingerprint) {incoming} "
+            f"ON CONFLICT ({key}) {on_conflict} "
+            f"RETURNING {', '.join(RETURNED_COLUMNS)}"
+        )
+        written = cursor.fetchall()
+    return pd.DataFrame(written, columns=RETURNED_COLUMNS), pd.DataFrame(replaced, columns=RETURNED_COLUMNS)
+
+
+def insert_transactions(df, source_file=None, mode=INSERT):
+    """
+    Inserts the rows of a typed batch (see schema.py) that are not in the
+    database yet, attributed to the ``source_file`` DataFile, adds them to
+    the rollups and bumps the data generation, all in one transaction.
+    With ``mode=UPSERT`` stored rows whose content differs are updated too
+    (and attributed to ``source_file``). Returns a LoadResult with the exact
+    number of inserted, updated and unchanged (``duplicates``) rows.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown ingest mode '{mode}', expected one of {', '.join(MODES)}.")
+    if df.empty:
+        return LoadResult()
+    started = time.perf_counter()
+    with transaction.atomic():
+        rollups.lock()
+        df = dimensions.cache.fact_frame(df)
+        df['source_file_id'] = pd.array([source_file.pk if source_file else None] * len(df), dtype='Int64')
+        if connection.vendor == 'postgresql':
+            written, replaced = _write_with_copy(df, mode)
+        else:
+            written, replaced = _write_with_orm(df, mode)
+        if len(replaced):
+            rollups.apply_changes(replaced, written)
+        else:
+            rollups.apply_transactions(written)
+        if len(written):
+            versioning.bump_generation(rewritten=len(replaced) > 0)
+    updated = len(replaced)
+    inserted = len(written) - updated
+    return LoadResult(inserted=inserted, updated=updated, duplicates=len(df) - inserted - updated, parsed=len(df),
+                      load_seconds=time.perf_counter() - started)
+
+
+def delete_file_rows(data_file):
+    """
+    Deletes the transactions inserted from ``data_file``, removes them from
+    the rollups and bumps the data generation, all in one transaction.
+    Returns the number of deleted rows.
+    """
+    with transaction.atomic():
+        rollups.lock()
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {SalesTransaction._meta.db_table} WHERE source_file_id = %s "
+                    f"RETURNING {', '.join(RETURNED_COLUMNS)}", [data_file.pk]
+                )
+                deleted = pd.DataFrame(cursor.fetchall(), columns=RETURNED_COLUMNS)
+        else:
+            rows = SalesTransaction.objects.filter(source_file=data_file).order_by()
+            deleted = pd.DataFrame(list(rows.values_list(*RETURNED_COLUMNS)), columns=RETURNED_COLUMNS)
+            rows.delete()
+        rollups.apply_transactions(deleted, sign=-1)
+        if len(deleted):
+            versioning.bump_generation()
+    return len(deleted)
+
+
+def _record_result(data_file, result):
+    data_file.rows_parsed, data_file.rows_inserted, data_file.duplicates = result.parsed, result.inserted, result.duplicates
+    data_file.rows_updated = result.updated
+    data_file.parse_seconds, data_file.load_seconds = result.parse_seconds, result.load_seconds
+    data_file.processed_at = timezone.now()
+    data_file.save(update_fields=[
+        'rows_parsed', 'rows_inserted', 'rows_updated', 'duplicates', 'parse_seconds', 'load_seconds', 'processed_at',
+    ])
+
+
+@contextlib.contextmanager
+def _parsed_ahead(batches, result):
+    """
+    Runs the parser over the whole file and yields an iterator over its
+    batches, read back from a temp file that stays in memory up to
+    settings.SHIRR_INGEST_SPOOL_BYTES. The parse time is added to
+    ``result.parse_seconds``.
+    """
+    batches = iter(batches)
+    with tempfile.SpooledTemporaryFile(max_size=max(settings.SHIRR_INGEST_SPOOL_BYTES, 1)) as spool:
+        count = 0
+        while True:
+            # The parsers are generators, so the time spent in next() is the parse time.
+            started = time.perf_counter()
+            batch = next(batches, None)
+            result.parse_seconds += time.perf_counter() - started
+            if batch is None:
+                break
+            pickle.dump(batch, spool, protocol=pickle.HIGHEST_PROTOCOL)
+            count += 1
+        spool.seek(0)
+        yield (pickle.load(spool) for _ in range(count))
+
+
+def ingest_file(file_path, batches=None, data_file=None, replace=False, parse_seconds=0.0, mode=INSERT):
+    """
+    Parses ``file_path`` (unless already parsed ``batches`` are given) and
+    inserts it batch by batch in ``mode`` (see insert_transactions),
+    attributing the rows to ``data_file``. With ``replace`` the rows
+    previously inserted from ``data_file`` are deleted first.
+
+    One transaction keeps a failed file all-or-nothing. The file is parsed
+    before it starts: the first write takes rollups.lock, which other
+    writers then wait on until the transaction ends. Returns the summed
+    LoadResult, which is also recorded on ``data_file``. ``parse_seconds``
+    is the time already spent parsing ``batches``.
+    """
+    if batches is None:
+        batches = txt_parser.iter_sales_file(file_path)
+    result = LoadResult(parse_seconds=parse_seconds)
+    with _parsed_ahead(batches, result) as batches, transaction.atomic():
+        if replace and data_file is not None:
+            result.deleted = delete_file_rows(data_file)
+        for batch in batches:
+            result += insert_transactions(batch, data_file, mode)
+        if data_file is not None:
+            _record_result(data_file, result)
+    return result
+
+
+def claim_next_job():
+    """Marks the oldest queued job as running and returns it, or None when the queue is empty."""
+    with transaction.atomic():
+        job = (
+            IngestJob.objects.select_for_update(skip_locked=True)
+            .filter(status=IngestJob.QUEUED).order_by('created_at').first()
+        )
+        if job is None:
+            return None
+        job.status = IngestJob.RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at'])
+    return job
+
+
+def run_job(job):
+    """Ingests (or reprocesses) the job's file and records the outcome on the job."""
+    try:
+        result = ingest_file(job.data_file.file.path, data_file=job.data_file, replace=True, mode=job.mode)
+        job.status = IngestJob.SUCCEEDED
+        job.rows_parsed, job.rows_inserted, job.duplicates = result.parsed, result.inserted, result.duplicates
+        job.rows_updated = result.updated
+    except Exception as e:
+        traceback.print_exc()
+        job.status = IngestJob.FAILED
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'rows_parsed', 'rows_inserted', 'rows_updated', 'duplicates', 'error', 'finished_at'])
+    return job
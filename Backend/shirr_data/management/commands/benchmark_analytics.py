@@ -0,0 +1,247 @@
+import json
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.http import JsonResponse
+
+from shirr_data import schema, txt_parser
+from shirr_data.aggregations import format_currency
+from shirr_data.analytics import FrameAggregates
+from shirr_data.views import _dashboard_data
+
+# The previous per-widget pandas helpers (each copying the frame and deriving
+# its own weekly periods), kept as the parity and performance reference.
+
+
+def _get_kpi_metrics(df):
+    if df.empty: return {'totalSales': 0, 'totalProducts': 0, 'totalStockists': 0, 'totalOrders': 0, 'salesChangePercentage': 0}
+    kpis = {'totalSales': df['value'].sum(), 'totalProducts': df['item_name'].nunique(), 'totalStockists': df['customer_name'].nunique(), 'totalOrders': df['bill_no'].nunique(), 'salesChangePercentage': 0}
+    df_copy = df.copy()
+    df_copy['week'] = df_copy['date'].dt.to_period('W')
+    weekly_sales = df_copy.groupby('week')['value'].sum().sort_index()
+    if len(weekly_sales) >= 2:
+        last_week_sales, prev_week_sales = weekly_sales.iloc[-1], weekly_sales.iloc[-2]
+        if prev_week_sales > 0: kpis['salesChangePercentage'] = round(((last_week_sales - prev_week_sales) / prev_week_sales) * 100, 1)
+        elif last_week_sales > 0: kpis['salesChangePercentage'] = 100.0
+    return kpis
+
+def _get_sales_report_summary(df):
+    if df.empty: return {}
+    output_data = {}
+    latest_date = df['date'].max()
+    
+    # --- WEEKLY --- (This was already correct)
+    df_copy = df.copy()
+    df_copy['week'] = df_copy['date'].dt.to_period('W')
+    weekly_sales = df_copy.groupby('week')['value'].sum().sort_index().tail(4)
+    if not weekly_sales.empty:
+        output_data['Weekly'] = {
+            'title': format_currency(weekly_sales.sum()), 
+            'labels': weekly_sales.index.map(lambda p: p.start_time.strftime('%b %d')).tolist(), 
+            'data': [round(v, 2) for v in weekly_sales.values], 
+            'color': '#3b82f6'
+        }
+
+    # --- MONTHLY ---
+    monthly_df = df[(df['date'].dt.year == latest_date.year) & (df['date'].dt.month == latest_date.month)]
+    if not monthly_df.empty:
+        # --- THIS IS THE FIX ---
+        # Group by the date column of the CORRECT dataframe (`monthly_df`)
+        daily_sales = monthly_df.groupby(monthly_df['date'].dt.day)['value'].sum().sort_index()
+        output_data['Monthly'] = {
+            'title': format_currency(daily_sales.sum()), 
+            'labels': daily_sales.index.tolist(), 
+            'data': [round(v, 2) for v in daily_sales.values], 
+            'color': '#10b981'
+        }
+
+    # --- YEARLY ---
+    yearly_df = df[df['date'].dt.year == latest_date.year]
+    if not yearly_df.empty:
+        # --- THIS IS THE FIX ---
+        # Group by the date column of the CORRECT dataframe (`yearly_df`)
+        monthly_sales_of_year = yearly_df.groupby(yearly_df['date'].dt.to_period('M'))['value'].sum().sort_index()
+        output_data['Yearly'] = {
+            'title': format_currency(monthly_sales_of_year.sum()), 
+            'labels': monthly_sales_of_year.index.map(lambda p: p.strftime('%b')).tolist(), 
+            'data': [round(v, 2) for v in monthly_sales_of_year.values], 
+            'color': '#8b5cf6'
+        }
+        
+    return output_data
+
+def _get_revenue_by_area(df):
+    if df.empty or 'area' not in df.columns: return []
+    revenue = df.groupby('area', observed=True)['value'].sum().sort_values(ascending=False).round(2)
+    return [{'name': area, 'revenue': value} for area, value in revenue.items()]
+
+def _get_sales_trends_by_area(df):
+    if df.empty or 'area' not in df.columns: return {}
+    df_copy = df.copy()
+    df_copy['week'] = df_copy['date'].dt.to_period('W').astype(str)
+    trends = df_copy.groupby(['area', 'week'], observed=True)['value'].sum().unstack(fill_value=0)
+    all_weeks = trends.columns.tolist()
+    return { area: {'labels': all_weeks, 'data': [round(v, 2) for v in row.values]} for area, row in trends.iterrows() }
+
+def _get_top_medicines_by_area(df, top_n=10):
+    if df.empty: return {}
+    chart_data = {}
+    top_items = df.groupby(['area', 'item_name'], observed=True)['value'].sum().groupby('area', group_keys=False, observed=True).nlargest(top_n)
+    for (area, item), value in top_items.items():
+        if area not in chart_data: chart_data[area] = {'labels': [], 'data': []}
+        chart_data[area]['labels'].append(item); chart_data[area]['data'].append(round(value, 2))
+    return chart_data
+
+def _get_growing_medicines(df):
+    """
+    For both dashboards: shows products with WoW growth.
+    This version uses the correct, consistent key names.
+    """
+    if df.empty or df['date'].dt.to_period('W').nunique() < 2:
+        return {'labels': [], 'previous_week_sales': [], 'last_week_sales': []}
+    
+    # Group by item and WEEKLY period
+    sales = df.groupby(['item_name', df['date'].dt.to_period('W')], observed=True)['value'].sum().unstack(fill_value=0).sort_index(axis=1)
+    
+    if sales.shape[1] < 2:
+        return {'labels': [], 'previous_week_sales': [], 'last_week_sales': []}
+    
+    last_week_col, prev_week_col = sales.columns[-1], sales.columns[-2]
+    growing = sales[sales[last_week_col] > sales[prev_week_col]].copy()
+    growing.sort_values(by=last_week_col, ascending=False, inplace=True)
+    growing = growing.head(10)
+    
+    # CORRECT: Returns keys with "week"
+    return {
+        'labels': growing.index.tolist(),
+        'previous_week_sales': [round(v, 2) for v in growing[prev_week_col]],
+        'last_week_sales': [round(v, 2) for v in growing[last_week_col]]
+    }
+
+def _get_prescriber_analysis(df, top_n=15):
+    if df.empty or 'customer_name' not in df.columns: return {'labels': [], 'data': []}
+    prescribers = df.groupby('customer_name', observed=True)['value'].sum().nlargest(top_n)
+    return {'labels': prescribers.index.tolist(), 'data': [round(v, 2) for v in prescribers.values]}
+
+def _get_high_free_quantity_products(df, top_n=15):
+    if df.empty or 'free_quantity' not in df.columns or df['free_quantity'].sum() == 0:
+        return {'labels': [], 'data': []}
+    free_items = df.groupby('item_name', observed=True)['free_quantity'].sum().nlargest(top_n)
+    free_items = free_items[free_items > 0]
+    return {'labels': free_items.index.tolist(), 'data': [int(v) for v in free_items.values]}
+
+def _get_weekly_growth_trends(df):
+    if df.empty or df['date'].dt.to_period('W').nunique() < 2: return None
+    df_copy = df.copy()
+    df_copy['week'] = df_copy['date'].dt.to_period('W')
+    weekly_sales = df_copy.groupby('week')['value'].sum().sort_index()
+    if len(weekly_sales) < 2: return None
+    growth_rates = weekly_sales.pct_change().fillna(0) * 100
+    return {'labels': [f"Week {i+1} vs {i}" for i in range(1, len(weekly_sales.index))], 'data': [round(v, 2) for v in growth_rates.values[1:]]}
+
+def _get_area_performance_comparison(df):
+    if df.empty or 'area' not in df.columns: return None
+    area_stats = df.groupby('area', observed=True).agg(totalSales=('value', 'sum'), orderCount=('bill_no', 'nunique')).round(2).reset_index()
+    area_stats.rename(columns={'area': 'name'}, inplace=True)
+    return area_stats.to_dict('list')
+
+
+def reference_widgets(df):
+    return {
+        'totalRecords': len(df),
+        'kpiMetrics': _get_kpi_metrics(df),
+        'salesReport': _get_sales_report_summary(df),
+        'revenueByArea': _get_revenue_by_area(df),
+        'salesTrendsByArea': _get_sales_trends_by_area(df),
+        'topMedicinesByArea': _get_top_medicines_by_area(df),
+        'growingMedicines': _get_growing_medicines(df),
+        'prescriberAnalysis': _get_prescriber_analysis(df),
+        'highFreeQuantity': _get_high_free_quantity_products(df),
+        'weeklyGrowthTrends': _get_weekly_growth_trends(df),
+        'areaPerformance': _get_area_performance_comparison(df),
+    }
+
+
+def chronological(trends):
+    """
+    Trend points sorted by week. The helpers list an area's weeks in the order
+    the categorical groupby first meets them; the engine, like SalesAggregates,
+    sorts them, so only the order may differ.
+    """
+    return {area: sorted(zip(trend['labels'], trend['data'])) for area, trend in trends.items()}
+
+
+def comparable(data):
+    """
+    JSON dashboard data without the differences the engines may have from the
+    helpers: the order of trend points (see chronological) and the last digits
+    of totalSales, which the engines round to cents.
+    """
+    kpis = data['kpiMetrics']
+    return {**data, 'salesTrendsByArea': chronological(data['salesTrendsByArea']),
+            'kpiMetrics': {**kpis, 'totalSales': round(np.float64(kpis['totalSales']), 2)}}
+
+
+def synthetic_batch(rows, seed=7):
+    """A batch spread over two years, 12 areas and 400 items, with some missing areas and customers."""
+    rng = np.random.default_rng(seed)
+    def text(prefix, count, missing=0.0):
+        values = np.array([f"{prefix} {i}" for i in range(count)], dtype=object)[rng.integers(0, count, rows)]
+        values[rng.random(rows) < missing] = None
+        return values
+    raw = pd.DataFrame({
+        'CustomerName': text('MEDICALS', 3000, 0.01), 'ItemName': text('ITEM', 400), 'BillNo': text('B', rows // 4),
+        'Region': text('AREA', 12, 0.02),
+        'Date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 730, rows), unit='D'),
+        'Quantity': rng.integers(1, 50, rows), 'FREE': rng.integers(0, 3, rows),
+        'PTR': rng.uniform(5, 300, rows).round(2), 'Value': rng.uniform(5, 5000, rows).round(2),
+    })
+    return schema.to_batch(raw)
+
+
+class Command(BaseCommand):
+    help = "Checks the shared-groupby analytics engine against the per-widget pandas helpers and compares time and peak memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help="Report files, analyzed together. Without files a synthetic batch is used.")
+        parser.add_argument('--rows', type=int, default=1_000_000, help="Rows in the synthetic batch.")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per implementation; the fastest one is reported.")
+
+    def measure(self, build, df, repeat):
+        """JSON output, fastest wall time and peak traced allocation of ``build(df)``."""
+        best = None
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            data = build(df)
+            seconds = time.perf_counter() - started
+            best = seconds if best is None else min(best, seconds)
+        tracemalloc.start()
+        build(df)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return json.loads(JsonResponse(data).content), best, peak
+
+    def handle(self, *args, **options):
+        if options['files']:
+            label = ', '.join(options['files'])
+            df = schema.concat_batches([txt_parser.parse_sales_file(path) for path in options['files']])
+        else:
+            label = f"synthetic ({options['rows']} rows)"
+            df = synthetic_batch(options['rows'])
+        if df.empty:
+            raise CommandError("No records to analyze.")
+
+        expected, reference_seconds, reference_peak = self.measure(reference_widgets, df, options['repeat'])
+        actual, engine_seconds, engine_peak = self.measure(lambda df: _dashboard_data(FrameAggregates(df)), df, options['repeat'])
+        expected, actual = comparable(expected), comparable(actual)
+        differing = [key for key in expected if expected[key] != actual.get(key)]
+        if differing:
+            raise CommandError(f"{label}: analytics engine output differs from the per-widget helpers in {', '.join(differing)}.")
+
+        self.stdout.write(f"{label}: {len(df)} records, identical output")
+        self.stdout.write(f"  per-widget helpers: {reference_seconds:8.3f}s  peak {reference_peak / 1e6:8.1f} MB")
+        self.stdout.write(f"  shared engine:      {engine_seconds:8.3f}s  peak {engine_peak / 1e6:8.1f} MB")
+        self.stdout.write(self.style.SUCCESS(f"  speedup: {reference_seconds / engine_seconds:.1f}x, peak memory {reference_peak / engine_peak:.1f}x lower"))
@@ -0,0 +1,177 @@
+import http.client
+import json
+import os
+import statistics
+import threading
+import time
+import urllib.parse
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def multipart_body(path, trailer=b''):
+    """The (body, content type) of an upload of ``path``, with ``trailer`` appended to the file."""
+    boundary = uuid.uuid4().hex
+    with open(path, 'rb') as f:
+        content = f.read()
+    head = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{os.path.basename(path)}\"\r\n"
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode()
+    return head + content + trailer + f"\r\n--{boundary}--\r\n".encode(), f"multipart/form-data; boundary={boundary}"
+
+
+def unique_upload(path):
+    """
+    A POST to /api/upload/ of the TXT report ``path`` that is never a
+    duplicate file: a line the parser skips makes every copy hash differently.
+    Its rows are stored after the first copy, so each post parses the file
+    and merges every row.
+    """
+    def request():
+        body, content_type = multipart_body(path, f"\nbenchmark {uuid.uuid4().hex}\n".encode())
+        return 'POST', '/api/upload/', body, {'Content-Type': content_type}
+    return request
+
+
+class Client(threading.Thread):
+    """Sends one request after another over a keep-alive connection until ``stop`` is set."""
+
+    def __init__(self, url, requests, stop):
+        super().__init__(daemon=True)
+        self.url, self.requests, self.stop = url, requests, stop
+        self.latencies, self.errors = [], 0
+
+    def connect(self):
+        return http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=300)
+
+    def run(self):
+        connection = self.connect()
+        turn = 0
+        while not self.stop.is_set():
+            request = self.requests[turn % len(self.requests)]
+            turn += 1
+            method, path, body, headers = request() if callable(request) else request
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                ok = False
+                connection.close()
+                connection = self.connect()
+            if self.stop.is_set():
+                # Cut off by the end of the run, not a complete request.
+                break
+            if ok:
+                self.latencies.append(time.perf_counter() - started)
+            else:
+                self.errors += 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures dashboard reads against a running server, alone and while other clients analyze uploads, "
+        "store uploads or render PDF reports (one phase each), e.g. to compare `uvicorn shirr.asgi:application` "
+        "with `gunicorn shirr.wsgi`. Start the server with SHIRR_PARSE_CACHE_BYTES=0 so every "
+        "analyze-session upload is parsed. Files stored by the upload phase are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help="Report files posted to /api/analyze-session/ while the dashboard is read.")
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Base URL of the server.")
+        parser.add_argument('--readers', type=int, default=16, help="Concurrent /api/sales-data/ clients.")
+        parser.add_argument('--uploaders', type=int, default=2, help="Concurrent /api/analyze-session/ clients.")
+        parser.add_argument('--ingest-file', action='append', default=[],
+                            help="TXT report posted to /api/upload/ while the dashboard is read; repeat for several.")
+        parser.add_argument('--ingesters', type=int, default=2, help="Concurrent /api/upload/ clients.")
+        parser.add_argument('--pdf-clients', type=int, default=0, help="Concurrent /api/generate-report-pdf/ clients.")
+        parser.add_argument('--query', default='', help="Query string of the dashboard reads, e.g. 'widgets=kpiMetrics'.")
+        parser.add_argument('--seconds', type=float, default=10.0, help="Duration of each phase.")
+
+    def run_phase(self, url, groups, seconds):
+        stop = threading.Event()
+        clients = {name: [Client(url, requests, stop) for _ in range(count)] for name, requests, count in groups}
+        for group in clients.values():
+            for client in group:
+                client.start()
+        time.sleep(seconds)
+        stop.set()
+        for group in clients.values():
+            for client in group:
+                client.join()
+        return clients
+
+    def report(self, label, clients, seconds):
+        self.stdout.write(label)
+        for name, group in clients.items():
+            latencies = sorted(latency for client in group for latency in client.latencies)
+            errors = sum(client.errors for client in group)
+            if not latencies:
+                self.stdout.write(f"  {name:10s} no complete requests, {errors} errors")
+                continue
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            self.stdout.write(
+                f"  {name:10s} {len(latencies):6d} requests {len(latencies) / seconds:8.1f}/s   "
+                f"p50 {statistics.median(latencies) * 1000:8.1f} ms  p95 {p95 * 1000:8.1f} ms  "
+                f"max {latencies[-1] * 1000:8.1f} ms  {errors} errors"
+            )
+
+    def get_json(self, connection, path):
+        connection.request('GET', path)
+        return json.loads(connection.getresponse().read())
+
+    def handle(self, *args, **options):
+        url = urllib.parse.urlsplit(options['url'])
+        seconds = options['seconds']
+        dashboard_path = '/api/sales-data/' + (f"?{options['query']}" if options['query'] else '')
+        reads = [('GET', dashboard_path, None, {})]
+        for path in options['ingest_file']:
+            if os.path.splitext(path)[1].lower() != '.txt':
+                raise CommandError(f"{path}: only TXT reports can be posted to /api/upload/ repeatedly.")
+        try:
+            connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=300)
+            connection.request('GET', dashboard_path)
+            response = connection.getresponse()
+            dashboard = response.read()
+        except OSError as e:
+            raise CommandError(f"Cannot reach {options['url']}: {e}")
+        if response.status != 200:
+            raise CommandError(f"{dashboard_path} answered {response.status}.")
+
+        background = []
+        if options['files'] and options['uploaders'] > 0:
+            uploads = []
+            for path in options['files']:
+                body, content_type = multipart_body(path)
+                uploads.append(('POST', '/api/analyze-session/', body, {'Content-Type': content_type}))
+            background.append(('analyze', uploads, options['uploaders']))
+        if options['ingest_file'] and options['ingesters'] > 0:
+            background.append(('upload', [unique_upload(path) for path in options['ingest_file']], options['ingesters']))
+        if options['pdf_clients'] > 0:
+            # The report of the full dashboard, as the frontend sends it.
+            full = json.loads(dashboard) if not options['query'] else self.get_json(connection, '/api/sales-data/')
+            pdf = [('POST', '/api/generate-report-pdf/', json.dumps(full).encode(), {'Content-Type': 'application/json'})]
+            background.append(('pdf', pdf, options['pdf_clients']))
+        known_files = {f['id'] for f in self.get_json(connection, '/api/files/')['files']}
+        connection.close()
+
+        self.stdout.write(f"{options['url']}: {options['readers']} dashboard readers, {seconds:.0f} s per phase")
+        reads_only = self.run_phase(url, [('dashboard', reads, options['readers'])], seconds)
+        self.report("Dashboard reads only:", reads_only, seconds)
+        for name, requests, count in background:
+            mixed = self.run_phase(url, [('dashboard', reads, options['readers']), (name, requests, count)], seconds)
+            self.report(f"Dashboard reads with {count} {name} clients:", mixed, seconds)
+
+        if options['ingest_file']:
+            # Deleting a file also deletes the rows it inserted.
+            connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=300)
+            new_files = [f['id'] for f in self.get_json(connection, '/api/files/')['files'] if f['id'] not in known_files]
+            for file_id in new_files:
+                connection.request('DELETE', f'/api/files/{file_id}/')
+                connection.getresponse().read()
+            connection.close()
+            self.stdout.write(f"Deleted the {len(new_files)} files stored by the upload phase.")
@@ -0,0 +1,113 @@
+import contextlib
+import datetime
+import io
+import os
+import random
+import re
+import tempfile
+import time
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from shirr_data import txt_parser
+
+
+def rowwise_format1(df_raw):
+    """The previous iterrows() implementation of the format 1 parser, kept as the parity reference."""
+    expected_identifiers = ["bill no", "product name"]
+    header_row_index = -1
+    header_row_values = []
+    for i, row in df_raw.iterrows():
+        if not row.isnull().all():
+            row_values = [str(v).lower().strip() for v in row.values if pd.notna(v)]
+            if all(identifier in row_values for identifier in expected_identifiers):
+                header_row_index, header_row_values = i, row.values
+                break
+    if header_row_index == -1: return None
+    header_map = {str(h).strip().lower().replace(' ', '').replace('.', ''): idx for idx, h in enumerate(header_row_values) if pd.notna(h)}
+    try:
+        bill_no_idx, date_idx, item_name_idx = header_map['billno'], header_map['date'], header_map['productname']
+        ptr_idx, qty_idx, value_idx = header_map['selrate'], header_map['qty'], header_map['amount']
+        free_qty_idx = header_map.get('freeqty')
+    except KeyError as e: print(f"Critical Error: Missing essential column in Excel header - {e}. Cannot parse file."); return None
+    initial_data, current_customer, current_manufacturer = [], "Unknown", "Unknown"
+    for i, row in df_raw.iloc[header_row_index + 1:].iterrows():
+        if row.isnull().all(): continue
+        first_cell, product_cell = str(row.iloc[0]).strip(), str(row.iloc[item_name_idx]).strip() if pd.notna(row.iloc[item_name_idx]) else ""
+        if product_cell.startswith("Company -"): current_manufacturer = product_cell.replace("Company -", "").strip()
+        elif first_cell.lower() == 'sub total': continue
+        elif re.match(r'^\d+(\.\d+)?$', first_cell):
+            try:
+                free_qty = int(float(row.iloc[free_qty_idx])) if free_qty_idx is not None and pd.notna(row.iloc[free_qty_idx]) and str(row.iloc[free_qty_idx]).strip() else 0
+                initial_data.append({
+                    "CustomerName": current_customer, "Manufacturer": current_manufacturer, "BillNo": str(row.iloc[bill_no_idx]).strip(),
+                    "Date": pd.to_datetime(row.iloc[date_idx]), "ItemName": str(row.iloc[item_name_idx]).strip(), "PTR": float(row.iloc[ptr_idx]),
+                    "Quantity": int(float(row.iloc[qty_idx])), "FREE": free_qty, "Value": float(row.iloc[value_idx]), "Region": "Trivandrum"
+                })
+            except (ValueError, IndexError, TypeError) as e: print(f"Skipping malformed Excel row {i+1}: {e}")
+        else:
+            non_empty_cells = [str(c).strip() for c in row if pd.notna(c) and str(c).strip() != '']
+            if non_empty_cells: current_customer = ' '.join(non_empty_cells).replace('-', '').strip()
+    if not initial_data: return None
+    df_extracted = pd.DataFrame(initial_data)
+    agg_keys = ['CustomerName', 'BillNo', 'Date', 'ItemName', 'PTR', 'Region', 'Manufacturer']
+    df_aggregated = df_extracted.groupby(agg_keys).agg({'Quantity': 'sum', 'FREE': 'sum', 'Value': 'sum'}).reset_index()
+    df_aggregated['Date'] = df_aggregated['Date'].dt.strftime('%d-%m-%Y')
+    return df_aggregated.to_dict('records')
+
+
+def synthetic_sheet(rows, seed=7):
+    """A format 1 export with ``rows`` item rows, including a few malformed ones."""
+    rng = random.Random(seed)
+    items = ['CONGO Tab', 'PRO BA Caps', 'CONLOSS Solution', 'CITRAPLUS  Liq', 'LESSI TAB', 'INDOBEST-25 CAPS.']
+    grid = [['SHIRR DISTRIBUTORS'] + [None] * 7, [None] * 8,
+            ['Sl No', 'Bill No', 'Date', 'Product Name', 'Sel Rate', 'Qty', 'Free Qty', 'Amount']]
+    sl = 1
+    while sl <= rows:
+        grid.append([f'MEDICALS {rng.randint(0, 400)}, KOCHI -'] + [None] * 7)
+        grid.append([None, None, None, f'Company - {rng.choice(["SHIRR", "ACME", "ZEN"])} PHARMA', None, None, None, None])
+        for _ in range(rng.randint(3, 30)):
+            qty = rng.randint(1, 5) if rng.random() > 0.001 else 'n/a'
+            grid.append([sl, f'INV{rng.randint(1, 5000)}', datetime.datetime(2025, rng.randint(1, 12), rng.randint(1, 28)),
+                         rng.choice(items), 25.5, qty, rng.choice([0, 1, None]), round(rng.uniform(10, 300), 2)])
+            sl += 1
+        grid.append(['Sub Total'] + [None] * 6 + [999.0])
+    return pd.DataFrame(grid)
+
+
+class Command(BaseCommand):
+    help = "Checks the column-wise Excel format 1 parser against the row-wise one and times both."
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help="Format 1 workbooks. Without files a synthetic sheet is used.")
+        parser.add_argument('--rows', type=int, default=20000, help="Item rows in the synthetic sheet.")
+
+    def handle(self, *args, **options):
+        sheets = []
+        if options['files']:
+            sheets = [(path, txt_parser.read_excel_sheet(path)) for path in options['files']]
+        else:
+            # Round-trip through a workbook so cell types are the ones read_excel produces.
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'format1.xlsx')
+                synthetic_sheet(options['rows']).to_excel(path, header=False, index=False)
+                sheets.append((f"synthetic ({options['rows']} rows)", txt_parser.read_excel_sheet(path)))
+
+        for label, df_raw in sheets:
+            expected_log, actual_log = io.StringIO(), io.StringIO()
+            with contextlib.redirect_stdout(expected_log):
+                started = time.perf_counter()
+                expected = rowwise_format1(df_raw)
+                rowwise_seconds = time.perf_counter() - started
+            with contextlib.redirect_stdout(actual_log):
+                started = time.perf_counter()
+                actual = txt_parser.parse_excel_sales_report_format1(None, df_raw)
+                columnar_seconds = time.perf_counter() - started
+
+            if expected != actual or expected_log.getvalue() != actual_log.getvalue():
+                raise CommandError(f"{label}: column-wise parser output differs from the row-wise parser.")
+            self.stdout.write(f"{label}: {len(expected or [])} records, identical output")
+            self.stdout.write(f"  row-wise:    {rowwise_seconds:8.3f}s")
+            self.stdout.write(f"  column-wise: {columnar_seconds:8.3f}s")
+            self.stdout.write(self.style.SUCCESS(f"  speedup: {rowwise_seconds / columnar_seconds:.1f}x"))
@@ -0,0 +1,50 @@
+import contextlib
+import io
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shirr_data import parse_pool
+
+
+class Command(BaseCommand):
+    help = "Times parsing a batch of report files (spilled batch by batch, as for uploads) serially and in the upload process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help="Report files to parse (TXT, PDF, CSV, XLS/XLSX).")
+        parser.add_argument('--workers', type=int, default=None, help="Pool size (defaults to SHIRR_PARSE_WORKERS).")
+        parser.add_argument('--copies', type=int, default=1, help="Parse every file this many times, to simulate bigger batches.")
+
+    def handle(self, *args, **options):
+        paths = options['files'] * options['copies']
+        workers = options['workers'] or parse_pool.pool_size()
+        if workers < 2:
+            raise CommandError("Need at least 2 workers to compare against serial parsing.")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            serial = [parse_pool.parse_file(path) for path in paths]
+            serial_seconds = time.perf_counter() - started
+
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                # Start the workers first so process startup is not billed to parsing.
+                list(executor.map(abs, range(workers)))
+                started = time.perf_counter()
+                pooled = list(executor.map(parse_pool.parse_file, paths))
+                pooled_seconds = time.perf_counter() - started
+
+        for result in serial + pooled:
+            result.discard()
+        records = sum(result.record_count for result in serial)
+        if records != sum(result.record_count for result in pooled):
+            raise CommandError("Serial and pooled parsing produced different record counts.")
+        failed = [path for path, result in zip(paths, serial) if result.error]
+        for path in failed:
+            self.stderr.write(f"Could not parse {path}.")
+
+        self.stdout.write(f"{len(paths)} file(s), {records} records, {workers} workers")
+        self.stdout.write(f"  serial: {serial_seconds:8.2f}s")
+        self.stdout.write(f"  pooled: {pooled_seconds:8.2f}s")
+        self.stdout.write(self.style.SUCCESS(f"  speedup: {serial_seconds / pooled_seconds:.2f}x"))
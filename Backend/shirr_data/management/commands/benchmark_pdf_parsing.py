@@ -0,0 +1,129 @@
+import contextlib
+import io
+import os
+import random
+import re
+import tempfile
+import time
+
+import fitz
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from shirr_data import parse_pool, txt_parser
+
+
+def scanning_records(raw_text):
+    """The previous PDF record loop (forward scans for the bill and manufacturer lines), kept as the parity reference."""
+    distributor, manufacturer, records = txt_parser.PDF_DISTRIBUTOR, txt_parser.PDF_MANUFACTURER, []
+    current_customer, current_area = "Unknown", "Unknown"
+    lines = [line.strip() for line in raw_text.strip().split('\n') if line.strip()]
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line == "Customer" and i > 0: current_customer = lines[i-1]; i += 1; continue
+        if line == "Area" and i > 0: current_area = lines[i-1]; i += 1; continue
+        if line == "Cus. Total": i += 2; continue
+        is_start_of_record = (i + 1 < len(lines)) and re.match(r"^\d{2}/\d{2}/\d{2}$", lines[i+1]) and "Customer" not in lines[i] and "Area" not in lines[i]
+        if is_start_of_record:
+            try:
+                ItemName, date, pack_size = lines[i], lines[i+1], lines[i+2]
+                num_block_end_idx = i + 3
+                while num_block_end_idx < len(lines) and not lines[num_block_end_idx].startswith("P25"): num_block_end_idx += 1
+                if num_block_end_idx >= len(lines): i += 1; continue
+                bill_no = lines[num_block_end_idx]
+                number_lines = [n.replace(',', '') for n in lines[i+3:num_block_end_idx]]
+                qty, free_qty, value, rate = 0.0, 0.0, 0.0, 0.0
+                if len(number_lines) == 4: qty, free_qty, value, rate = map(float, number_lines)
+                elif len(number_lines) == 3: qty, value, rate = map(float, number_lines); free_qty = 0.0
+                else: i += 1; continue
+                mrp_block_end_idx = num_block_end_idx + 1
+                while mrp_block_end_idx < len(lines) and manufacturer not in lines[mrp_block_end_idx]: mrp_block_end_idx += 1
+                if mrp_block_end_idx >= len(lines): i += 1; continue
+                mrp = [float(n.replace(',', '')) for n in lines[num_block_end_idx + 1:mrp_block_end_idx] if re.match(r'^-?[\d,.]+$', n)]
+                i = mrp_block_end_idx
+                records.append({
+                    "Distributor": distributor, "Area": current_area, "CustomerName": current_customer,
+                    "ItemName": ItemName, "Manufacturer": manufacturer, "Date": date, "BillNo": bill_no,
+                    "Pack_Size": pack_size, "Quantity": int(qty), "FREE": int(free_qty), "PTR": rate,
+                    "Value": value, "MRP": mrp[0] if mrp else 0.0,
+                })
+                continue
+            except (IndexError, ValueError) as e: i += 1
+        else: i += 1
+    return records
+
+
+def synthetic_report(path, pages, broken_pages, seed=7):
+    """
+    Writes an area/party/billwise report with ``pages`` pages. The last
+    ``broken_pages`` pages lack manufacturer lines, the malformed stretch that
+    made the old scans quadratic.
+    """
+    rng = random.Random(seed)
+    items = ['CONGO Tab', 'PRO BA Caps', 'CONLOSS Solution', 'CITRAPLUS  Liq', 'LESSI TAB']
+    doc = fitz.open()
+    for page_number in range(pages):
+        broken = page_number >= pages - broken_pages
+        lines = [f'AREA {page_number % 7}', 'Area', f'MEDICALS {rng.randint(0, 300)}, PALAKKAD', 'Customer']
+        while len(lines) < 60:
+            qty, free = rng.randint(1, 20), rng.randint(0, 2)
+            rate = round(rng.uniform(10, 200), 2)
+            lines += [rng.choice(items), f'{rng.randint(1, 28):02d}/05/25', '10S', f' {qty}']
+            lines += [f' {free}'] if free else []
+            lines += [f' {qty * rate:,.2f}', f' {rate:.2f}', f'P2526-{rng.randint(1000, 9999)}', f' {rate * 1.4:.2f}']
+            lines += [] if broken else [txt_parser.PDF_MANUFACTURER]
+        page = doc.new_page()
+        for row, line in enumerate(lines):
+            page.insert_text((20, 14 + row * 13), line, fontsize=7)
+    doc.save(path)
+
+
+class Command(BaseCommand):
+    help = "Checks the single-pass PDF parser against the scanning one and times serial and parallel text extraction."
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help="PDF reports. Without files a synthetic report is used.")
+        parser.add_argument('--pages', type=int, default=500, help="Pages in the synthetic report.")
+        parser.add_argument('--broken-pages', type=int, default=50, help="Trailing synthetic pages without manufacturer lines.")
+
+    def time_parse(self, path):
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            records = txt_parser.parse_pdf_sales_report(path)
+            return records, time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = options['files']
+            if not paths:
+                paths = [os.path.join(tmp, 'report.pdf')]
+                synthetic_report(paths[0], options['pages'], options['broken_pages'])
+            for path in paths:
+                started = time.perf_counter()
+                with fitz.open(path) as doc:
+                    page_count = doc.page_count
+                    raw_text = "".join(page.get_text("text") for page in doc)
+                extract_seconds = time.perf_counter() - started
+                started = time.perf_counter()
+                expected = scanning_records(raw_text)
+                scanning_seconds = time.perf_counter() - started
+
+                with override_settings(SHIRR_PARSE_WORKERS=1):
+                    serial, serial_seconds = self.time_parse(path)
+                if serial != expected:
+                    raise CommandError(f"{path}: single-pass parser output differs from the scanning parser.")
+                self.stdout.write(f"{path}: {page_count} pages, {len(expected)} records, identical output")
+                self.stdout.write(f"  old (serial text + scans):    {extract_seconds + scanning_seconds:8.2f}s  (record loop {scanning_seconds:.2f}s)")
+                self.stdout.write(f"  new (serial text + 1 pass):   {serial_seconds:8.2f}s")
+
+                workers = min(parse_pool.pool_size(), page_count // txt_parser.PDF_MIN_PAGES_PER_WORKER)
+                if workers >= 2:
+                    # Start the pool (and its imports) first so process startup is not billed to parsing.
+                    size = parse_pool.pool_size()
+                    list(parse_pool.get_executor().map(txt_parser._pdf_pages_text, [path] * size, [0] * size, [0] * size))
+                    parallel, parallel_seconds = self.time_parse(path)
+                    if parallel != expected:
+                        raise CommandError(f"{path}: parallel text extraction changed the output.")
+                    self.stdout.write(f"  new ({workers} text workers + 1 pass): {parallel_seconds:8.2f}s")
+                self.stdout.write(self.style.SUCCESS(f"  speedup: {(extract_seconds + scanning_seconds) / serial_seconds:.1f}x serial"))
@@ -0,0 +1,72 @@
+import contextlib
+import io
+import json
+import math
+import time
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+from django.http import JsonResponse
+from django.test import override_settings
+
+from shirr_data import sales_store, views
+from shirr_data.models import SalesTransaction
+
+
+def differences(expected, actual, tolerance, path='data'):
+    """Paths at which two decoded JSON documents differ, numbers compared within ``tolerance``."""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        if list(expected) != list(actual):
+            return [path]
+        return [p for key in expected for p in differences(expected[key], actual[key], tolerance, f"{path}.{key}")]
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return [path]
+        return [p for i, (e, a) in enumerate(zip(expected, actual)) for p in differences(e, a, tolerance, f"{path}[{i}]")]
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)) and not isinstance(expected, bool):
+        return [] if math.isclose(expected, actual, rel_tol=1e-12, abs_tol=tolerance) else [path]
+    return [] if expected == actual else [path]
+
+
+class Command(BaseCommand):
+    help = "Compares the in-process columnar sales store with an object DataFrame of the same rows, and its dashboard with the rollup one."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tolerance', type=float, default=0.01, help="Allowed absolute difference for summed values.")
+
+    def timed(self, build):
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            result = build()
+            return result, time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        rows = SalesTransaction.objects.count()
+        if not rows:
+            raise CommandError("No stored transactions; upload some reports first.")
+        # The names as a plain .values() query would return them, joined from the dimension tables.
+        names = {f"{model._meta.model_name}_name": F(f"{model._meta.model_name}__name") for _, model in sales_store.DIMENSION_COLUMNS.values()}
+        fields = ['bill_no'] + sales_store.INTEGER_COLUMNS + ['value', 'date']
+        objects, objects_seconds = self.timed(lambda: pd.DataFrame.from_records(SalesTransaction.objects.order_by().values(*fields, **names)))
+        objects_bytes = objects.memory_usage(deep=True).sum()
+        del objects
+
+        store = sales_store.SalesStore()
+        _, load_seconds = self.timed(store.snapshot)
+
+        rollups, rollups_seconds = self.timed(views._build_sales_data)
+        with override_settings(SHIRR_DASHBOARD_SOURCE='memory'):
+            self.timed(views._build_sales_data)  # loads the process store
+            memory, memory_seconds = self.timed(views._build_sales_data)
+        expected, actual = json.loads(JsonResponse(rollups).content), json.loads(JsonResponse(memory).content)
+        differing = differences(expected, actual, options['tolerance'])
+        if differing:
+            raise CommandError(f"Dashboard from the sales store differs from the rollup dashboard at {', '.join(differing[:10])}.")
+
+        self.stdout.write(f"{rows} transactions, identical dashboards (within {options['tolerance']})")
+        self.stdout.write(f"  object DataFrame from .values(): {objects_seconds:8.2f}s  {objects_bytes / 1e6:8.1f} MB")
+        self.stdout.write(f"  columnar sales store load:       {load_seconds:8.2f}s  {store.memory_usage() / 1e6:8.1f} MB")
+        self.stdout.write(f"  dashboard from rollups (SQL):    {rollups_seconds:8.3f}s")
+        self.stdout.write(f"  dashboard from the store:        {memory_seconds:8.3f}s")
+        self.stdout.write(self.style.SUCCESS(f"  store footprint: {objects_bytes / store.memory_usage():.1f}x smaller"))
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import time
+
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shirr_data import schema, txt_parser
+
+
+class Command(BaseCommand):
+    help = "Times the line-by-line TXT parser against the memory-mapped byte scanner and checks they agree."
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help="TXT reports. Without files the bundled sample is repeated.")
+        parser.add_argument('--copies', type=int, default=500, help="Times the sample report is repeated for the synthetic file.")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per parser; the fastest one is reported.")
+
+    def parse(self, iter_batches, path, repeat):
+        """Standardized output of one parser and its fastest wall time over ``repeat`` runs."""
+        best = None
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            frames = [txt_parser.standardize_records(batch) for batch in iter_batches(path)]
+            seconds = time.perf_counter() - started
+            best = seconds if best is None else min(best, seconds)
+        return schema.concat_batches(frames), best
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = options['files']
+            if not paths:
+                sample = os.path.join(settings.BASE_DIR, 'temp.txt')
+                paths = [os.path.join(tmp, 'report.txt')]
+                with open(sample, 'rb') as src, open(paths[0], 'wb') as dst:
+                    dst.write(src.read() * options['copies'])
+            for path in paths:
+                megabytes = os.path.getsize(path) / 1e6
+                lines, lines_seconds = self.parse(txt_parser.iter_txt_sales_report, path, options['repeat'])
+                scanned, scanner_seconds = self.parse(txt_parser.iter_txt_sales_columns, path, options['repeat'])
+                try:
+                    pd.testing.assert_frame_equal(lines, scanned)
+                except AssertionError as e:
+                    raise CommandError(f"{path}: byte scanner output differs from the line parser: {e}")
+                self.stdout.write(f"{path}: {megabytes:.1f} MB, {len(lines)} records, identical output")
+                self.stdout.write(f"  line parser:  {lines_seconds:8.2f}s  {megabytes / lines_seconds:8.1f} MB/s")
+                self.stdout.write(f"  byte scanner: {scanner_seconds:8.2f}s  {megabytes / scanner_seconds:8.1f} MB/s")
+                self.stdout.write(self.style.SUCCESS(f"  speedup: {lines_seconds / scanner_seconds:.1f}x"))
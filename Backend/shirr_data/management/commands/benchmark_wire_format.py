@@ -0,0 +1,98 @@
+import contextlib
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import JsonResponse
+
+from shirr_data import schema, txt_parser, views, wire
+from shirr_data.analytics import FrameAggregates
+from shirr_data.management.commands.benchmark_analytics import synthetic_batch
+
+
+def expand(encoded):
+    """Decodes a compact response back into the default format; checks that nothing was lost."""
+    labels = encoded['dictionary']
+    def decode(indexes): return [labels[i] for i in indexes]
+    def with_labels(chart, key='labels'): return {k: decode(v) if k == key else v for k, v in chart.items()}
+    data = {}
+    for key, value in encoded.items():
+        if key in ('format', 'dictionary'):
+            continue
+        if not value or key not in wire.COMPACT_ENCODERS:
+            data[key] = value
+        elif key == 'salesReport':
+            data[key] = {period: with_labels(chart) for period, chart in value.items()}
+        elif key == 'revenueByArea':
+            data[key] = [{'name': name, 'revenue': revenue} for name, revenue in zip(decode(value['name']), value['revenue'])]
+        elif key == 'salesTrendsByArea':
+            weeks = decode(value['labels'])
+            data[key] = {area: {'labels': weeks, 'data': row} for area, row in zip(decode(value['areas']), value['data'])}
+        elif key == 'topMedicinesByArea':
+            data[key] = {area: {'labels': decode(items), 'data': row} for area, items, row in zip(decode(value['areas']), value['labels'], value['data'])}
+        elif key == 'areaPerformance':
+            data[key] = with_labels(value, 'name')
+        else:
+            data[key] = with_labels(value)
+    return data
+
+
+class Command(BaseCommand):
+    help = "Compares payload size and serialization/compression time of the default and compact dashboard formats."
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help="Report files, analyzed together. Without files a synthetic batch is used.")
+        parser.add_argument('--rows', type=int, default=1_000_000, help="Rows in the synthetic batch.")
+        parser.add_argument('--stored', action='store_true', help="Use the /api/sales-data/ dashboard of the stored data instead.")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per step; the fastest one is reported.")
+
+    def best(self, step, repeat):
+        result, seconds = None, None
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            result = step()
+            elapsed = time.perf_counter() - started
+            seconds = elapsed if seconds is None else min(seconds, elapsed)
+        return result, seconds
+
+    def dashboard(self, options):
+        with contextlib.redirect_stdout(io.StringIO()):
+            if options['stored']:
+                return views._build_sales_data()
+            if options['files']:
+                batches = [txt_parser.parse_sales_file(path) for path in options['files']]
+                df = schema.concat_batches([batch for batch in batches if batch is not None])
+            else:
+                df = synthetic_batch(options['rows'])
+            return views._dashboard_data(FrameAggregates(df))
+
+    def handle(self, *args, **options):
+        data = self.dashboard(options)
+        if not data.get('totalRecords'):
+            raise CommandError("No data to build a dashboard from.")
+        repeat = options['repeat']
+        reference = json.loads(JsonResponse(data).content)
+        if expand(json.loads(wire.render(data, 'compact'))) != reference:
+            raise CommandError("The compact format does not decode back to the default response.")
+
+        _, json_seconds = self.best(lambda: JsonResponse(data).content, repeat)
+        _, fast_seconds = self.best(lambda: wire.dumps(data), repeat)
+        serializer = 'orjson' if wire.orjson is not None else 'json (orjson not installed)'
+        self.stdout.write(f"{data['totalRecords']} records, compact format decodes back to the default response")
+        self.stdout.write(f"  {'default format, JsonResponse:':45s} {json_seconds * 1000:8.1f} ms")
+        self.stdout.write(f"  {f'default format, {serializer}:':45s} {fast_seconds * 1000:8.1f} ms")
+
+        rows = []
+        for fmt in wire.FORMATS:
+            body, render_seconds = self.best(lambda: wire.render(data, fmt), repeat)
+            rows.append((fmt, 'identity', len(body), render_seconds, 0.0))
+            for encoding in ['gzip', 'br'] if wire.brotli is not None else ['gzip']:
+                (encoded, _), encode_seconds = self.best(lambda: wire.encode(body, encoding), repeat)
+                rows.append((fmt, encoding, len(encoded), render_seconds, encode_seconds))
+        baseline = rows[0][2]
+        self.stdout.write(f"  {'format':8s} {'encoding':9s} {'bytes':>10s} {'render ms':>10s} {'encode ms':>10s} {'vs json':>8s}")
+        for fmt, encoding, size, render_seconds, encode_seconds in rows:
+            self.stdout.write(
+                f"  {fmt:8s} {encoding:9s} {size:10d} {render_seconds * 1000:10.1f} {encode_seconds * 1000:10.1f} {baseline / size:7.1f}x"
+            )
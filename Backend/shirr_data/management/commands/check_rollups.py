@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shirr_data import rollups
+
+
+class Command(BaseCommand):
+    help = "Verifies that the daily rollups match a fresh aggregation of SalesTransaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tolerance', type=float, default=0.01, help="Allowed absolute difference for summed values.")
+        parser.add_argument('--limit', type=int, default=20, help="Maximum number of problems to print.")
+
+    def handle(self, *args, **options):
+        problems = rollups.find_inconsistencies(tolerance=options['tolerance'])
+        if not problems:
+            self.stdout.write(self.style.SUCCESS("Rollups are consistent with SalesTransaction."))
+            return
+        for problem in problems[:options['limit']]:
+            self.stderr.write(problem)
+        raise CommandError(f"Found {len(problems)} rollup inconsistencies. Run `manage.py rebuild_rollups` to fix them.")
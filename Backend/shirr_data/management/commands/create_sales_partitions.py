@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shirr_data import partitions
+
+
+class Command(BaseCommand):
+    help = "Creates the monthly SalesTransaction partitions ahead of time (PostgreSQL). Run it from cron, e.g. monthly."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=partitions.AHEAD_MONTHS, help="Months after the current one to create.")
+
+    def handle(self, *args, **options):
+        if not partitions.is_partitioned():
+            raise CommandError("SalesTransaction is not partitioned; partitioning needs PostgreSQL and migration 0006.")
+        created = partitions.ensure_partitions(ahead=options['ahead'])
+        for name in created:
+            self.stdout.write(f"Created {name}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(created)} partition(s); {len(partitions.existing_partitions())} attached in total."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from shirr_data import rollups
+
+
+class Command(BaseCommand):
+    help = "Recomputes the daily sales and bill rollups from SalesTransaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help="Rollup rows written per INSERT.")
+
+    def handle(self, *args, **options):
+        sales_rows, bill_rows = rollups.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {sales_rows} daily sales rollups and {bill_rows} daily bill rollups."))
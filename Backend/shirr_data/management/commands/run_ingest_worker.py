@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from shirr_data import ingest
+
+
+class Command(BaseCommand):
+    help = (
+        "Processes uploads queued with /api/upload/?async=1. Several workers can run side by side; "
+        "they write to the database one at a time (see rollups.lock)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty instead of polling.")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            job = ingest.claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+            self.stdout.write(f"Processing job {job.pk}: {job.data_file}")
+            job = ingest.run_job(job)
+            if job.status == job.SUCCEEDED:
+                if job.mode == job.UPSERT:
+                    counts = f"{job.rows_inserted} inserted, {job.rows_updated} updated, {job.duplicates} unchanged."
+                else:
+                    counts = f"{job.rows_inserted} inserted, {job.duplicates} already stored."
+                self.stdout.write(self.style.SUCCESS(
+                    f"Job {job.pk} done in {job.seconds:.2f}s: {job.rows_parsed} rows parsed, {counts}"
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(f"Job {job.pk} failed: {job.error}"))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shirr_data import ingest, partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes one month of transactions (a TRUNCATE of its partition on PostgreSQL) together with its rollups. "
+        "Report files given with --reload are then ingested again; only rows of the emptied month are new, "
+        "so the month is reloaded and the other months stay as they are."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('month', help="The month to empty, as YYYY-MM.")
+        parser.add_argument('--reload', nargs='+', default=[], metavar='FILE', help="Report files to ingest afterwards.")
+
+    def handle(self, *args, **options):
+        try:
+            month = partitions.parse_month(options['month'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        count = partitions.truncate_month(month)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {count} transactions of {month:%B %Y}."))
+        for path in options['reload']:
+            result = ingest.ingest_file(path)
+            self.stdout.write(self.style.SUCCESS(
+                f"Reloaded {path}: {result.parsed} rows parsed, {result.inserted} inserted, {result.duplicates} already stored."
+            ))
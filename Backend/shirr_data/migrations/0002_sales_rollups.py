@@ -0,0 +1,69 @@
+# Generated by Django 5.2.3 on 2026-10-17 02:21
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_rollups(apps, schema_editor):
+    SalesTransaction = apps.get_model('shirr_data', 'SalesTransaction')
+    DailySalesRollup = apps.get_model('shirr_data', 'DailySalesRollup')
+    DailyBillRollup = apps.get_model('shirr_data', 'DailyBillRollup')
+    sales = (
+        SalesTransaction.objects.order_by().values('date', 'area', 'item_name', 'customer_name')
+        .annotate(total_value=Sum('value'), total_quantity=Sum('quantity'),
+                  total_free_quantity=Sum('free_quantity'), rows=Count('id'))
+    )
+    DailySalesRollup.objects.bulk_create((
+        DailySalesRollup(
+            date=row['date'], area=row['area'], item_name=row['item_name'], customer_name=row['customer_name'],
+            value=row['total_value'], quantity=row['total_quantity'], free_quantity=row['total_free_quantity'],
+            order_count=row['rows'],
+        ) for row in sales.iterator()
+    ), batch_size=2000)
+    bills = SalesTransaction.objects.order_by().values('date', 'area', 'bill_no').annotate(rows=Count('id'))
+    DailyBillRollup.objects.bulk_create((
+        DailyBillRollup(date=row['date'], area=row['area'], bill_no=row['bill_no'], line_count=row['rows'])
+        for row in bills.iterator()
+    ), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shirr_data', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBillRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('area', models.CharField(blank=True, max_length=100, null=True)),
+                ('bill_no', models.CharField(max_length=100)),
+                ('line_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('date', 'area', 'bill_no')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('area', models.CharField(blank=True, max_length=100, null=True)),
+                ('item_name', models.CharField(max_length=255)),
+                ('customer_name', models.CharField(max_length=255)),
+                ('value', models.FloatField(default=0.0)),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('free_quantity', models.BigIntegerField(default=0)),
+                ('order_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['area', 'date'], name='shirr_data__area_369758_idx')],
+                'unique_together': {('date', 'area', 'item_name', 'customer_name')},
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
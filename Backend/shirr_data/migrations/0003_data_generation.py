@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-17 02:22
+
+from django.db import migrations, models
+
+
+def create_generation_row(apps, schema_editor):
+    DataGeneration = apps.get_model('shirr_data', 'DataGeneration')
+    DataGeneration.objects.get_or_create(pk=1, defaults={'generation': 1})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shirr_data', '0002_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generation', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_generation_row, migrations.RunPython.noop),
+    ]
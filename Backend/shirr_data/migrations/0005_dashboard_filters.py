@@ -0,0 +1,79 @@
+# Generated by Django 5.2.3 on 2026-10-17 03:41
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def regroup_sales_rollups(apps, schema_editor):
+    # The sales rollups now also group by manufacturer.
+    SalesTransaction = apps.get_model('shirr_data', 'SalesTransaction')
+    DailySalesRollup = apps.get_model('shirr_data', 'DailySalesRollup')
+    DailySalesRollup.objects.all().delete()
+    sales = (
+        SalesTransaction.objects.order_by().values('date', 'area', 'item_name', 'customer_name', 'manufacturer')
+        .annotate(total_value=Sum('value'), total_quantity=Sum('quantity'),
+                  total_free_quantity=Sum('free_quantity'), rows=Count('id'))
+    )
+    DailySalesRollup.objects.bulk_create((
+        DailySalesRollup(
+            date=row['date'], area=row['area'], item_name=row['item_name'], customer_name=row['customer_name'],
+            manufacturer=row['manufacturer'], value=row['total_value'], quantity=row['total_quantity'],
+            free_quantity=row['total_free_quantity'], order_count=row['rows'],
+        ) for row in sales.iterator()
+    ), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shirr_data', '0004_ingest_job'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='dailysalesrollup',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='dailysalesrollup',
+            name='manufacturer',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailysalesrollup',
+            unique_together={('date', 'area', 'item_name', 'customer_name', 'manufacturer')},
+        ),
+        migrations.RunPython(regroup_sales_rollups, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='dailybillrollup',
+            index=models.Index(fields=['area', 'date'], name='shirr_data__area_3ba33f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailysalesrollup',
+            index=models.Index(fields=['item_name', 'date'], name='shirr_data__item_na_26409b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailysalesrollup',
+            index=models.Index(fields=['customer_name', 'date'], name='shirr_data__custome_8bcae9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailysalesrollup',
+            index=models.Index(fields=['manufacturer', 'date'], name='shirr_data__manufac_9776ff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salestransaction',
+            index=models.Index(fields=['area', 'date'], name='shirr_data__area_385e02_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salestransaction',
+            index=models.Index(fields=['item_name', 'date'], name='shirr_data__item_na_0fba11_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salestransaction',
+            index=models.Index(fields=['customer_name', 'date'], name='shirr_data__custome_3ac859_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salestransaction',
+            index=models.Index(fields=['manufacturer', 'date'], name='shirr_data__manufac_f62c16_idx'),
+        ),
+    ]
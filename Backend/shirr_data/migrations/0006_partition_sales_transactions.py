@@ -0,0 +1,83 @@
+# Generated by Django 5.2.3 on 2026-10-17 04:10
+
+import datetime
+
+from django.db import migrations
+
+TABLE = 'shirr_data_salestransaction'
+LEGACY_TABLE = f"{TABLE}_unpartitioned"
+AHEAD_MONTHS = 12
+
+
+def _next_month(month):
+    return datetime.date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_sales_transactions(apps, schema_editor):
+    """
+    Rebuilds SalesTransaction as a table partitioned by month on PostgreSQL
+    (see partitions.py). Django's model state is unchanged: ``id`` stays the
+    model's primary key and remains unique through its sequence.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        if cursor.fetchone()[0] == 'p':
+            return
+        # Indexes and constraints are recreated under the same names once the rows are copied.
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'u')", [TABLE]
+        )
+        constraints = cursor.fetchall()
+        constraint_names = [name for name, _, _ in constraints]
+        cursor.execute("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s", [TABLE])
+        indexes = [definition for name, definition in cursor.fetchall() if name not in constraint_names]
+
+        # New ids continue after the last one handed out, even if those rows are gone.
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [TABLE])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(f"SELECT GREATEST(pg_sequence_last_value(%s::regclass), (SELECT MAX(id) FROM {TABLE}), 0)", [sequence])
+        last_id = cursor.fetchone()[0]
+
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {LEGACY_TABLE}")
+        cursor.execute(f"ALTER SEQUENCE {sequence} RENAME TO {LEGACY_TABLE}_id_seq")
+        cursor.execute(f"CREATE TABLE {TABLE} (LIKE {LEGACY_TABLE} INCLUDING DEFAULTS) PARTITION BY RANGE (date)")
+        # Identity columns are not supported on partitioned tables before PostgreSQL 17.
+        cursor.execute(f"CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id")
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+        cursor.execute(f"SELECT setval('{TABLE}_id_seq', %s + 1, false)", [last_id])
+
+        cursor.execute(f"SELECT DISTINCT date_trunc('month', date)::date FROM {LEGACY_TABLE}")
+        months = {month for month, in cursor.fetchall()}
+        month = datetime.date.today().replace(day=1)
+        for _ in range(AHEAD_MONTHS + 1):
+            months.add(month)
+            month = _next_month(month)
+        for month in sorted(months):
+            cursor.execute(
+                f"CREATE TABLE {TABLE}_y{month.year:04d}m{month.month:02d} PARTITION OF {TABLE} "
+                f"FOR VALUES FROM ('{month}') TO ('{_next_month(month)}')"
+            )
+        cursor.execute(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT")
+
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {LEGACY_TABLE}")
+        cursor.execute(f"DROP TABLE {LEGACY_TABLE}")
+        for name, kind, definition in constraints:
+            if kind == 'p':
+                definition = 'PRIMARY KEY (id, date)'
+            cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}")
+        for definition in indexes:
+            cursor.execute(definition)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shirr_data', '0005_dashboard_filters'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_sales_transactions, migrations.RunPython.noop),
+    ]
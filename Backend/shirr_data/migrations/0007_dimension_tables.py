@@ -0,0 +1,152 @@
+# Generated by Django 5.2.3 on 2026-10-17 05:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# SalesTransaction name column -> (dimension model, foreign key column).
+DIMENSIONS = {
+    'customer_name': ('Customer', 'customer_id'),
+    'item_name': ('Item', 'item_id'),
+    'area_name': ('Area', 'area_id'),
+    'manufacturer_name': ('Manufacturer', 'manufacturer_id'),
+}
+
+
+def fill_dimensions(apps, schema_editor):
+    """Creates a dimension row per distinct name and points every transaction at its ids."""
+    table = apps.get_model('shirr_data', 'SalesTransaction')._meta.db_table
+    assignments = []
+    with schema_editor.connection.cursor() as cursor:
+        for column, (model_name, id_column) in DIMENSIONS.items():
+            dimension = apps.get_model('shirr_data', model_name)._meta.db_table
+            cursor.execute(f"INSERT INTO {dimension} (name) SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL")
+            assignments.append(f"{id_column} = (SELECT id FROM {dimension} WHERE {dimension}.name = {table}.{column})")
+        # One pass over the (possibly large) table rather than one per dimension.
+        cursor.execute(f"UPDATE {table} SET {', '.join(assignments)}")
+
+
+def clear_rollups(apps, schema_editor):
+    apps.get_model('shirr_data', 'DailySalesRollup').objects.all().delete()
+    apps.get_model('shirr_data', 'DailyBillRollup').objects.all().delete()
+
+
+def rebuild_rollups(apps, schema_editor):
+    transactions = apps.get_model('shirr_data', 'SalesTransaction')._meta.db_table
+    sales = apps.get_model('shirr_data', 'DailySalesRollup')._meta.db_table
+    bills = apps.get_model('shirr_data', 'DailyBillRollup')._meta.db_table
+    keys = 'date, area_id, item_id, customer_id, manufacturer_id'
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {sales} ({keys}, value, quantity, free_quantity, order_count) "
+            f"SELECT {keys}, SUM(value), SUM(quantity), SUM(free_quantity), COUNT(*) FROM {transactions} GROUP BY {keys}"
+        )
+        cursor.execute(
+            f"INSERT INTO {bills} (date, area_id, bill_no, line_count) "
+            f"SELECT date, area_id, bill_no, COUNT(*) FROM {transactions} GROUP BY date, area_id, bill_no"
+        )
+
+
+def _foreign_key(model, **options):
+    return models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to=f'shirr_data.{model}', **options)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shirr_data', '0006_partition_sales_transactions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Area',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Customer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Item',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Manufacturer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='salestransaction',
+            options={'ordering': ['-date', 'customer__name']},
+        ),
+
+        # The indexes and unique constraints on the name columns go first.
+        migrations.AlterUniqueTogether(name='salestransaction', unique_together=set()),
+        migrations.AlterUniqueTogether(name='dailysalesrollup', unique_together=set()),
+        migrations.AlterUniqueTogether(name='dailybillrollup', unique_together=set()),
+        migrations.RemoveIndex(model_name='salestransaction', name='shirr_data__date_882c28_idx'),
+        migrations.RemoveIndex(model_name='salestransaction', name='shirr_data__area_385e02_idx'),
+        migrations.RemoveIndex(model_name='salestransaction', name='shirr_data__item_na_0fba11_idx'),
+        migrations.RemoveIndex(model_name='salestransaction', name='shirr_data__custome_3ac859_idx'),
+        migrations.RemoveIndex(model_name='salestransaction', name='shirr_data__manufac_f62c16_idx'),
+        migrations.RemoveIndex(model_name='dailysalesrollup', name='shirr_data__area_369758_idx'),
+        migrations.RemoveIndex(model_name='dailysalesrollup', name='shirr_data__item_na_26409b_idx'),
+        migrations.RemoveIndex(model_name='dailysalesrollup', name='shirr_data__custome_8bcae9_idx'),
+        migrations.RemoveIndex(model_name='dailysalesrollup', name='shirr_data__manufac_9776ff_idx'),
+        migrations.RemoveIndex(model_name='dailybillrollup', name='shirr_data__area_3ba33f_idx'),
+
+        # SalesTransaction: names -> dimension ids.
+        migrations.RenameField(model_name='salestransaction', old_name='area', new_name='area_name'),
+        migrations.RenameField(model_name='salestransaction', old_name='manufacturer', new_name='manufacturer_name'),
+        migrations.AddField(model_name='salestransaction', name='customer', field=_foreign_key('customer', null=True)),
+        migrations.AddField(model_name='salestransaction', name='item', field=_foreign_key('item', null=True)),
+        migrations.AddField(model_name='salestransaction', name='area', field=_foreign_key('area', blank=True, null=True)),
+        migrations.AddField(model_name='salestransaction', name='manufacturer', field=_foreign_key('manufacturer', blank=True, null=True)),
+        migrations.RunPython(fill_dimensions),
+        migrations.RemoveField(model_name='salestransaction', name='customer_name'),
+        migrations.RemoveField(model_name='salestransaction', name='item_name'),
+        migrations.RemoveField(model_name='salestransaction', name='area_name'),
+        migrations.RemoveField(model_name='salestransaction', name='manufacturer_name'),
+        migrations.AlterField(model_name='salestransaction', name='customer', field=_foreign_key('customer')),
+        migrations.AlterField(model_name='salestransaction', name='item', field=_foreign_key('item')),
+        migrations.AlterUniqueTogether(name='salestransaction', unique_together={('bill_no', 'date', 'item')}),
+        migrations.AddIndex(model_name='salestransaction', index=models.Index(fields=['date', 'area'], name='shirr_data__date_0d03d5_idx')),
+        migrations.AddIndex(model_name='salestransaction', index=models.Index(fields=['area', 'date'], name='shirr_data__area_id_085957_idx')),
+        migrations.AddIndex(model_name='salestransaction', index=models.Index(fields=['item', 'date'], name='shirr_data__item_id_0d5cd8_idx')),
+        migrations.AddIndex(model_name='salestransaction', index=models.Index(fields=['customer', 'date'], name='shirr_data__custome_d8d447_idx')),
+        migrations.AddIndex(model_name='salestransaction', index=models.Index(fields=['manufacturer', 'date'], name='shirr_data__manufac_03997b_idx')),
+
+        # Rollups: emptied, re-keyed by id and rebuilt from the transactions.
+        migrations.RunPython(clear_rollups),
+        migrations.RemoveField(model_name='dailysalesrollup', name='area'),
+        migrations.RemoveField(model_name='dailysalesrollup', name='item_name'),
+        migrations.RemoveField(model_name='dailysalesrollup', name='customer_name'),
+        migrations.RemoveField(model_name='dailysalesrollup', name='manufacturer'),
+        migrations.RemoveField(model_name='dailybillrollup', name='area'),
+        migrations.AddField(model_name='dailysalesrollup', name='area', field=_foreign_key('area', blank=True, null=True)),
+        migrations.AddField(model_name='dailysalesrollup', name='item', field=_foreign_key('item', default=None), preserve_default=False),
+        migrations.AddField(model_name='dailysalesrollup', name='customer', field=_foreign_key('customer', default=None), preserve_default=False),
+        migrations.AddField(model_name='dailysalesrollup', name='manufacturer', field=_foreign_key('manufacturer', blank=True, null=True)),
+        migrations.AddField(model_name='dailybillrollup', name='area', field=_foreign_key('area', blank=True, null=True)),
+        migrations.AlterUniqueTogether(
+            name='dailysalesrollup',
+            unique_together={('date', 'area', 'item', 'customer', 'manufacturer')},
+        ),
+        migrations.AlterUniqueTogether(name='dailybillrollup', unique_together={('date', 'area', 'bill_no')}),
+        migrations.AddIndex(model_name='dailysalesrollup', index=models.Index(fields=['area', 'date'], name='shirr_data__area_id_e19d70_idx')),
+        migrations.AddIndex(model_name='dailysalesrollup', index=models.Index(fields=['item', 'date'], name='shirr_data__item_id_e91ed2_idx')),
+        migrations.AddIndex(model_name='dailysalesrollup', index=models.Index(fields=['customer', 'date'], name='shirr_data__custome_b17230_idx')),
+        migrations.AddIndex(model_name='dailysalesrollup', index=models.Index(fields=['manufacturer', 'date'], name='shirr_data__manufac_846222_idx')),
+        migrations.AddIndex(model_name='dailybillrollup', index=models.Index(fields=['area', 'date'], name='shirr_data__area_id_5fb11d_idx')),
+        migrations.RunPython(rebuild_rollups),
+    ]
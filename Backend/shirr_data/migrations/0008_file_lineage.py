@@ -0,0 +1,49 @@
+# Generated by Django 5.2.3 on 2026-10-17 04:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shirr_data', '0007_dimension_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datafile',
+            name='duplicates',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='datafile',
+            name='load_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='datafile',
+            name='parse_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='datafile',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='datafile',
+            name='rows_inserted',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='datafile',
+            name='rows_parsed',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='salestransaction',
+            name='source_file',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='transactions', to='shirr_data.datafile'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.3 on 2026-10-17 04:24
+
+import hashlib
+
+from django.db import migrations, models
+
+# As in ingest.py at the time of this migration.
+FINGERPRINT_COLUMNS = [
+    'customer_id', 'quantity', 'free_quantity', 'ptr', 'value', 'batch_no', 'expiry', 'area_id', 'distributor',
+    'manufacturer_id', 'pack_size', 'mrp', 'product_discount_percent', 'discount_amount', 'customer_discount_percent',
+]
+CHUNK = 2000
+
+
+def row_fingerprint(values):
+    digest = hashlib.blake2b(repr(tuple(values)).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def fill_fingerprints(apps, schema_editor):
+    """Fingerprints the stored rows, so that upsert compares them like new ones."""
+    model = apps.get_model('shirr_data', 'SalesTransaction')
+    table = model._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        if schema_editor.connection.vendor == 'postgresql':
+            cursor.execute(f"UPDATE {table} SET fingerprint = hashtextextended(ROW({', '.join(FINGERPRINT_COLUMNS)})::text, 0)")
+            return
+        rows = model.objects.order_by().values_list('id', *FINGERPRINT_COLUMNS)
+        chunk = []
+        for row in rows.iterator(chunk_size=CHUNK):
+            chunk.append((row_fingerprint(row[1:]), row[0]))
+            if len(chunk) >= CHUNK:
+                cursor.executemany(f"UPDATE {table} SET fingerprint = %s WHERE id = %s", chunk)
+                chunk = []
+        cursor.executemany(f"UPDATE {table} SET fingerprint = %s WHERE id = %s", chunk)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shirr_data', '0008_file_lineage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datafile',
+            name='rows_updated',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='datageneration',
+            name='rewritten_generation',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ingestjob',
+            name='mode',
+            field=models.CharField(choices=[('insert', 'Insert new rows only'), ('upsert', 'Insert new rows and update changed ones')], default='insert', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='ingestjob',
+            name='rows_updated',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='salestransaction',
+            name='fingerprint',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+    ]
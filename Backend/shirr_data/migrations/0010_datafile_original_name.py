@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-17 04:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shirr_data', '0009_upsert_ingest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datafile',
+            name='original_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
@@ -49,7 +49,10 @@
 #         return f"{self.item_name} - {self.customer_name} on {self.date}"
 
 # shirr_data/models.py
+import os
+
 from django.db import models
+from django.utils import timezone
 
 # This model is for tracking the uploaded file itself
 class DataFile(models.Model):
@@ -59,17 +62,65 @@ class DataFile(models.Model):
     # --- THIS IS THE UPDATED/ADDED LINE ---
     # Stores the SHA-256 hash of the file's content to prevent duplicates.
     file_hash = models.CharField(max_length=64, unique=True, db_index=True)
+    # The name the file was uploaded under; the stored copy is named by its
+    # hash (see upload_handlers.py). Empty for files uploaded before it was recorded.
+    original_name = models.CharField(max_length=255, blank=True, default='')
+
+    # Outcome of the last (re)processing of the file, see ingest.ingest_file.
+    rows_parsed = models.IntegerField(default=0)
+    rows_inserted = models.IntegerField(default=0)
+    rows_updated = models.IntegerField(default=0)
+    duplicates = models.IntegerField(default=0)
+    parse_seconds = models.FloatField(null=True, blank=True)
+    load_seconds = models.FloatField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def display_name(self):
+        return self.original_name or os.path.basename(self.file.name)
+
+    def __str__(self):
+        return self.display_name
+
+
+# Dimension tables: every distinct customer, item, area and manufacturer name
+# is stored once, and the transactions and rollups refer to it by its integer
+# id. Ingest resolves names to ids in bulk (see dimensions.py). Rows are never
+# deleted, so an id always keeps its name.
+class Customer(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class Item(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class Area(models.Model):
+    name = models.CharField(max_length=100, unique=True)
 
     def __str__(self):
-        return self.file.name
+        return self.name
+
+
+class Manufacturer(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.name
 
 
 # This will store the actual parsed transaction data
 class SalesTransaction(models.Model):
     # --- All fields are defined first ---
-    # Common fields
-    customer_name = models.CharField(max_length=255, db_index=True)
-    item_name = models.CharField(max_length=255, db_index=True)
+    # Common fields. The composite indexes in Meta cover the foreign keys.
+    customer = models.ForeignKey(Customer, on_delete=models.PROTECT, db_index=False)
+    item = models.ForeignKey(Item, on_delete=models.PROTECT, db_index=False)
     date = models.DateField(db_index=True)
     bill_no = models.CharField(max_length=100)
     quantity = models.IntegerField(default=0)
@@ -84,23 +135,142 @@ class SalesTransaction(models.Model):
     # Fields specific to TXT parser
     batch_no = models.CharField(max_length=100, null=True, blank=True)
     expiry = models.CharField(max_length=50, null=True, blank=True)
-    area = models.CharField(max_length=100, null=True, blank=True)
+    area = models.ForeignKey(Area, on_delete=models.PROTECT, null=True, blank=True, db_index=False)
 
     # Fields specific to PDF/Excel parsers
     distributor = models.CharField(max_length=255, null=True, blank=True)
-    manufacturer = models.CharField(max_length=255, null=True, blank=True)
+    manufacturer = models.ForeignKey(Manufacturer, on_delete=models.PROTECT, null=True, blank=True, db_index=False)
     pack_size = models.CharField(max_length=50, null=True, blank=True)
     mrp = models.FloatField(null=True, blank=True, default=0.0)
     product_discount_percent = models.FloatField(null=True, blank=True, default=0.0)
     discount_amount = models.FloatField(null=True, blank=True, default=0.0)
     customer_discount_percent = models.FloatField(null=True, blank=True, default=0.0)
+
+    # The upload that inserted the row, so one file's rows can be deleted or
+    # reprocessed on their own (see ingest.delete_file_rows). Empty for rows
+    # stored before files were tracked.
+    source_file = models.ForeignKey(DataFile, on_delete=models.PROTECT, null=True, blank=True, related_name='transactions')
+    # Hash of the row's content (every column but the key and the lineage),
+    # compared by upsert ingest to find rows a re-sent report corrected.
+    fingerprint = models.BigIntegerField(null=True, blank=True)
     
     class Meta:
-        ordering = ['-date', 'customer_name']
+        ordering = ['-date', 'customer__name']
+        # (column, date) pairs serve the dashboard filters (see filters.py).
         indexes = [
             models.Index(fields=['date', 'area']),
+            models.Index(fields=['area', 'date']),
+            models.Index(fields=['item', 'date']),
+            models.Index(fields=['customer', 'date']),
+            models.Index(fields=['manufacturer', 'date']),
+        ]
+        unique_together = [['bill_no', 'date', 'item']]
+
+    def __str__(self):
+        return f"{self.item} - {self.customer} on {self.date}"
+
+
+# Pre-aggregated copies of SalesTransaction used by the dashboard. They are
+# maintained by ingest (see rollups.py) inside the same transaction as the
+# inserts, and can be rebuilt with `manage.py rebuild_rollups`.
+class DailySalesRollup(models.Model):
+    date = models.DateField(db_index=True)
+    area = models.ForeignKey(Area, on_delete=models.PROTECT, null=True, blank=True, db_index=False)
+    item = models.ForeignKey(Item, on_delete=models.PROTECT, db_index=False)
+    customer = models.ForeignKey(Customer, on_delete=models.PROTECT, db_index=False)
+    manufacturer = models.ForeignKey(Manufacturer, on_delete=models.PROTECT, null=True, blank=True, db_index=False)
+    value = models.FloatField(default=0.0)
+    quantity = models.BigIntegerField(default=0)
+    free_quantity = models.BigIntegerField(default=0)
+    # Number of transactions in the cell. (bill_no, date, item) is unique,
+    # so this is also the number of distinct bills for the cell.
+    order_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['area', 'date']),
+            models.Index(fields=['item', 'date']),
+            models.Index(fields=['customer', 'date']),
+            models.Index(fields=['manufacturer', 'date']),
+        ]
+        unique_together = [['date', 'area', 'item', 'customer', 'manufacturer']]
+
+    def __str__(self):
+        return f"{self.item} - {self.customer} on {self.date}"
+
+
+# Distinct bills per day and area, needed for the order counts of the KPI and
+# area performance widgets (a bill spans several item rows).
+class DailyBillRollup(models.Model):
+    date = models.DateField(db_index=True)
+    area = models.ForeignKey(Area, on_delete=models.PROTECT, null=True, blank=True, db_index=False)
+    bill_no = models.CharField(max_length=100)
+    line_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['area', 'date']),
         ]
-        unique_together = [['bill_no', 'date', 'item_name']]
+        unique_together = [['date', 'area', 'bill_no']]
+
+    def __str__(self):
+        return f"{self.bill_no} on {self.date}"
+
+
+# Single-row counter bumped whenever the stored sales data changes (ingest,
+# clear). Cached dashboard responses are keyed by it, see versioning.py.
+class DataGeneration(models.Model):
+    generation = models.BigIntegerField(default=0)
+    # The last generation that changed stored rows in place (upsert ingest)
+    # rather than only adding or deleting rows.
+    rewritten_generation = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Data generation {self.generation}"
+
+
+# A stored DataFile waiting to be (or being) parsed and inserted by the
+# background worker (`manage.py run_ingest_worker`).
+class IngestJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+    # How rows whose key is already stored are handled, see ingest.insert_transactions.
+    INSERT = 'insert'
+    UPSERT = 'upsert'
+    MODE_CHOICES = [
+        (INSERT, 'Insert new rows only'),
+        (UPSERT, 'Insert new rows and update changed ones'),
+    ]
+
+    data_file = models.ForeignKey(DataFile, on_delete=models.CASCADE, related_name='ingest_jobs')
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, default=INSERT)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    rows_parsed = models.IntegerField(default=0)
+    rows_inserted = models.IntegerField(default=0)
+    rows_updated = models.IntegerField(default=0)
+    duplicates = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    @property
+    def seconds(self):
+        if self.started_at is None:
+            return None
+        return ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
 
     def __str__(self):
-        return f"{self.item_name} - {self.customer_name} on {self.date}"
\ No newline at end of file
+        return f"Ingest job {self.pk} ({self.status}) for {self.data_file}"
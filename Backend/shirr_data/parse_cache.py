@@ -0,0 +1,91 @@
+# shirr_data/parse_cache.py
+"""
+On-disk cache of parsed files for the analyze-session endpoint.
+
+The typed batch (see schema.py) of a parsed file is stored as Parquet under
+``settings.SHIRR_PARSE_CACHE_DIR``, named by the file's SHA-256 and
+txt_parser.PARSER_VERSION, so the same bytes are parsed once per parser
+version. Hits refresh the file's mtime and the least recently used files
+are removed whenever the directory grows past
+``settings.SHIRR_PARSE_CACHE_BYTES``. Writing needs pyarrow; without it
+(or with a budget of 0) the cache is disabled.
+"""
+import os
+import uuid
+
+import pandas as pd
+from django.conf import settings
+
+from . import schema, txt_parser
+
+SUFFIX = '.parquet'
+
+
+def enabled():
+    if settings.SHIRR_PARSE_CACHE_BYTES <= 0:
+        return False
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _path(file_hash):
+    return os.path.join(settings.SHIRR_PARSE_CACHE_DIR, f"{file_hash}-v{txt_parser.PARSER_VERSION}{SUFFIX}")
+
+
+def get(file_hash):
+    """The cached batch for this file content, or None."""
+    if not enabled():
+        return None
+    path = _path(file_hash)
+    try:
+        df = pd.read_parquet(path)
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:  # a truncated or foreign file; drop it and parse again
+        print(f"Discarding unreadable parse cache entry {path}: {e}")
+        _remove(path)
+        return None
+    return schema.conform(df)
+
+
+def put(file_hash, batch):
+    """Stores a parsed batch and evicts least recently used entries over the disk budget."""
+    if not enabled() or batch.empty:
+        return
+    os.makedirs(settings.SHIRR_PARSE_CACHE_DIR, exist_ok=True)
+    # Written under a temporary name so readers never see a partial file.
+    partial_path = os.path.join(settings.SHIRR_PARSE_CACHE_DIR, f".{uuid.uuid4().hex}.part")
+    try:
+        batch.to_parquet(partial_path, index=False)
+        os.replace(partial_path, _path(file_hash))
+    finally:
+        _remove(partial_path)
+    evict()
+
+
+def evict(budget=None):
+    """Removes the least recently used entries until the cache fits in ``budget`` bytes."""
+    budget = settings.SHIRR_PARSE_CACHE_BYTES if budget is None else budget
+    entries = []
+    with os.scandir(settings.SHIRR_PARSE_CACHE_DIR) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith(SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= budget:
+            break
+        _remove(path)
+        total -= size
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,133 @@
+# shirr_data/parse_pool.py
+"""
+Parsing of uploaded files in a bounded process pool.
+
+PyMuPDF and pandas parsing are CPU-bound, so a month-end batch of reports is
+parsed in parallel worker processes while the database work stays in the
+request process. The pool size comes from ``settings.SHIRR_PARSE_WORKERS``;
+with 1 (or a single file) callers should parse in-process instead.
+
+A worker does not send a file's batches back as one pickled list: it writes
+each typed batch to a spill file as soon as it is parsed and returns only
+the paths. The request process loads them one at a time while it inserts,
+so neither side holds more than a batch of a file in memory, as with the
+in-process streaming path.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import pandas as pd
+from django.conf import settings
+
+from . import txt_parser
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+@dataclass
+class ParsedFile:
+    """Result of parse_file, sent back from a worker process."""
+    spill_dir: str = None
+    batch_paths: list = field(default_factory=list)
+    record_count: int = 0
+    error: str = None
+    seconds: float = 0.0
+
+    def iter_batches(self):
+        """Yields the spilled batches in order, deleting each spill file once it is loaded."""
+        try:
+            for path in self.batch_paths:
+                batch = pd.read_pickle(path)
+                os.remove(path)
+                yield batch
+        finally:
+            self.discard()
+
+    def discard(self):
+        """Deletes what is left of the spill files."""
+        if self.spill_dir:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+
+def parse_file(file_path, batch_size=txt_parser.DEFAULT_BATCH_SIZE):
+    """
+    Worker entry point: parses the file into standardized batches, each
+    written to a spill file as it is produced. Errors are returned rather
+    than raised so one bad file cannot affect the others.
+    """
+    started = time.perf_counter()
+    result = ParsedFile(spill_dir=tempfile.mkdtemp(prefix='shirr-parse-'))
+    try:
+        for number, batch in enumerate(txt_parser.iter_sales_file(file_path, batch_size)):
+            path = os.path.join(result.spill_dir, f"{number:06d}.pkl")
+            # Pickle keeps the categorical and nullable dtypes of the batch exactly.
+            batch.to_pickle(path)
+            result.batch_paths.append(path)
+            result.record_count += len(batch)
+    except Exception as e:
+        result.discard()
+        result = ParsedFile(error=f"{e}\n{traceback.format_exc()}")
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def pool_size():
+    return max(1, int(getattr(settings, 'SHIRR_PARSE_WORKERS', 1)))
+
+
+def get_executor():
+    """The process-wide pool, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: workers must not inherit the request process's DB connections or threads.
+            _executor = ProcessPoolExecutor(max_workers=pool_size(), mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def _readable_path(uploaded_file):
+    """A path another process can open; small in-memory uploads are spilled to a temp file."""
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        return uploaded_file.temporary_file_path(), False
+    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as temp_f:
+        for chunk in uploaded_file.chunks():
+            temp_f.write(chunk)
+    uploaded_file.seek(0)
+    return temp_f.name, True
+
+
+def submit(uploaded_files):
+    """
+    Starts parsing every uploaded file in the pool. Returns one Future of a
+    ParsedFile per upload, in the same order, so each file can be inserted
+    as soon as its own parse is done. Pass them to ``discard`` once done.
+    """
+    executor = get_executor()
+    futures = []
+    for f in uploaded_files:
+        path, is_temporary = _readable_path(f)
+        future = executor.submit(parse_file, path)
+        if is_temporary:
+            future.add_done_callback(lambda _, path=path: os.remove(path))
+        futures.append(future)
+    return futures
+
+
+def _discard_result(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().discard()
+
+
+def discard(futures):
+    """Deletes the spill files of parses that were not (fully) read, now or when they finish."""
+    for future in futures:
+        if future is not None and not future.cancel():
+            future.add_done_callback(_discard_result)
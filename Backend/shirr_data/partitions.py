@@ -0,0 +1,156 @@
+# shirr_data/partitions.py
+"""
+Monthly partitions of SalesTransaction on PostgreSQL.
+
+Migration 0006 turns the table into one partitioned ``BY RANGE (date)``, with
+one partition per calendar month (``<table>_y2025m05``) and a default
+partition for dates no monthly partition covers yet. The primary key
+becomes (id, date), since every unique index must contain the partition
+key; (bill_no, date, item) already does. Queries filtered on date only
+scan the matching months.
+
+``manage.py create_sales_partitions`` creates the coming months ahead of time
+and moves rows that landed in the default partition into their own month.
+``truncate_month`` (``manage.py truncate_sales_month``) empties a month with
+a TRUNCATE of its partition, and ``clear_all`` empties everything with a
+single TRUNCATE. On other backends (SQLite) the table is not partitioned and
+they fall back to ORM deletes.
+"""
+import datetime
+
+from django.db import connection, transaction
+
+from . import rollups, versioning
+from .models import DailyBillRollup, DailySalesRollup, SalesTransaction
+
+TABLE = SalesTransaction._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+AHEAD_MONTHS = 12
+
+
+def month_start(day):
+    return datetime.date(day.year, day.month, 1)
+
+
+def next_month(month):
+    return datetime.date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def parse_month(value):
+    """A 'YYYY-MM' string as the first day of that month; raises ValueError otherwise."""
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise ValueError(f"Expected a month as YYYY-MM, got '{value}'.") from None
+
+
+def partition_name(month):
+    return f"{TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def existing_partitions():
+    """Names of the partitions attached to SalesTransaction (default partition included)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s) ORDER BY child.relname", [TABLE]
+        )
+        return [name for name, in cursor.fetchall()]
+
+
+def default_partition_months():
+    """Months with rows in the default partition, i.e. without their own partition yet."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT DISTINCT date_trunc('month', date)::date FROM {DEFAULT_PARTITION} ORDER BY 1")
+        return [month for month, in cursor.fetchall()]
+
+
+def create_partition(month):
+    """
+    Creates the partition for ``month`` unless it exists. Rows of that month
+    already in the default partition are moved into it. Returns True if it
+    was created.
+    """
+    name, start, end = partition_name(month), month, next_month(month)
+    with transaction.atomic(), connection.cursor() as cursor:
+        if name in existing_partitions():
+            return False
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s)", [start, end])
+        if not cursor.fetchone()[0]:
+            cursor.execute(f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM ('{start}') TO ('{end}')")
+            return True
+        # Attaching checks that the default partition holds no rows of the new range, so they are moved first.
+        cursor.execute(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved", [start, end]
+        )
+        cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')")
+    return True
+
+
+def ensure_partitions(ahead=AHEAD_MONTHS, today=None):
+    """
+    Creates the partitions from the current month to ``ahead`` months later,
+    plus one for every month found in the default partition. Returns the
+    names of the created partitions.
+    """
+    month = month_start(today or datetime.date.today())
+    months = set(default_partition_months())
+    for _ in range(ahead + 1):
+        months.add(month)
+        month = next_month(month)
+    return [partition_name(month) for month in sorted(months) if create_partition(month)]
+
+
+def _delete_rollups(start, end):
+    DailySalesRollup.objects.filter(date__gte=start, date__lt=end).delete()
+    DailyBillRollup.objects.filter(date__gte=start, date__lt=end).delete()
+
+
+def truncate_month(month):
+    """
+    Deletes every transaction of ``month`` and its rollups, and bumps the data
+    generation. Returns the number of deleted transactions.
+    """
+    start, end = month, next_month(month)
+    with transaction.atomic():
+        # Same lock order as ingest: rollups first, then SalesTransaction.
+        rollups.lock()
+        month_rows = SalesTransaction.objects.filter(date__gte=start, date__lt=end)
+        if is_partitioned() and partition_name(month) in existing_partitions():
+            count = month_rows.count()
+            with connection.cursor() as cursor:
+                cursor.execute(f"TRUNCATE {partition_name(month)}")
+        else:
+            count, _ = month_rows.delete()
+        # Rollups are per day, so the month's rows are exactly the month's rollups.
+        _delete_rollups(start, end)
+        if count:
+            versioning.bump_generation()
+    return count
+
+
+def clear_all():
+    """Deletes every transaction and rollup row. Returns the number of deleted transactions."""
+    with transaction.atomic():
+        rollups.lock()
+        if connection.vendor != 'postgresql':
+            count, _ = SalesTransaction.objects.all().delete()
+            DailySalesRollup.objects.all().delete()
+            DailyBillRollup.objects.all().delete()
+            return count
+        count = SalesTransaction.objects.count()
+        tables = [TABLE, DailySalesRollup._meta.db_table, DailyBillRollup._meta.db_table]
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {', '.join(tables)}")
+    return count
@@ -0,0 +1,239 @@
+# shirr_data/rollups.py
+"""
+Maintenance of the DailySalesRollup and DailyBillRollup tables.
+
+The rollups are kept in step with SalesTransaction by calling
+``apply_transactions`` (or ``apply_changes`` for updated rows) in the same
+database transaction that writes the rows. ``rebuild`` recomputes them from
+scratch and ``find_inconsistencies`` compares them against the raw table.
+Both tables are keyed by the dimension ids (see dimensions.py), like the
+transactions.
+
+Writers take ``lock`` first, so two transactions never merge into the
+rollups at the same time (see there).
+"""
+import math
+
+import numpy as np
+import pandas as pd
+from django.db import connection, models, transaction
+from django.db.models import Count, Sum
+
+from .models import DailyBillRollup, DailySalesRollup, SalesTransaction
+
+SALES_KEYS = ['date', 'area_id', 'item_id', 'customer_id', 'manufacturer_id']
+BILL_KEYS = ['date', 'area_id', 'bill_no']
+ID_KEYS = ['area_id', 'item_id', 'customer_id', 'manufacturer_id']
+SALES_MEASURES = ['value', 'quantity', 'free_quantity', 'order_count']
+
+
+def lock():
+    """
+    Makes other rollup writers wait until the current transaction ends;
+    readers are not blocked. ``_merge`` creates the cells it does not find, so
+    two concurrent merges covering the same day would both create the same
+    cell: an IntegrityError, or, when a key part is NULL (NULLs never
+    conflict), a second row for it. Ingest, delete and the partition
+    truncates take the lock before writing SalesTransaction, so every writer
+    locks in the same order. On SQLite there is only one writer at a time
+    anyway.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    tables = ', '.join(model._meta.db_table for model in (DailySalesRollup, DailyBillRollup))
+    with connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {tables} IN SHARE ROW EXCLUSIVE MODE")
+
+
+def _key_frame(rows):
+    """Builds a DataFrame from transaction dicts (or a DataFrame with the fact columns) with plain date / Int64 keys."""
+    df = pd.DataFrame(rows, columns=SALES_KEYS + ['bill_no', 'value', 'quantity', 'free_quantity'])
+    df['date'] = pd.to_datetime(df['date']).dt.date
+    for col in ID_KEYS:
+        df[col] = df[col].astype('Int64')
+    for col in ['value', 'quantity', 'free_quantity']:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    df['order_count'] = 1
+    return df
+
+
+def _clean_key(key):
+    """Missing keys as None and numpy integers as int, as the model fields hold them."""
+    cleaned = []
+    for k in key:
+        if k is pd.NA or (isinstance(k, float) and math.isnan(k)):
+            k = None
+        elif isinstance(k, np.integer):
+            k = int(k)
+        cleaned.append(k)
+    return tuple(cleaned)
+
+
+def _update_cells(model, cells, measures, chunk_size=1000):
+    """
+    Writes the ``measures`` of existing rollup rows. On PostgreSQL one
+    ``UPDATE ... FROM (VALUES ...)`` per chunk; bulk_update's per-row CASE
+    expressions cost more than the rest of an ingest.
+    """
+    if connection.vendor != 'postgresql':
+        model.objects.bulk_update(cells, measures, batch_size=500)
+        return
+    table = model._meta.db_table
+    types = {m: model._meta.get_field(m).db_type(connection) for m in measures}
+    assignments = ', '.join(f"{m} = v.{m}::{types[m]}" for m in measures)
+    row = f"({', '.join(['%s'] * (len(measures) + 1))})"
+    with connection.cursor() as cursor:
+        for start in range(0, len(cells), chunk_size):
+            chunk = cells[start:start + chunk_size]
+            cursor.execute(
+                f"UPDATE {table} SET {assignments} FROM (VALUES {', '.join([row] * len(chunk))}) "
+                f"AS v(id, {', '.join(measures)}) WHERE {table}.id = v.id::bigint",
+                [value for cell in chunk for value in (cell.pk, *(getattr(cell, m) for m in measures))],
+            )
+
+
+def _merge(model, keys, deltas, measures):
+    """Adds the signed ``deltas`` to the existing rollup rows, creating or deleting rows as needed."""
+    if deltas.empty:
+        return
+    existing = {
+        tuple(getattr(obj, k) for k in keys): obj
+        for obj in model.objects.select_for_update().filter(date__in=deltas['date'].unique().tolist())
+    }
+    casts = {m: float if isinstance(model._meta.get_field(m), models.FloatField) else int for m in measures}
+    # The last measure is a row counter; a cell whose counter drops to zero is empty.
+    counter = measures[-1]
+    touched = {}
+    for row in deltas.itertuples(index=False):
+        changes = [getattr(row, m) for m in measures]
+        if not any(changes):
+            # e.g. an updated row whose rollup measures did not change.
+            continue
+        key = _clean_key(tuple(getattr(row, k) for k in keys))
+        obj = touched.get(key) or existing.get(key)
+        if obj is None:
+            if getattr(row, counter) <= 0:
+                continue
+            obj = model(**dict(zip(keys, key)), **{m: 0 for m in measures})
+        touched[key] = obj
+        for m, change in zip(measures, changes):
+            setattr(obj, m, casts[m](getattr(obj, m) + change))
+    alive = [obj for obj in touched.values() if getattr(obj, counter) > 0]
+    emptied = [obj.pk for obj in touched.values() if obj.pk is not None and getattr(obj, counter) <= 0]
+    model.objects.bulk_create([obj for obj in alive if obj.pk is None], batch_size=500)
+    _update_cells(model, [obj for obj in alive if obj.pk is not None], measures)
+    if emptied:
+        model.objects.filter(pk__in=emptied).delete()
+
+
+def _signed_frame(rows, sign):
+    df = _key_frame(rows)
+    if sign < 0:
+        df[SALES_MEASURES] = -df[SALES_MEASURES]
+    return df
+
+
+def _apply(df):
+    if df.empty:
+        return
+    # observed=True: categorical keys (bill_no) must not expand to every category combination.
+    sales = df.groupby(SALES_KEYS, dropna=False, sort=False, observed=True)[SALES_MEASURES].sum().reset_index()
+    bills = (
+        df.groupby(BILL_KEYS, dropna=False, sort=False, observed=True)['order_count'].sum()
+        .rename('line_count').reset_index()
+    )
+    with transaction.atomic():
+        lock()
+        _merge(DailySalesRollup, SALES_KEYS, sales, SALES_MEASURES)
+        _merge(DailyBillRollup, BILL_KEYS, bills, ['line_count'])
+
+
+def apply_transactions(rows, sign=1):
+    """
+    Adds (sign=1) or removes (sign=-1) transactions to/from the rollups.
+
+    ``rows`` is a list of transaction dicts or a DataFrame with at least the
+    rollup keys, bill_no and the value/quantity/free_quantity measures. It must
+    contain exactly the rows that were inserted or deleted.
+    """
+    _apply(_signed_frame(rows, sign))
+
+
+def apply_changes(removed, added):
+    """
+    Removes the ``removed`` and adds the ``added`` transactions in one pass,
+    e.g. the old and new versions of updated rows plus newly inserted ones.
+    """
+    _apply(pd.concat([_signed_frame(removed, -1), _signed_frame(added, 1)], ignore_index=True))
+
+
+def _expected_sales_rollups():
+    return (
+        SalesTransaction.objects.order_by().values(*SALES_KEYS)
+        .annotate(total_value=Sum('value'), total_quantity=Sum('quantity'),
+                  total_free_quantity=Sum('free_quantity'), rows=Count('id'))
+    )
+
+
+def _expected_bill_rollups():
+    return SalesTransaction.objects.order_by().values(*BILL_KEYS).annotate(rows=Count('id'))
+
+
+def rebuild(batch_size=2000):
+    """Recomputes both rollup tables from SalesTransaction. Returns (sales_rows, bill_rows)."""
+    with transaction.atomic():
+        DailySalesRollup.objects.all().delete()
+        DailyBillRollup.objects.all().delete()
+        sales_rows = bill_rows = 0
+        chunk = []
+        for row in _expected_sales_rollups().iterator(chunk_size=batch_size):
+            chunk.append(DailySalesRollup(
+                **{k: row[k] for k in SALES_KEYS}, value=row['total_value'], quantity=row['total_quantity'],
+                free_quantity=row['total_free_quantity'], order_count=row['rows'],
+            ))
+            if len(chunk) >= batch_size:
+                sales_rows += len(DailySalesRollup.objects.bulk_create(chunk)); chunk = []
+        sales_rows += len(DailySalesRollup.objects.bulk_create(chunk)); chunk = []
+        for row in _expected_bill_rollups().iterator(chunk_size=batch_size):
+            chunk.append(DailyBillRollup(**{k: row[k] for k in BILL_KEYS}, line_count=row['rows']))
+            if len(chunk) >= batch_size:
+                bill_rows += len(DailyBillRollup.objects.bulk_create(chunk)); chunk = []
+        bill_rows += len(DailyBillRollup.objects.bulk_create(chunk))
+    return sales_rows, bill_rows
+
+
+def find_inconsistencies(tolerance=0.01):
+    """
+    Compares the rollups against a fresh aggregation of SalesTransaction.
+    Returns a list of human readable problems (empty when consistent).
+    """
+    problems = []
+
+    expected = {
+        tuple(row[k] for k in SALES_KEYS): (row['total_value'], row['total_quantity'], row['total_free_quantity'], row['rows'])
+        for row in _expected_sales_rollups()
+    }
+    actual = {
+        tuple(row[k] for k in SALES_KEYS): (row['value'], row['quantity'], row['free_quantity'], row['order_count'])
+        for row in DailySalesRollup.objects.values(*SALES_KEYS, *SALES_MEASURES)
+    }
+    for key in expected.keys() - actual.keys():
+        problems.append(f"Missing sales rollup for {key}.")
+    for key in actual.keys() - expected.keys():
+        problems.append(f"Stale sales rollup for {key}.")
+    for key in expected.keys() & actual.keys():
+        (ev, eq, ef, ec), (av, aq, af, ac) = expected[key], actual[key]
+        if abs(ev - av) > tolerance or (eq, ef, ec) != (aq, af, ac):
+            problems.append(f"Sales rollup mismatch for {key}: expected {expected[key]}, found {actual[key]}.")
+
+    expected = {tuple(row[k] for k in BILL_KEYS): row['rows'] for row in _expected_bill_rollups()}
+    actual = {tuple(row[k] for k in BILL_KEYS): row['line_count'] for row in DailyBillRollup.objects.values(*BILL_KEYS, 'line_count')}
+    for key in expected.keys() - actual.keys():
+        problems.append(f"Missing bill rollup for {key}.")
+    for key in actual.keys() - expected.keys():
+        problems.append(f"Stale bill rollup for {key}.")
+    for key in expected.keys() & actual.keys():
+        if expected[key] != actual[key]:
+            problems.append(f"Bill rollup mismatch for {key}: expected {expected[key]}, found {actual[key]}.")
+
+    return problems
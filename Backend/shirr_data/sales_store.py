@@ -0,0 +1,191 @@
+# shirr_data/sales_store.py
+"""
+Process-resident columnar copy of SalesTransaction for the pandas dashboard.
+
+With ``settings.SHIRR_DASHBOARD_SOURCE = 'memory'`` the /api/sales-data/
+widgets are computed by analytics.FrameAggregates over this store instead of
+SQL on the rollup tables. Text columns are dictionary-encoded categoricals,
+dates are int32 day numbers (days since 1970-01-01), and quantities and
+values are int32 and float64. A million transactions take a few tens of MB,
+rather than the hundreds that a DataFrame of Python objects built from
+``.values()`` needs. The table stores dimension ids (see dimensions.py);
+they are read as integers and decoded into categoricals of the names.
+
+The store loads on first use. When the data generation (see versioning.py)
+changes it only reads rows with an id above the last one it holds. It
+reloads everything when the row count shows that rows were deleted or
+committed out of id order, and when an upsert changed stored rows in place
+(``versioning.rewritten_generation``). Each process (gunicorn worker, ingest worker)
+has its own copy.
+"""
+import io
+import threading
+
+import numpy as np
+import pandas as pd
+from django.db import connection
+from django.db.models import Count, Max, Min
+from pandas.api.types import union_categoricals
+
+from . import dimensions, versioning
+from .models import Area, Customer, Item, Manufacturer, SalesTransaction
+
+TEXT_COLUMNS = ['customer_name', 'item_name', 'area', 'manufacturer', 'bill_no']
+# Store column -> (table column, dimension model) for the columns stored as ids.
+DIMENSION_COLUMNS = {
+    'customer_name': ('customer_id', Customer),
+    'item_name': ('item_id', Item),
+    'area': ('area_id', Area),
+    'manufacturer': ('manufacturer_id', Manufacturer),
+}
+SOURCE_COLUMNS = [DIMENSION_COLUMNS[col][0] if col in DIMENSION_COLUMNS else col for col in TEXT_COLUMNS]
+INTEGER_COLUMNS = ['quantity', 'free_quantity']
+COLUMNS = TEXT_COLUMNS + ['day'] + INTEGER_COLUMNS + ['value']
+DTYPES = {**{col: 'category' for col in TEXT_COLUMNS}, 'day': 'int32', **{col: 'int32' for col in INTEGER_COLUMNS}, 'value': 'float64'}
+# Rows are read in id ranges of this size, so memory use while loading stays bounded.
+LOAD_CHUNK_IDS = 200_000
+COPY_NULL = r'\N'
+
+
+def _categorical(values):
+    # Sorted object categories, even when every value is missing, so union_categoricals accepts them.
+    present = values[pd.notna(values)]
+    return pd.Categorical(values, categories=pd.Index(np.unique(present.astype(str)) if len(present) else [], dtype=object))
+
+
+def _decode(ids, model):
+    """Dimension ids (int64, -1 for missing) as a categorical of their names, with sorted categories."""
+    present, inverse = np.unique(ids, return_inverse=True)
+    missing = len(present) and present[0] < 0
+    names = dimensions.names(model, present[1:].tolist() if missing else present.tolist())
+    categories = sorted(names.values())
+    position = {name: code for code, name in enumerate(categories)}
+    codes = np.array(([-1] if missing else []) + [position[names[pk]] for pk in present[int(missing):].tolist()], dtype=np.int32)
+    return pd.Categorical.from_codes(codes[inverse], categories=pd.Index(categories, dtype=object))
+
+
+def _empty_frame():
+    return pd.DataFrame({col: _categorical(np.array([], dtype=object)) if col in TEXT_COLUMNS else np.array([], dtype=DTYPES[col])
+                         for col in COLUMNS}, columns=COLUMNS)
+
+
+def _concat(frames):
+    """Concatenates store frames, merging (and re-sorting) the categories of each text column."""
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return _empty_frame()
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    columns = {}
+    for col in COLUMNS:
+        if col in TEXT_COLUMNS:
+            columns[col] = union_categoricals([frame[col] for frame in frames], sort_categories=True)
+        else:
+            columns[col] = np.concatenate([frame[col].to_numpy() for frame in frames])
+    return pd.DataFrame(columns, columns=COLUMNS)
+
+
+def _read_with_copy(low_id, high_id):
+    """PostgreSQL path: the rows streamed with ``COPY TO STDOUT`` and decoded by read_csv straight into the store dtypes."""
+    table = SalesTransaction._meta.db_table
+    # Missing ids as -1, so read_csv parses plain int64 columns.
+    text = [f"COALESCE({source}, -1)" if col in DIMENSION_COLUMNS else source for col, source in zip(TEXT_COLUMNS, SOURCE_COLUMNS)]
+    columns = text + ["date - DATE '1970-01-01'"] + INTEGER_COLUMNS + ['value']
+    sql = (
+        f"COPY (SELECT {', '.join(columns)} FROM {table} WHERE id > {int(low_id)} AND id <= {int(high_id)} ORDER BY id) "
+        f"TO STDOUT WITH (FORMAT csv, NULL '{COPY_NULL}')"
+    )
+    buffer = io.BytesIO()
+    with connection.cursor() as cursor:
+        raw_cursor = cursor.cursor
+        if hasattr(raw_cursor, 'copy_expert'):  # psycopg2
+            raw_cursor.copy_expert(sql, buffer)
+        else:  # psycopg 3
+            with raw_cursor.copy(sql) as copy:
+                for data in copy:
+                    buffer.write(data)
+    if not buffer.tell():
+        return _empty_frame()
+    buffer.seek(0)
+    dtypes = {**DTYPES, **{col: 'int64' for col in DIMENSION_COLUMNS}}
+    frame = pd.read_csv(buffer, header=None, names=COLUMNS, dtype=dtypes, keep_default_na=False, na_values=[COPY_NULL])
+    for col, (_, model) in DIMENSION_COLUMNS.items():
+        frame[col] = _decode(frame[col].to_numpy(), model)
+    frame['bill_no'] = frame['bill_no'].cat.set_categories(pd.Index(sorted(frame['bill_no'].cat.categories), dtype=object))
+    return frame
+
+
+def _read_with_orm(low_id, high_id):
+    """Other backends: the rows as ``values_list`` tuples, converted column by column."""
+    fields = SOURCE_COLUMNS + INTEGER_COLUMNS + ['value', 'date']
+    rows = list(SalesTransaction.objects.filter(id__gt=low_id, id__lte=high_id).order_by('id').values_list(*fields))
+    if not rows:
+        return _empty_frame()
+    records = np.array(rows, dtype=object)
+    columns = {}
+    for i, col in enumerate(TEXT_COLUMNS):
+        if col in DIMENSION_COLUMNS:
+            ids = np.array([-1 if pk is None else pk for pk in records[:, i]], dtype=np.int64)
+            columns[col] = _decode(ids, DIMENSION_COLUMNS[col][1])
+        else:
+            columns[col] = _categorical(records[:, i])
+    columns['day'] = records[:, -1].astype('datetime64[D]').astype(np.int32)
+    for i, col in enumerate(INTEGER_COLUMNS, start=len(TEXT_COLUMNS)):
+        columns[col] = records[:, i].astype(np.int32)
+    columns['value'] = records[:, -2].astype(np.float64)
+    return pd.DataFrame(columns, columns=COLUMNS)
+
+
+def _read(low_id, high_id):
+    """The transactions with ``low_id < id <= high_id`` as one store frame."""
+    read_range = _read_with_copy if connection.vendor == 'postgresql' else _read_with_orm
+    return _concat([read_range(start, min(start + LOAD_CHUNK_IDS, high_id)) for start in range(low_id, high_id, LOAD_CHUNK_IDS)])
+
+
+class SalesStore:
+    """All stored transactions as one columnar frame, kept current by generation."""
+
+    def __init__(self):
+        self.frame = None
+        self.generation = None
+        self.last_id = 0
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """
+        The frame for the current data generation, loading or appending first
+        if needed. Frames are replaced, never modified, so a snapshot stays
+        valid while another request refreshes the store.
+        """
+        generation = versioning.current_generation()
+        with self._lock:
+            if self.frame is None or generation != self.generation:
+                self._refresh(generation)
+            return self.frame
+
+    def _refresh(self, generation):
+        # Read before the rows, so rows committed meanwhile only cause another refresh.
+        stats = SalesTransaction.objects.order_by().aggregate(rows=Count('id'), first_id=Min('id'), last_id=Max('id'))
+        last_id = stats['last_id'] or 0
+        # Rows updated in place keep their ids, so only a full load picks them up.
+        if self.frame is not None and versioning.rewritten_generation() <= self.generation:
+            new_rows = _read(self.last_id, last_id)
+            if len(self.frame) + len(new_rows) == stats['rows']:
+                self.frame = _concat([self.frame, new_rows])
+                self.generation, self.last_id = generation, last_id
+                print(f"Sales store: appended {len(new_rows)} rows, {len(self.frame)} rows in {self.memory_usage() / 1e6:.1f} MB.")
+                return
+        self.frame = _read((stats['first_id'] or 1) - 1, last_id)
+        self.generation, self.last_id = generation, last_id
+        print(f"Sales store: loaded {len(self.frame)} rows in {self.memory_usage() / 1e6:.1f} MB.")
+
+    def memory_usage(self):
+        """Bytes held by the frame, category labels included (0 before the first load)."""
+        return 0 if self.frame is None else int(self.frame.memory_usage(deep=True).sum())
+
+
+_store = SalesStore()
+
+
+def get_store():
+    return _store
@@ -0,0 +1,204 @@
+# shirr_data/schema.py
+"""
+The typed columnar batch passed from the parsers to the loader and the
+analytics.
+
+A batch is a DataFrame with exactly the SalesTransaction columns, in
+MODEL_COLUMNS order, with names where the table stores dimension ids (see
+dimensions.py). Text columns are categoricals with sorted object
+categories, quantities int32, money and percentages float64, and the date
+datetime64[ns].
+``to_batch`` builds one from raw parser output in a single pass, and
+``concat_batches`` / ``batch_records`` are the only ways back out.
+"""
+import functools
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import infer_dtype, union_categoricals
+from pandas.tseries.api import guess_datetime_format
+
+MODEL_COLUMNS = [
+    'customer_name', 'item_name', 'date', 'bill_no', 'quantity', 'free_quantity', 'ptr', 'value',
+    'batch_no', 'expiry', 'area', 'distributor', 'manufacturer', 'pack_size', 'mrp',
+    'product_discount_percent', 'discount_amount', 'customer_discount_percent'
+]
+TEXT_COLUMNS = ['customer_name', 'item_name', 'bill_no', 'batch_no', 'expiry', 'area', 'distributor', 'manufacturer', 'pack_size']
+INTEGER_COLUMNS = ['quantity', 'free_quantity']
+FLOAT_COLUMNS = ['ptr', 'value', 'mrp', 'product_discount_percent', 'discount_amount', 'customer_discount_percent']
+# Missing values in these become 0, as the NOT NULL table columns require.
+ZERO_FILLED_COLUMNS = INTEGER_COLUMNS + ['ptr', 'value']
+DTYPES = {
+    **{col: 'category' for col in TEXT_COLUMNS}, 'date': 'datetime64[ns]',
+    **{col: 'int32' for col in INTEGER_COLUMNS}, **{col: 'float64' for col in FLOAT_COLUMNS},
+}
+
+# Parser column names (see txt_parser) -> model column names.
+RAW_COLUMNS = {
+    'CustomerName': 'customer_name', 'BillNo': 'bill_no', 'Date': 'date', 'ItemName': 'item_name',
+    'BatchNo': 'batch_no', 'Expiry': 'expiry', 'PTR': 'ptr', 'Value': 'value',
+    'NFREE': 'quantity', 'Region': 'area', 'Quantity': 'quantity', 'FREE': 'free_quantity',
+    'Area': 'area', 'Distributor': 'distributor', 'Manufacturer': 'manufacturer',
+    'Pack_Size': 'pack_size', 'MRP': 'mrp',
+}
+INT32_MAX = np.iinfo(np.int32).max
+# The dtype of a text column the parser did not produce.
+_MISSING_TEXT = pd.CategoricalDtype(pd.Index([], dtype=object))
+# Strings pd.to_datetime skips when it guesses the format from the first value.
+_NAT_STRINGS = {'', 'nan', 'nat', 'NaT', 'NAT', 'NaN', 'NAN'}
+
+
+def _text_column(values):
+    """A categorical of the values as strings (the table stores str(value)), missing values kept missing."""
+    if isinstance(values, pd.Categorical):
+        # Parsers that already factorized a column (the TXT byte scanner) hand it over as is.
+        categories = values.categories
+        if categories.dtype == object and infer_dtype(categories) in ('string', 'empty') and categories.is_monotonic_increasing:
+            return _without_unused_categories(values)
+        values = np.asarray(values, dtype=object)
+    values = pd.Series(values, dtype=object, copy=False)
+    missing = values.isna().to_numpy()
+    if infer_dtype(values, skipna=True) not in ('string', 'empty'):
+        values = values.map(str, na_action='ignore')
+    categories = pd.unique(values[~missing].to_numpy())
+    categories.sort()
+    return pd.Categorical(values, categories=pd.Index(categories, dtype=object))
+
+
+def _without_unused_categories(values):
+    """The categorical without the categories none of its values refer to."""
+    codes = values.codes
+    used = np.zeros(len(values.categories) + 1, dtype=bool)
+    used[codes + 1] = True  # -1 (missing) marks the spare first slot
+    used = used[1:]
+    if used.all():
+        return values
+    codes = np.where(codes >= 0, np.cumsum(used)[codes] - 1, -1)
+    return pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(values.categories[used]), validate=False)
+
+
+def _integer_column(values, name):
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'iu':
+        if len(values) and (values.max() > INT32_MAX or values.min() < -INT32_MAX):
+            raise ValueError(f"{name} value out of range for an integer column.")
+        return values.astype(np.int32)
+    numbers = pd.to_numeric(pd.Series(values, copy=False), errors='coerce').fillna(0)
+    if len(numbers) and numbers.abs().max() > INT32_MAX:
+        raise ValueError(f"{name} value out of range for an integer column.")
+    # astype truncates towards zero, like int() does for the ORM.
+    return numbers.to_numpy().astype(np.int32)
+
+
+def _float_column(values, name):
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'iuf':
+        numbers = values.astype(np.float64)
+        if name in ZERO_FILLED_COLUMNS:
+            numbers[np.isnan(numbers)] = 0.0
+        return numbers
+    numbers = pd.to_numeric(pd.Series(values, copy=False), errors='coerce').astype(np.float64)
+    if name in ZERO_FILLED_COLUMNS:
+        numbers = numbers.fillna(0.0)
+    return numbers.to_numpy()
+
+
+def _column(col, values, length):
+    """One typed column; ``values`` is None when the parser did not produce the column."""
+    if col in TEXT_COLUMNS:
+        if values is None:
+            return pd.Categorical.from_codes(np.full(length, -1, dtype=np.int8), dtype=_MISSING_TEXT, validate=False)
+        return _text_column(values)
+    if values is None:
+        return np.zeros(length, dtype=DTYPES[col])
+    if col in INTEGER_COLUMNS:
+        return _integer_column(values, col)
+    return _float_column(values, col)
+
+
+@functools.lru_cache(maxsize=256)
+def _guess_date_format(value):
+    """The format pd.to_datetime would guess from this first value; batches of one report share it."""
+    return guess_datetime_format(value, dayfirst=True)
+
+
+def _dates(values):
+    """pd.to_datetime of the raw Date column, parsed once per distinct value for a categorical."""
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        return pd.to_datetime(values, errors='coerce', dayfirst=True).to_numpy()
+    # Distinct values in order of appearance, so the format is guessed from the same first value.
+    codes, uniques = pd.factorize(values)
+    uniques = np.asarray(uniques, dtype=object)
+    first = uniques[0] if len(uniques) else None
+    date_format = _guess_date_format(first) if type(first) is str and first not in _NAT_STRINGS else None
+    parsed = pd.to_datetime(pd.Series(uniques), errors='coerce', dayfirst=True, format=date_format).to_numpy()
+    return np.where(codes >= 0, parsed[codes], np.datetime64('NaT'))
+
+
+def empty_batch():
+    columns = {col: _column(col, None, 0) for col in MODEL_COLUMNS if col != 'date'}
+    return pd.DataFrame({**columns, 'date': np.array([], dtype='datetime64[ns]')}, columns=MODEL_COLUMNS)
+
+
+def to_batch(raw_data):
+    """
+    Builds a batch from raw parser records (a list of dicts or a DataFrame
+    keyed by the parser's column names). Rows without a parseable Date are
+    dropped; absent numeric columns are 0 and absent text columns missing.
+    """
+    raw = raw_data if isinstance(raw_data, pd.DataFrame) else pd.DataFrame(raw_data)
+    if raw.empty:
+        return empty_batch()
+    dates = _dates(raw['Date'])
+    keep = ~np.isnat(dates)
+    sources = {}
+    for col in raw.columns:
+        sources.setdefault(RAW_COLUMNS.get(col, col), col)
+    every_row = keep.all()
+    columns = {'date': (dates if every_row else dates[keep]).astype('datetime64[ns]', copy=False)}
+    for col in MODEL_COLUMNS:
+        if col != 'date':
+            values = None
+            if col in sources:
+                values = raw[sources[col]].array
+                if not isinstance(values, pd.Categorical):
+                    values = values.to_numpy()
+                if not every_row:
+                    values = values[keep]
+            columns[col] = _column(col, values, int(keep.sum()))
+    return pd.DataFrame(columns, columns=MODEL_COLUMNS)
+
+
+def conform(df):
+    """
+    Restores the batch dtypes of a frame with the model columns, e.g. one read
+    back from Parquet (which returns all-missing categoricals as object).
+    """
+    columns = {}
+    for col in MODEL_COLUMNS:
+        values = df[col]
+        if col in TEXT_COLUMNS:
+            columns[col] = values.array if isinstance(values.dtype, pd.CategoricalDtype) else _text_column(values.to_numpy())
+        else:
+            columns[col] = values.to_numpy().astype(DTYPES[col], copy=False)
+    return pd.DataFrame(columns, columns=MODEL_COLUMNS)
+
+
+def concat_batches(batches):
+    """Concatenates batches, merging the categories of each text column."""
+    batches = [batch for batch in batches if len(batch)]
+    if not batches:
+        return empty_batch()
+    if len(batches) == 1:
+        return batches[0].reset_index(drop=True)
+    columns = {}
+    for col in MODEL_COLUMNS:
+        if col in TEXT_COLUMNS:
+            columns[col] = union_categoricals([batch[col] for batch in batches], sort_categories=True)
+        else:
+            columns[col] = np.concatenate([batch[col].to_numpy() for batch in batches])
+    return pd.DataFrame(columns, columns=MODEL_COLUMNS)
+
+
+def batch_records(batch):
+    """The rows of a batch as dicts of plain Python values, with None for missing ones."""
+    records = batch.astype(object)
+    return records.where(batch.notna(), None).to_dict('records')
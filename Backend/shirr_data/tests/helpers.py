@@ -0,0 +1,21 @@
+from unittest import mock
+
+from django.core.cache import caches
+
+from shirr_data import dimensions, sales_store, versioning
+
+
+def isolate_process_state(test):
+    """
+    Gives ``test`` its own dimension cache, sales store and dashboard cache.
+    They outlive a transaction, so ids and rows a rolled back test created
+    must not carry over to the next one.
+    """
+    for target, name, value in (
+        (dimensions, 'cache', dimensions.DimensionCache()),
+        (sales_store, '_store', sales_store.SalesStore()),
+    ):
+        patcher = mock.patch.object(target, name, value)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+    caches[versioning.CACHE_ALIAS].clear()
@@ -0,0 +1,161 @@
+import contextlib
+import gzip
+import io
+import json
+
+import pandas as pd
+from django.http import JsonResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from shirr_data import ingest, schema, widgets, wire
+from shirr_data.analytics import FrameAggregates
+from shirr_data.management.commands.benchmark_analytics import comparable, reference_widgets, synthetic_batch
+from shirr_data.management.commands.benchmark_wire_format import expand
+from shirr_data.models import SalesTransaction
+from shirr_data.views import _dashboard_data
+
+from .helpers import isolate_process_state
+
+
+def as_json(data):
+    """``data`` as the client receives it."""
+    return json.loads(JsonResponse(data).content)
+
+
+class FrameEngineParityTests(SimpleTestCase):
+    """The shared-groupby engine against the previous per-widget pandas helpers."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.batch = synthetic_batch(20_000)
+
+    def assert_same_as_helpers(self, df):
+        expected, actual = as_json(reference_widgets(df)), as_json(_dashboard_data(FrameAggregates(df)))
+        self.assertEqual(comparable(actual), comparable(expected))
+
+    def test_synthetic_batch(self):
+        self.assert_same_as_helpers(self.batch)
+
+    def test_single_week(self):
+        # Week-over-week widgets are empty with fewer than two weeks.
+        df = self.batch[self.batch['date'] < '2024-01-07'].reset_index(drop=True)
+        self.assert_same_as_helpers(df)
+        self.assertIsNone(_dashboard_data(FrameAggregates(df))['weeklyGrowthTrends'])
+
+    def test_without_free_quantities(self):
+        self.assert_same_as_helpers(self.batch.assign(free_quantity=0))
+
+    def test_selected_widgets(self):
+        full = as_json(_dashboard_data(FrameAggregates(self.batch)))
+        self.assertEqual(list(full), widgets.WIDGET_KEYS)
+        for key in widgets.WIDGET_KEYS:
+            selected = widgets.parse_selection(key)
+            part = as_json(_dashboard_data(FrameAggregates(self.batch), selected))
+            self.assertEqual(part, {k: full[k] for k in full if k in selected})
+
+    def test_unknown_widget(self):
+        with self.assertRaises(ValueError):
+            widgets.parse_selection('kpiMetrics,nope')
+
+
+def store_synthetic_batch(rows):
+    batch = synthetic_batch(rows)
+    batch['customer_name'] = batch['customer_name'].astype(object).fillna('MEDICALS 0').astype('category')
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingest.insert_transactions(batch)
+
+
+class DashboardSourceTests(TestCase):
+    """The rollup-backed dashboard against the pandas engine over the same stored rows."""
+
+    def setUp(self):
+        isolate_process_state(self)
+        store_synthetic_batch(5_000)
+
+    def dashboard(self, source, query=''):
+        with override_settings(SHIRR_DASHBOARD_SOURCE=source), contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.get(f'/api/sales-data/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_rollups_match_memory(self):
+        for query in ('', '?area=AREA 3', '?from=2024-03-01&to=2024-09-30'):
+            self.assertEqual(self.dashboard('rollups', query), self.dashboard('memory', query), query)
+
+    def stored_batch(self):
+        """The stored rows, read back in id order, as a batch."""
+        fields = ['customer__name', 'item__name', 'area__name', 'bill_no', 'date', 'quantity', 'free_quantity', 'value']
+        rows = SalesTransaction.objects.order_by('id').values_list(*fields)
+        columns = ['customer_name', 'item_name', 'area', 'bill_no', 'Date', 'quantity', 'free_quantity', 'value']
+        return schema.to_batch(pd.DataFrame(list(rows), columns=columns))
+
+    def test_rollups_match_helpers(self):
+        expected, actual = comparable(as_json(reference_widgets(self.stored_batch()))), self.dashboard('rollups')
+        self.assertEqual(comparable(actual), expected)
+        # totalSales comes back in cents, whatever order the database added the values in.
+        self.assertEqual(actual['kpiMetrics'], expected['kpiMetrics'])
+
+    def test_selected_widgets(self):
+        full = self.dashboard('rollups')
+        part = self.dashboard('rollups', '?widgets=kpiMetrics,revenueByArea')
+        self.assertEqual(part, {k: full[k] for k in ('totalRecords', 'kpiMetrics', 'revenueByArea')})
+
+
+class SalesDataResponseTests(TestCase):
+    """/api/sales-data/ over HTTP: wire formats, content encodings and conditional requests."""
+
+    def setUp(self):
+        isolate_process_state(self)
+        store_synthetic_batch(2_000)
+
+    def get(self, query='', **headers):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.client.get(f'/api/sales-data/{query}', headers=headers)
+
+    def test_etag_until_generation_changes(self):
+        first = self.get()
+        etag = first['ETag']
+        self.assertIn('no-cache', first['Cache-Control'])
+        self.assertEqual(self.get(if_none_match=etag).status_code, 304)
+        # Every scope, selection and format is a representation of its own.
+        for query in ('?area=AREA 3', '?widgets=kpiMetrics', '?format=compact'):
+            self.assertNotEqual(self.get(query)['ETag'], etag, query)
+        new_row = {'CustomerName': 'MEDICALS NEW', 'BillNo': 'NEW1', 'Date': '01-05-2025', 'ItemName': 'CONGO Tab', 'Quantity': 1,
+                   'FREE': 0, 'PTR': 10.0, 'Value': 10.0, 'Region': 'Kochi', 'Manufacturer': 'SHIRR'}
+        ingest.insert_transactions(schema.to_batch([new_row]))
+        second = self.get(if_none_match=etag)
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], etag)
+        self.assertEqual(second.json()['totalRecords'], first.json()['totalRecords'] + 1)
+        self.assertEqual(self.get(if_none_match=second['ETag']).status_code, 304)
+
+    def test_compact_round_trip(self):
+        plain = self.get().json()
+        compact = self.get('?format=compact').json()
+        self.assertEqual(compact['format'], 'compact')
+        self.assertEqual(expand(compact), plain)
+        self.assertEqual(self.get('?format=xml').status_code, 400)
+
+    def test_content_encodings(self):
+        plain = self.get().content
+        cases = [('gzip', 'gzip', gzip.decompress), ('br;q=0, gzip', 'gzip', gzip.decompress), ('identity', None, None)]
+        # Brotli is optional; without it br is never chosen.
+        if wire.brotli is not None:
+            cases.append(('br;q=1.0, gzip', 'br', wire.brotli.decompress))
+        else:
+            cases.append(('br, gzip', 'gzip', gzip.decompress))
+        for accept, encoding, decompress in cases:
+            with self.subTest(accept=accept):
+                response = self.get(accept_encoding=accept)
+                self.assertEqual(response.get('Content-Encoding'), encoding)
+                self.assertEqual(decompress(response.content) if decompress else response.content, plain)
+                self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_not_modified_varies_on_encoding(self):
+        for accept in ('gzip', 'br', ''):
+            with self.subTest(accept=accept):
+                etag = self.get(accept_encoding=accept)['ETag']
+                response = self.get(accept_encoding=accept, if_none_match=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertIn('Accept-Encoding', response['Vary'])
@@ -0,0 +1,114 @@
+import contextlib
+import importlib.util
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+
+import pandas as pd
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile, SimpleUploadedFile, TemporaryUploadedFile
+from django.test import SimpleTestCase, override_settings
+
+from shirr_data import parse_cache, txt_parser, views
+from shirr_data.management.commands.benchmark_excel_format1 import synthetic_sheet
+
+from .test_excel import workbook
+
+
+def sample_report():
+    with open(os.path.join(settings.BASE_DIR, 'temp.txt'), 'rb') as f:
+        return f.read()
+
+
+def parsed(data):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return txt_parser.parse_sales_file(data, extension='.txt')
+
+
+@skipUnless(importlib.util.find_spec('pyarrow'), "the parse cache needs pyarrow")
+class ParseCacheTests(SimpleTestCase):
+    """Parsed analyze-session uploads kept as Parquet, keyed by content hash and parser version."""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        cache = override_settings(SHIRR_PARSE_CACHE_DIR=self.cache_dir)
+        cache.enable()
+        self.addCleanup(cache.disable)
+        report = sample_report()
+        # Three batches of about the same size, with different rows.
+        self.batches = {
+            f'{month:064d}': parsed(report.replace(b'-05-2025', f'-{month:02d}-2025'.encode())) for month in (4, 5, 6)
+        }
+
+    def entries(self):
+        return sorted(name.split('-')[0] for name in os.listdir(self.cache_dir) if name.endswith(parse_cache.SUFFIX))
+
+    def test_hit_returns_the_parsed_batch(self):
+        file_hash, batch = next(iter(self.batches.items()))
+        self.assertIsNone(parse_cache.get(file_hash))
+        parse_cache.put(file_hash, batch)
+        pd.testing.assert_frame_equal(parse_cache.get(file_hash), batch)
+        self.assertEqual(os.listdir(self.cache_dir), [os.path.basename(parse_cache._path(file_hash))])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        (first, first_batch), (second, second_batch), (third, third_batch) = self.batches.items()
+        parse_cache.put(first, first_batch)
+        entry_bytes = os.path.getsize(parse_cache._path(first))
+        with override_settings(SHIRR_PARSE_CACHE_BYTES=int(entry_bytes * 2.5)):
+            parse_cache.put(second, second_batch)
+            os.utime(parse_cache._path(first), (1000, 1000))
+            os.utime(parse_cache._path(second), (2000, 2000))
+            # A hit makes the first entry the most recently used one.
+            self.assertIsNotNone(parse_cache.get(first))
+            parse_cache.put(third, third_batch)
+        self.assertEqual(self.entries(), sorted([first, third]))
+        self.assertIsNone(parse_cache.get(second))
+
+    def test_parser_version_invalidates(self):
+        file_hash, batch = next(iter(self.batches.items()))
+        parse_cache.put(file_hash, batch)
+        with mock.patch.object(txt_parser, 'PARSER_VERSION', txt_parser.PARSER_VERSION + 1):
+            self.assertIsNone(parse_cache.get(file_hash))
+        self.assertIsNotNone(parse_cache.get(file_hash))
+
+    def test_unreadable_entry_is_discarded(self):
+        file_hash = next(iter(self.batches))
+        with open(parse_cache._path(file_hash), 'wb') as f:
+            f.write(b'not parquet')
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertIsNone(parse_cache.get(file_hash))
+        self.assertEqual(self.entries(), [])
+
+    def test_disabled_without_budget(self):
+        file_hash, batch = next(iter(self.batches.items()))
+        with override_settings(SHIRR_PARSE_CACHE_BYTES=0):
+            parse_cache.put(file_hash, batch)
+        self.assertEqual(self.entries(), [])
+
+
+@override_settings(SHIRR_PARSE_CACHE_BYTES=0)
+class AnalyzeSessionTests(SimpleTestCase):
+    """Uploads up to SHIRR_ANALYZE_MEMORY_BYTES are parsed from memory, bigger ones from a temp file, to the same result."""
+
+    def analyze(self, memory_bytes, query=''):
+        report = sample_report()
+        files = [('may.txt', report), ('june.txt', report.replace(b'-05-2025', b'-06-2025')), ('export.xlsx', workbook(synthetic_sheet(200)))]
+        analysis_frame = mock.Mock(wraps=views._analysis_frame)
+        with override_settings(SHIRR_ANALYZE_MEMORY_BYTES=memory_bytes), mock.patch.object(views, '_analysis_frame', analysis_frame), \
+                contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.post(f'/api/analyze-session/{query}', {'file': [SimpleUploadedFile(name, data) for name, data in files]})
+        self.assertEqual(response.status_code, 200)
+        return response, [type(call.args[0]) for call in analysis_frame.call_args_list]
+
+    def test_spilled_upload_matches_memory(self):
+        for query in ('', '?format=compact&widgets=kpiMetrics,revenueByArea'):
+            with self.subTest(query=query):
+                in_memory, memory_uploads = self.analyze(settings.SHIRR_ANALYZE_MEMORY_BYTES, query)
+                spilled, spilled_uploads = self.analyze(0, query)
+                self.assertEqual(memory_uploads, [InMemoryUploadedFile] * 3)
+                self.assertEqual(spilled_uploads, [TemporaryUploadedFile] * 3)
+                self.assertEqual(spilled.json(), in_memory.json())
+                self.assertGreater(in_memory.json()['totalRecords'], 0)
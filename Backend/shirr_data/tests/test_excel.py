@@ -0,0 +1,151 @@
+import contextlib
+import datetime
+import io
+from unittest import mock
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from shirr_data import txt_parser
+from shirr_data.management.commands.benchmark_excel_format1 import rowwise_format1, synthetic_sheet
+
+
+def workbook(grid):
+    """The bytes of an .xlsx file whose cells are ``grid`` (a list of rows or a DataFrame)."""
+    buffer = io.BytesIO()
+    pd.DataFrame(grid).to_excel(buffer, header=False, index=False)
+    return buffer.getvalue()
+
+
+def quietly(parse, *args):
+    """parse(*args) and what it printed."""
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        result = parse(*args)
+    return result, log.getvalue()
+
+
+FORMAT1_HEADER = ['Sl No', 'Bill No', 'Date', 'Product Name', 'Sel Rate', 'Qty', 'Free Qty', 'Amount']
+
+
+class Format1ParityTests(SimpleTestCase):
+    """The column-wise format 1 parser against the previous row-wise one."""
+
+    def assert_same_as_rowwise(self, df_raw):
+        expected = quietly(rowwise_format1, df_raw)
+        actual = quietly(txt_parser.parse_excel_sales_report_format1, None, df_raw)
+        self.assertEqual(actual, expected)
+        return actual[0]
+
+    def test_synthetic_export(self):
+        records = self.assert_same_as_rowwise(txt_parser.read_excel_sheet(workbook(synthetic_sheet(400))))
+        self.assertGreater(len(records), 300)
+
+    def test_messy_cells(self):
+        may = datetime.datetime(2025, 5, 2)
+        grid = [
+            ['SHIRR DISTRIBUTORS'] + [None] * 7, FORMAT1_HEADER,
+            ['MED - A, KOCHI -', 'extra', None, None, None, None, None, None],
+            [None, None, None, 'Company - ACME-1', None, None, None, None],
+            [1, 'INV1', may, 'CONGO Tab', 25.5, 3, None, 76.5],
+            [2, 'INV1', may, 'CONGO Tab', 25.5, 2, 1, 51.0],    # aggregated with the row above
+            [3, 7, '03-05-2025', 'LESSI TAB', '12.5', ' 4 ', ' ', 50],
+            [4, 'INV2', 'not a date', 'LESSI TAB', 12.5, 1, 0, 12.5],
+            [5.0, 'INV3', may, 'PRO BA Caps', 'abc', 1, 0, 10.0],
+            [6, 'INV3', may, 'PRO BA Caps', 10.0, None, 0, 10.0],
+            [7, 'INV3', may, 'PRO BA Caps', 10.0, True, 0, 10.0],
+            [8, 'INV4', pd.Timestamp('2025-05-09'), 'CITRAPLUS  Liq', -3.7, 2 ** 60, 10 ** 20, float('nan')],
+            [9, 'INV5', datetime.datetime(1200, 1, 1), 'CITRAPLUS  Liq', 1.0, 1, 0, 1.0],
+            ['Sub Total'] + [None] * 6 + [999.0],
+            [' ', None, None, None, None, None, None, None],     # a customer line without text
+            ['x', None, 'Y-Z', None, None, None, None, None],
+            ['10.5', 'INV6', may, 'Company - Z', 1.0, 1, 0, 1.0],  # a company line despite the number
+            ['11', 'INV6', may, 'LESSI TAB', 1.0, 1, 0, 1.0],
+            [None] * 8,
+        ]
+        records = self.assert_same_as_rowwise(txt_parser.read_excel_sheet(workbook(grid)))
+        self.assertEqual({(r['CustomerName'], r['Manufacturer']) for r in records}, {('MED  A, KOCHI  extra', 'ACME-1'), ('x YZ', 'Z')})
+
+    def test_header_after_long_preamble(self):
+        # The header row is searched for a block of rows at a time; put it past the first blocks.
+        for preamble in (0, 63, 64, 200):
+            with self.subTest(preamble=preamble):
+                grid = [[f'line {i}', 'Bill No'] + [None] * 6 for i in range(preamble)] + synthetic_sheet(40).values.tolist()
+                records = self.assert_same_as_rowwise(txt_parser.read_excel_sheet(workbook(grid)))
+                self.assertGreater(len(records), 20)
+        grid = [['Bill No ', ' product NAME', None]] * 3
+        self.assertIsNone(self.assert_same_as_rowwise(txt_parser.read_excel_sheet(workbook(grid))))
+
+    def test_items_without_customer_lines(self):
+        grid = [FORMAT1_HEADER, [None, None, None, 'Company - ACME', None, None, None, None],
+                [1, 'INV1', datetime.datetime(2025, 5, 2), 'CONGO Tab', 25.5, 3, 0, 76.5]]
+        records = self.assert_same_as_rowwise(txt_parser.read_excel_sheet(workbook(grid)))
+        self.assertEqual([(r['CustomerName'], r['Manufacturer']) for r in records], [('Unknown', 'ACME')])
+
+    def test_no_valid_rows(self):
+        grid = [FORMAT1_HEADER, ['MEDICALS'] + [None] * 7, [1, 'INV1', 'x', 'CONGO Tab', 1, 1, 0, 1]]
+        self.assertIsNone(self.assert_same_as_rowwise(txt_parser.read_excel_sheet(workbook(grid))))
+
+    def test_infinite_quantity_raises_like_rowwise(self):
+        grid = [FORMAT1_HEADER, [1, 'INV1', datetime.datetime(2025, 5, 2), 'CONGO Tab', 1.0, float('inf'), 0, 1.0]]
+        df_raw = txt_parser.read_excel_sheet(workbook(grid))
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertRaises(OverflowError, rowwise_format1, df_raw)
+            self.assertRaises(OverflowError, txt_parser.parse_excel_sales_report_format1, None, df_raw)
+
+
+def format2_sheet():
+    # 'Batch' twice: read_excel names the second column 'Batch.1'.
+    grid = [['Date', 'Name of Party', 'Invoice No.', 'Product', 'Pack', 'Batch', 'Expiry', 'Qty', 'Free', 'Rate', 'Value', 'MRP', 'Manufacturer', 'Batch']]
+    for day in range(1, 8):
+        grid.append([datetime.datetime(2025, 5, day), f'MEDICALS {day % 3}', f'I{day}', 'CONGO Tab', '10S', 'B7', 'Mar-27',
+                     day, 'n/a' if day == 4 else 1, 30.0, 30.0 * day, 45.0, 'SHIRR', 'X'])
+    grid.append([None, None, 'I9', 'LESSI TAB'] + [None] * 6 + [1.0, None, None, None])
+    return workbook(grid)
+
+
+def format3_sheet():
+    grid = [['SALES REGISTER'] + [None] * 11, [None] * 12,
+            ['Sl.No', 'Date', 'Customer', 'Route', 'Product Name', 'Company', 'Batch', 'Pack', 'S.Qty', 'M.R.P', 'S.Rate', 'Total']]
+    for i in range(6):
+        grid.append([i + 1, datetime.datetime(2025, 5, i + 1), f'MEDICALS {i % 2}', ['R1', 'R2'][i % 2], 'CONGO Tab', 'SHIRR',
+                     'B1', '10S', i + 1, 45.0, 30.0, 'x' if i == 3 else 30.0 * (i + 1)])
+    grid.append([None] * 10 + ['Grand', 12345.0])
+    return workbook(grid)
+
+
+class HeaderRowTests(SimpleTestCase):
+    """Formats 2 and 3 build their table from the shared sheet instead of reading the workbook again."""
+
+    def assert_same_as_reread(self, data, parse):
+        # The previous parsers read the workbook a second time with the header row set.
+        reread = lambda df_raw, index: pd.read_excel(io.BytesIO(data), header=index)
+        with mock.patch.object(txt_parser, '_with_header_row', reread):
+            expected = quietly(parse, data)
+        actual = quietly(parse, data)
+        self.assertEqual(actual, expected)
+        return actual[0]
+
+    def test_with_header_row_matches_read_excel(self):
+        for data, index in ((format2_sheet(), 0), (format3_sheet(), 2)):
+            pd.testing.assert_frame_equal(
+                txt_parser._with_header_row(txt_parser.read_excel_sheet(data), index),
+                pd.read_excel(io.BytesIO(data), header=index),
+            )
+
+    def test_format2(self):
+        data = format2_sheet()
+        self.assertEqual(txt_parser.detect_excel_format(data), 2)
+        records = self.assert_same_as_reread(data, txt_parser.parse_excel_sales_report_format2)
+        self.assertEqual(len(records), 7)
+        self.assertEqual(records[3]['FREE'], 0)
+
+    def test_format3(self):
+        data = format3_sheet()
+        self.assertEqual(txt_parser.detect_excel_format(data), 3)
+        records = self.assert_same_as_reread(data, txt_parser.parse_excel_sales_report_format3)
+        self.assertEqual([r['Area'] for r in records], ['R1', 'R2'] * 3)
+        self.assertEqual(records[3]['Value'], 0)
+
+    def test_format1_detected(self):
+        self.assertEqual(txt_parser.detect_excel_format(workbook(synthetic_sheet(20))), 1)
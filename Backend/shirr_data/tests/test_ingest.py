@@ -0,0 +1,397 @@
+import contextlib
+import datetime
+import hashlib
+import importlib
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from shirr_data import ingest, parse_pool, partitions, rollups, schema
+from shirr_data.models import DailySalesRollup, DataFile, SalesTransaction
+
+from .helpers import isolate_process_state
+
+
+def record(bill, day, item, value, customer='MEDICALS A', area='Kochi', quantity=1):
+    return {'CustomerName': customer, 'BillNo': bill, 'Date': f'{day:02d}-05-2025', 'ItemName': item,
+            'Quantity': quantity, 'FREE': 0, 'PTR': 10.0, 'Value': value, 'Region': area, 'Manufacturer': 'SHIRR'}
+
+
+RECORDS = [
+    record('B1', 1, 'CONGO Tab', 100.0), record('B1', 1, 'LESSI TAB', 50.0),
+    record('B2', 2, 'CONGO Tab', 30.0, customer='MEDICALS B'), record('B3', 2, 'PRO BA Caps', 20.0, area='Thrissur'),
+    record('B4', 3, 'CONGO Tab', 10.0, customer='MEDICALS C'),
+]
+
+
+def data_file(name):
+    return DataFile.objects.create(file=f'uploads/{name}', file_hash=name.ljust(64, '0'), original_name=name)
+
+
+class IngestTests(TestCase):
+    """Inserts, upserts and per-file deletes keep the rollups equal to a fresh aggregation."""
+
+    def setUp(self):
+        isolate_process_state(self)
+
+    def insert(self, records, source_file=None, mode=ingest.INSERT):
+        return ingest.insert_transactions(schema.to_batch(records), source_file, mode)
+
+    def assertConsistent(self):
+        self.assertEqual(rollups.find_inconsistencies(), [])
+
+    def test_insert_counts_new_and_stored_rows(self):
+        result = self.insert(RECORDS, data_file('a.txt'))
+        self.assertEqual((result.parsed, result.inserted, result.duplicates), (5, 5, 0))
+        result = self.insert(RECORDS[:2] + [record('B5', 4, 'CONGO Tab', 5.0)], data_file('b.txt'))
+        self.assertEqual((result.parsed, result.inserted, result.duplicates), (3, 1, 2))
+        self.assertEqual(SalesTransaction.objects.count(), 6)
+        self.assertConsistent()
+
+    def test_rollups_match_rebuild(self):
+        self.insert(RECORDS)
+        cells = sorted(DailySalesRollup.objects.values_list('date', 'area_id', 'item_id', 'customer_id', 'value', 'order_count'))
+        rollups.rebuild()
+        rebuilt = sorted(DailySalesRollup.objects.values_list('date', 'area_id', 'item_id', 'customer_id', 'value', 'order_count'))
+        self.assertEqual(cells, rebuilt)
+        self.assertEqual(len(cells), 5)
+
+    def test_upsert_updates_changed_rows_only(self):
+        first, second = data_file('a.txt'), data_file('b.txt')
+        self.insert(RECORDS, first)
+        corrected = [record('B1', 1, 'CONGO Tab', 120.0, quantity=2)] + RECORDS[1:] + [record('B5', 4, 'CONGO Tab', 5.0)]
+        result = self.insert(corrected, second, ingest.UPSERT)
+        self.assertEqual((result.inserted, result.updated, result.duplicates), (1, 1, 4))
+        row = SalesTransaction.objects.get(bill_no='B1', item__name='CONGO Tab')
+        self.assertEqual((row.value, row.quantity, row.source_file_id), (120.0, 2, second.pk))
+        self.assertConsistent()
+        # The same corrections again change nothing.
+        result = self.insert(corrected, second, ingest.UPSERT)
+        self.assertEqual((result.inserted, result.updated, result.duplicates), (0, 0, 6))
+
+    def test_insert_mode_keeps_stored_rows(self):
+        self.insert(RECORDS)
+        result = self.insert([record('B1', 1, 'CONGO Tab', 120.0)])
+        self.assertEqual((result.inserted, result.updated, result.duplicates), (0, 0, 1))
+        self.assertEqual(SalesTransaction.objects.get(bill_no='B1', item__name='CONGO Tab').value, 100.0)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            self.insert(RECORDS, mode='merge')
+
+    def test_delete_file_rows(self):
+        first, second = data_file('a.txt'), data_file('b.txt')
+        self.insert(RECORDS[:3], first)
+        self.insert(RECORDS[2:], second)
+        self.assertEqual(ingest.delete_file_rows(first), 3)
+        self.assertEqual(set(SalesTransaction.objects.values_list('bill_no', flat=True)), {'B3', 'B4'})
+        self.assertConsistent()
+        self.assertEqual(ingest.delete_file_rows(second), 2)
+        self.assertFalse(DailySalesRollup.objects.exists())
+
+    def test_ingest_file_replace(self):
+        upload = data_file('a.txt')
+        result = ingest.ingest_file(None, [schema.to_batch(RECORDS[:3]), schema.to_batch(RECORDS[3:])], data_file=upload)
+        self.assertEqual((result.parsed, result.inserted), (5, 5))
+        upload.refresh_from_db()
+        self.assertEqual((upload.rows_parsed, upload.rows_inserted), (5, 5))
+        result = ingest.ingest_file(None, [schema.to_batch(RECORDS[:2])], data_file=upload, replace=True)
+        self.assertEqual((result.deleted, result.inserted), (5, 2))
+        self.assertEqual(SalesTransaction.objects.count(), 2)
+        self.assertConsistent()
+
+    def test_failed_file_is_rolled_back(self):
+        def batches():
+            yield schema.to_batch(RECORDS[:3])
+            raise ValueError("bad line")
+        with self.assertRaises(ValueError):
+            ingest.ingest_file(None, batches(), data_file=data_file('a.txt'))
+        self.assertFalse(SalesTransaction.objects.exists())
+        self.assertFalse(DailySalesRollup.objects.exists())
+
+    def test_file_parsed_before_locking(self):
+        # Other writers wait on the rollup lock until the file's transaction ends, so it must not cover parsing.
+        events = []
+        def batches():
+            for records in (RECORDS[:3], RECORDS[3:]):
+                events.append('parse')
+                yield schema.to_batch(records)
+        for spool_bytes in (0, settings.SHIRR_INGEST_SPOOL_BYTES):
+            events.clear()
+            with self.subTest(spool_bytes=spool_bytes), override_settings(SHIRR_INGEST_SPOOL_BYTES=spool_bytes), \
+                    mock.patch.object(rollups, 'lock', side_effect=lambda: events.append('lock')):
+                result = ingest.ingest_file(None, batches(), data_file=data_file(f'{spool_bytes}.txt'), mode=ingest.UPSERT)
+            self.assertEqual(events[:3], ['parse', 'parse', 'lock'])
+            self.assertEqual(result.parsed, 5)
+        self.assertEqual(SalesTransaction.objects.count(), 5)
+        self.assertConsistent()
+
+
+
+@skipUnless(connection.vendor == 'postgresql', "COPY and ON CONFLICT run on PostgreSQL only")
+class CopyMergeTests(TestCase):
+    """The COPY into the staging table and the ON CONFLICT merge that replace the ORM writes on PostgreSQL."""
+
+    def setUp(self):
+        isolate_process_state(self)
+        copy = mock.patch.object(ingest, '_write_with_copy', wraps=ingest._write_with_copy)
+        self.copy = copy.start()
+        self.addCleanup(copy.stop)
+
+    def insert(self, records, source_file=None, mode=ingest.INSERT):
+        result = ingest.insert_transactions(schema.to_batch(records), source_file, mode)
+        self.assertTrue(self.copy.called)
+        self.assertEqual(rollups.find_inconsistencies(), [])
+        return result
+
+    def test_copy_counts(self):
+        # Quotes, commas and NULLs must survive the CSV; the first of two rows with one key wins.
+        odd = record('B"5', 4, 'CONGO "Tab", 10S', 5.0, customer='MED, A') | {'Manufacturer': None, 'Region': None}
+        result = self.insert(RECORDS + [odd, record('B1', 1, 'CONGO Tab', 999.0)], data_file('a.txt'))
+        self.assertEqual((result.parsed, result.inserted, result.duplicates), (7, 6, 1))
+        row = SalesTransaction.objects.get(bill_no='B"5')
+        self.assertEqual((row.item.name, row.customer.name, row.manufacturer_id, row.area_id), ('CONGO "Tab", 10S', 'MED, A', None, None))
+        self.assertEqual(SalesTransaction.objects.get(bill_no='B1', item__name='CONGO Tab').value, 100.0)
+        result = self.insert(RECORDS[:2] + [record('B6', 5, 'CONGO Tab', 5.0)], data_file('b.txt'))
+        self.assertEqual((result.parsed, result.inserted, result.duplicates), (3, 1, 2))
+        self.assertEqual(SalesTransaction.objects.count(), 7)
+
+    def stale_fingerprints(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {SalesTransaction._meta.db_table} WHERE fingerprint IS DISTINCT FROM {ingest.FINGERPRINT_SQL}")
+            return cursor.fetchone()[0]
+
+    def test_upsert_merge(self):
+        first, second = data_file('a.txt'), data_file('b.txt')
+        self.insert(RECORDS, first)
+        changed = SalesTransaction.objects.get(bill_no='B1', item__name='CONGO Tab')
+        # The rest comes again from another file: the same content, so not an update.
+        corrected = [record('B1', 1, 'CONGO Tab', 120.0, quantity=2)] + RECORDS[1:] + [record('B5', 4, 'CONGO Tab', 5.0)]
+        result = self.insert(corrected, second, ingest.UPSERT)
+        self.assertEqual((result.inserted, result.updated, result.duplicates), (1, 1, 4))
+        row = SalesTransaction.objects.get(pk=changed.pk)
+        self.assertEqual((row.value, row.quantity, row.source_file_id), (120.0, 2, second.pk))
+        self.assertNotEqual(row.fingerprint, changed.fingerprint)
+        self.assertEqual(SalesTransaction.objects.filter(source_file=first).count(), 4)
+        self.assertEqual(self.stale_fingerprints(), 0)
+        result = self.insert(corrected, second, ingest.UPSERT)
+        self.assertEqual((result.inserted, result.updated, result.duplicates), (0, 0, 6))
+
+class PartitionTests(TransactionTestCase):
+    """Month truncates and clear_all; a TRUNCATE cannot run inside the TestCase transaction on PostgreSQL."""
+
+    def setUp(self):
+        isolate_process_state(self)
+        ingest.insert_transactions(schema.to_batch(RECORDS + [record('B9', 1, 'CONGO Tab', 5.0) | {'Date': '30-06-2025'}]))
+
+    def assert_locks_first(self, clear):
+        # Rollups are locked before SalesTransaction everywhere, or a truncate and an ingest can deadlock.
+        stored = []
+        with mock.patch.object(rollups, 'lock', side_effect=lambda: stored.append(SalesTransaction.objects.count())):
+            count = clear()
+        self.assertEqual(stored, [6])
+        return count
+
+    def test_truncate_month(self):
+        self.assertEqual(self.assert_locks_first(lambda: partitions.truncate_month(datetime.date(2025, 5, 1))), 5)
+        self.assertEqual(list(SalesTransaction.objects.values_list('bill_no', flat=True)), ['B9'])
+        self.assertEqual(rollups.find_inconsistencies(), [])
+
+    def test_clear_all(self):
+        self.assertEqual(self.assert_locks_first(partitions.clear_all), 6)
+        self.assertFalse(SalesTransaction.objects.exists())
+        self.assertFalse(DailySalesRollup.objects.exists())
+
+
+    @skipUnless(connection.vendor == 'postgresql', "SalesTransaction is partitioned on PostgreSQL only")
+    def test_partitions(self):
+        may, june = datetime.date(2025, 5, 1), datetime.date(2025, 6, 1)
+        self.assertEqual(partitions.default_partition_months(), [may, june])
+        created = partitions.ensure_partitions(ahead=0, today=may)
+        for name in created:
+            self.addCleanup(drop_table, name)
+        self.assertEqual(created, [partitions.partition_name(may), partitions.partition_name(june)])
+        self.assertEqual(partitions.default_partition_months(), [])
+        self.assertEqual(count_rows(partitions.partition_name(may)), 5)
+        self.assertEqual(partitions.ensure_partitions(ahead=0, today=may), [])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.assert_locks_first(lambda: partitions.truncate_month(may)), 5)
+        self.assertIn(f"TRUNCATE {partitions.partition_name(may)}", [query['sql'] for query in queries])
+        self.assertEqual(count_rows(partitions.partition_name(june)), 1)
+        self.assertEqual(rollups.find_inconsistencies(), [])
+
+
+def count_rows(table):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {table}")
+        return cursor.fetchone()[0]
+
+
+def drop_table(table):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {table} CASCADE")
+
+
+@skipUnless(connection.vendor == 'postgresql', "Migration 0006 only changes PostgreSQL")
+class PartitionMigrationTests(TransactionTestCase):
+    """
+    Migration 0006 on a table built from the 0005 model state. Later
+    migrations cannot be reversed, so it runs on a copy named PROBE.
+    """
+
+    PROBE = 'shirr_data_partition_probe'
+
+    def setUp(self):
+        self.apps = MigrationLoader(connection).project_state(('shirr_data', '0005_dashboard_filters')).apps
+        self.model = self.apps.get_model('shirr_data', 'SalesTransaction')
+        self.model._meta.db_table = self.PROBE
+        self.addCleanup(drop_table, self.PROBE)
+        with connection.schema_editor() as editor:
+            editor.create_model(self.model)
+
+    def names(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'u')", [self.PROBE])
+            constraints = sorted(name for name, in cursor.fetchall())
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", [self.PROBE])
+            return constraints, sorted(name for name, in cursor.fetchall())
+
+    def rows(self):
+        return sorted(self.model.objects.values_list('id', 'bill_no', 'date', 'item_name', 'value'))
+
+    def test_rows_and_names_kept(self):
+        days = [datetime.date(2019, 12, 31), datetime.date(2025, 5, 1), datetime.date(2025, 5, 31), datetime.date(2025, 6, 1)]
+        self.model.objects.bulk_create(
+            self.model(customer_name='MEDICALS A', item_name=f'ITEM {i}', date=day, bill_no=f'B{i}', quantity=1, free_quantity=0, ptr=1.0, value=i)
+            for i, day in enumerate(days * 3)
+        )
+        # New ids continue after the last one handed out, even once it is deleted.
+        last_id = self.model.objects.order_by('-id').first().id
+        self.model.objects.filter(id=last_id).delete()
+        rows, names = self.rows(), self.names()
+        migration = importlib.import_module('shirr_data.migrations.0006_partition_sales_transactions')
+        with mock.patch.multiple(migration, TABLE=self.PROBE, LEGACY_TABLE=f'{self.PROBE}_unpartitioned'), \
+                connection.schema_editor() as editor:
+            migration.partition_sales_transactions(self.apps, editor)
+        # The months with rows, the current month and the next twelve, and the default partition.
+        months = {partitions.month_start(day) for day in days}
+        month = partitions.month_start(datetime.date.today())
+        for _ in range(migration.AHEAD_MONTHS + 1):
+            months.add(month)
+            month = partitions.next_month(month)
+        expected = sorted([f"{self.PROBE}_y{month.year:04d}m{month.month:02d}" for month in months] + [f"{self.PROBE}_default"])
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [self.PROBE])
+            self.assertEqual(cursor.fetchone()[0], 'p')
+            cursor.execute(
+                "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE pg_inherits.inhparent = to_regclass(%s) ORDER BY child.relname", [self.PROBE]
+            )
+            self.assertEqual([name for name, in cursor.fetchall()], expected)
+        self.assertEqual(count_rows(f"{self.PROBE}_default"), 0)
+        self.assertEqual(self.rows(), rows)
+        self.assertEqual(self.names(), names)
+        added = self.model.objects.create(customer_name='MEDICALS A', item_name='ITEM', date=days[1], bill_no='B', quantity=1, free_quantity=0, ptr=1.0, value=1)
+        self.assertGreater(added.id, last_id)
+
+def sample_report():
+    with open(os.path.join(settings.BASE_DIR, 'temp.txt'), 'rb') as f:
+        return f.read()
+
+
+class UploadViewTests(TransactionTestCase):
+    """
+    The upload view end to end. A TransactionTestCase, since the view
+    inserts on a thread with its own database connection.
+    """
+
+    def setUp(self):
+        isolate_process_state(self)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.uploads = os.path.join(media_root, 'uploads')
+
+    def upload(self, *files, query='', **fields):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.client.post(f'/api/upload/{query}', {'file': [SimpleUploadedFile(name, data) for name, data in files], **fields})
+
+    def stored_files(self):
+        return sorted(name for name in os.listdir(self.uploads) if name != 'incoming') if os.path.isdir(self.uploads) else []
+
+    def test_upload_and_duplicates(self):
+        report = sample_report()
+        response = self.upload(('may.txt', report), ('may copy.txt', report), ('notes.txt', b'nothing to parse\n'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertGreater(data['inserted'], 0)
+        self.assertIn("1 file(s) were skipped as duplicates: may copy.txt.", data['message'])
+        self.assertIn("1 file(s) were stored but not parsed: notes.txt.", data['message'])
+        self.assertEqual(len(self.stored_files()), 2)
+        self.assertEqual(rollups.find_inconsistencies(), [])
+
+        response = self.upload(('again.txt', report))
+        self.assertIn("skipped as duplicates: again.txt.", response.json()['message'])
+        self.assertEqual(len(self.stored_files()), 2)
+
+    def test_files_keep_their_original_name(self):
+        self.upload(('May report.txt', sample_report()))
+        files = self.client.get('/api/files/').json()['files']
+        self.assertEqual([f['file'] for f in files], ['May report.txt'])
+        self.assertGreater(files[0]['rowsStored'], 0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.delete(f"/api/files/{files[0]['id']}/")
+        self.assertTrue(response.json()['message'].startswith("Deleted May report.txt and its "))
+        self.assertEqual(self.stored_files(), [])
+        self.assertFalse(SalesTransaction.objects.exists())
+
+    def test_bad_mode_leaves_no_files(self):
+        for query, fields in (('?mode=merge', {}), ('', {'mode': 'merge'})):
+            response = self.upload(('may.txt', sample_report()), query=query, **fields)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(self.stored_files(), [])
+        self.assertFalse(DataFile.objects.exists())
+
+    def test_rejected_upload_keeps_copy_it_did_not_create(self):
+        # A concurrent upload of the same bytes stored this copy and has not created its DataFile yet.
+        report = sample_report()
+        os.makedirs(self.uploads)
+        stored_name = f"{hashlib.sha256(report).hexdigest()}.txt"
+        with open(os.path.join(self.uploads, stored_name), 'wb') as f:
+            f.write(report)
+        response = self.upload(('may.txt', report), mode='merge')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stored_files(), [stored_name])
+
+    def test_upsert_upload(self):
+        report = sample_report()
+        first = self.upload(('may.txt', report)).json()
+        # A re-sent report: other bytes, the same rows.
+        data = self.upload(('may resent.txt', report + b'\n'), mode='upsert').json()
+        self.assertEqual((data['inserted'], data['updated'], data['duplicates']), (0, 0, first['inserted'] + first['duplicates']))
+
+    def test_parse_pool_matches_in_process_parsing(self):
+        report = sample_report()
+        files = [('may.txt', report), ('may copy.txt', report), ('june.txt', report.replace(b'-05-2025', b'-06-2025'))]
+        expected = self.upload(*files).json()
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.client.get('/api/clear-data/')
+        shutil.rmtree(self.uploads)
+        with override_settings(SHIRR_PARSE_WORKERS=2), mock.patch.object(parse_pool, '_executor', None):
+            try:
+                actual = self.upload(*files).json()
+            finally:
+                parse_pool.get_executor().shutdown()
+        self.assertEqual(actual, expected)
+        self.assertEqual(rollups.find_inconsistencies(), [])
@@ -0,0 +1,80 @@
+import contextlib
+import io
+import os
+import random
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from shirr_data import parse_pool, txt_parser
+from shirr_data.management.commands.benchmark_pdf_parsing import scanning_records, synthetic_report
+
+
+def sample_text():
+    """The text of a real report, as dumped by the old debug output (the first two lines are a banner)."""
+    with open(os.path.join(settings.BASE_DIR, 'pdf_debug_output.txt'), encoding='utf-8') as f:
+        return '\n'.join(f.read().split('\n')[2:])
+
+
+def parse_text(raw_text):
+    """parse_pdf_sales_report on a report whose extracted text is ``raw_text``."""
+    with mock.patch.object(txt_parser, 'extract_text_from_pdf', return_value=raw_text), contextlib.redirect_stdout(io.StringIO()):
+        return txt_parser.parse_pdf_sales_report(b'')
+
+
+class SinglePassParityTests(SimpleTestCase):
+    """The single-pass record walk against the previous forward-scanning loop."""
+
+    def test_sample_report(self):
+        raw_text = sample_text()
+        records = parse_text(raw_text)
+        self.assertEqual(records, scanning_records(raw_text))
+        self.assertGreater(len(records), 100)
+
+    def test_damaged_reports(self):
+        lines = sample_text().split('\n')
+        rng = random.Random(7)
+        for _ in range(30):
+            damaged = [line for line in lines if rng.random() > 0.05]
+            for _ in range(20):
+                damaged.insert(rng.randrange(len(damaged)), rng.choice(['12/05/25', 'P2526-1', '1,2.3', 'Customer', 'Cus. Total', txt_parser.PDF_MANUFACTURER]))
+            raw_text = '\n'.join(damaged)
+            self.assertEqual(parse_text(raw_text) or [], scanning_records(raw_text))
+
+    def test_synthetic_report_with_broken_pages(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'report.pdf')
+            synthetic_report(path, pages=12, broken_pages=3)
+            with contextlib.redirect_stdout(io.StringIO()):
+                raw_text = txt_parser.extract_text_from_pdf(path)
+                records = txt_parser.parse_pdf_sales_report(path)
+        self.assertEqual(records, scanning_records(raw_text))
+
+    def test_empty_text(self):
+        self.assertFalse(parse_text(''))
+
+
+class ExtractTextTests(SimpleTestCase):
+
+    def test_unreadable_source(self):
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            self.assertIsNone(txt_parser.extract_text_from_pdf(b'not a pdf'))
+            self.assertIsNone(txt_parser.extract_text_from_pdf('/nonexistent/report.pdf'))
+        self.assertIn("'<9 bytes in memory>'", log.getvalue())
+        self.assertIn("'/nonexistent/report.pdf'", log.getvalue())
+
+    def test_parallel_extraction_matches_serial(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'report.pdf')
+            synthetic_report(path, pages=6, broken_pages=0)
+            serial = txt_parser.extract_text_from_pdf(path)
+            with override_settings(SHIRR_PARSE_WORKERS=2), mock.patch.object(txt_parser, 'PDF_MIN_PAGES_PER_WORKER', 2), \
+                    mock.patch.object(parse_pool, '_executor', None):
+                try:
+                    parallel = txt_parser.extract_text_from_pdf(path)
+                finally:
+                    parse_pool.get_executor().shutdown()
+        self.assertEqual(parallel, serial)
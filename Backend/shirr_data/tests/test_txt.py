@@ -0,0 +1,171 @@
+import os
+import random
+import tempfile
+from unittest import mock
+
+import pandas as pd
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from shirr_data import schema, txt_parser
+
+
+def sample_report():
+    with open(os.path.join(settings.BASE_DIR, 'temp.txt'), 'rb') as f:
+        return f.read()
+
+
+HEADER = b'\x1bEMEDICALS ONE KOCHI\x1bF'
+DATA = b' 8256    13-05-2025 INDOBEST-25 CAPS. 10 S  IMC-0924Feb-26   32.14    10          321.40'
+DATA_WITH_FREE = b' 9567    20-05-2025 CONGO TAB 10 S          LXT-0524Apr-26   32.14     5     1     160.70'
+
+
+class ByteScannerParityTests(SimpleTestCase):
+    """The memory-mapped byte scanner against the line parser it replaces."""
+
+    def line_parser_records(self, source, batch_size=txt_parser.DEFAULT_BATCH_SIZE):
+        return [record for batch in txt_parser.iter_txt_sales_report(source, batch_size) for record in batch]
+
+    def scanned_records(self, source, batch_size=txt_parser.DEFAULT_BATCH_SIZE):
+        frames = list(txt_parser.iter_txt_sales_columns(source, batch_size))
+        for frame in frames:
+            self.assertLessEqual(len(frame), batch_size)
+            self.assertEqual(list(frame.columns), txt_parser.TXT_COLUMNS)
+        return [record for frame in frames for record in frame.to_dict('records')]
+
+    def assert_same_records(self, source, batch_size=txt_parser.DEFAULT_BATCH_SIZE):
+        expected = self.line_parser_records(source, batch_size)
+        self.assertEqual(self.scanned_records(source, batch_size), expected)
+        return expected
+
+    def assert_scanned(self, source, batch_size=txt_parser.DEFAULT_BATCH_SIZE):
+        """assert_same_records, checking that the scanner did not fall back to the line parser."""
+        with mock.patch.object(txt_parser, 'iter_txt_sales_report', side_effect=AssertionError("fell back")):
+            actual = self.scanned_records(source, batch_size)
+        self.assertEqual(actual, self.line_parser_records(source, batch_size))
+        return actual
+
+    def test_sample_report(self):
+        records = self.assert_scanned(sample_report())
+        self.assertGreater(len(records), 300)
+
+    def test_file_path(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'report.txt')
+            with open(path, 'wb') as f:
+                f.write(sample_report())
+            self.assert_scanned(path)
+            open(path, 'wb').close()
+            self.assertEqual(self.assert_scanned(path), [])
+
+    def test_window_boundaries(self):
+        report = sample_report()
+        # Windows of one line each, windows ending inside a line, and a customer
+        # header in one window with its data lines in the next.
+        for window in (1, 37, 90, 91, 1000, len(report) - 1, len(report)):
+            with self.subTest(window=window), mock.patch.object(txt_parser, 'TXT_WINDOW_BYTES', window):
+                self.assert_scanned(report)
+                self.assert_scanned(report, batch_size=7)
+        with mock.patch.object(txt_parser, 'TXT_WINDOW_BYTES', len(HEADER) + 1):
+            records = self.assert_scanned(HEADER + b'\n' + DATA + b'\n')
+        self.assertEqual(records[0]['CustomerName'], 'MEDICALS ONE KOCHI')
+
+    def test_last_line_without_newline(self):
+        self.assert_scanned(HEADER + b'\n' + DATA)
+        self.assert_scanned(DATA)
+
+    def test_crlf_line_breaks(self):
+        records = self.assert_scanned(sample_report().replace(b'\n', b'\r\n'))
+        self.assertGreater(len(records), 300)
+
+    def test_bare_carriage_returns(self):
+        # str line iteration treats a lone \r as a line break; the scanner leaves that to the line parser.
+        self.assert_same_records(HEADER + b'\r' + DATA + b'\r\n' + DATA_WITH_FREE + b'\r')
+
+    def test_short_and_malformed_lines(self):
+        lines = [
+            HEADER, DATA, DATA_WITH_FREE,
+            b' 8256 13-05-2025 X 32.14 10 321.40',           # no batch or expiry
+            b' 8256 13-05-2025 32.14 10 321.40',             # three numbers and no item
+            b' 8256 13-05-2025 32.14 10 1 321.40',           # four numbers and no item
+            b' 8256 13-05-2025 ITEM 32.14 10 321.40 x',      # trailing text
+            b' 8256 13-05-2025 ITEM 32.14 10',               # too few numbers
+            b' 8256 13-05-2025',
+            b' 8256 13/05/2025 ITEM B Feb-26 32.14 10 1 321.40',
+            b' 8256x 13-05-2025 ITEM B Feb-26 32.14 10 1 321.40',
+            b' 8256 13-05-2025 ITEM B Feb-26 .5 7. 1 321.40',
+            b' 8256 13-05-2025 ITEM B Feb-26 32.14 10 1 0000000000000000321.40',
+            b' 8256 13-05-2025\tITEM\tB\tFeb-26\t32.14\t10\t\t321.40',
+            b'\x0c 8256 13-05-2025 ITEM B Feb-26 32.14 10 1 321.40 \x0b',
+            b'\x1bNO E MARKER\x1bF', b'\x1bE  PADDED NAME  \x1bF', b'\x1bE\x1bF', b'\x1bEUNCLOSED',
+            b'CUSTOMER TOTAL                         321.40', b'-' * 80, b'', b'   ',
+            DATA,
+        ]
+        records = self.assert_scanned(b'\n'.join(lines) + b'\n')
+        # The E marker is optional, so \x1bE\x1bF names a customer 'E'.
+        self.assertEqual(records[-1]['CustomerName'], 'E')
+        self.assertEqual(records[1]['FREE'], 1)
+
+    def test_standardized_batches(self):
+        # Scanner frames carry categoricals; to_batch must type them exactly like the line parser's records.
+        report = sample_report() + DATA.replace(b'13-05-2025', b'31-02-2025') + b'\n'
+        for batch_size in (7, txt_parser.DEFAULT_BATCH_SIZE):
+            expected = [txt_parser.standardize_records(batch) for batch in txt_parser.iter_txt_sales_report(report, batch_size)]
+            actual = [txt_parser.standardize_records(frame) for frame in txt_parser.iter_txt_sales_columns(report, batch_size)]
+            pd.testing.assert_frame_equal(schema.concat_batches(actual), schema.concat_batches(expected))
+
+    def test_random_lines(self):
+        tokens = [b'8256', b'13-05-2025', b'1-05-2025', b'INDOBEST-25', b'CAPS.', b'10', b'S', b'IMC-0924Feb-26', b'Feb-26',
+                  b'32.14', b'3', b'.5', b'7.', b'321.40', b'X', b'1a', b'0']
+        blanks = [b' ', b'  ', b'\t', b' \x0c ', b'\x0b']
+        rng = random.Random(12)
+        for _ in range(200):
+            lines = []
+            for _ in range(rng.randint(1, 30)):
+                if rng.random() < 0.15:
+                    lines.append(rng.choice([b'', b' ', b'\x1b']) + rng.choice([b'\x1bE', b'\x1b']) + rng.choice([b'', b'A', b'MED - X ']) + rng.choice([b'\x1bF', b'F', b'']))
+                    continue
+                line = rng.choice([b'', b' ']) + rng.choice([b'8256', b'12', b'1x']) + rng.choice(blanks) + rng.choice([b'13-05-2025', b'1-05-2025'])
+                for _ in range(rng.randint(0, 6)):
+                    line += rng.choice(blanks) + rng.choice(tokens)
+                for _ in range(rng.choice([0, 3, 4])):
+                    line += rng.choice(blanks) + rng.choice([b'32.14', b'3', b'.5', b'7.', b'0'])
+                lines.append(line + rng.choice([b'', b' ', b'\r']))
+            self.assert_same_records(b'\n'.join(lines) + b'\n', batch_size=rng.choice([2, 7, 5000]))
+
+
+class FallbackTests(SimpleTestCase):
+    """Input the scanner hands to the line parser, possibly after it already yielded some rows."""
+
+    def assert_falls_back(self, data, batch_size=5):
+        expected = [record for batch in txt_parser.iter_txt_sales_report(data, batch_size) for record in batch]
+        line_parser = mock.Mock(wraps=txt_parser.iter_txt_sales_report)
+        with mock.patch.object(txt_parser, 'iter_txt_sales_report', line_parser), mock.patch.object(txt_parser, 'TXT_WINDOW_BYTES', 300):
+            actual = [record for frame in txt_parser.iter_txt_sales_columns(data, batch_size) for record in frame.to_dict('records')]
+        line_parser.assert_called_once()
+        self.assertEqual(actual, expected)
+
+    def late(self, line):
+        """The sample report with ``line`` after its first 20 data lines, which the scanner has handed out by then."""
+        lines = sample_report().split(b'\n')
+        return b'\n'.join(lines[:40] + [line] + lines[40:])
+
+    def test_non_ascii(self):
+        self.assert_falls_back(self.late(HEADER.replace(b'ONE', 'ÖNE'.encode())))
+        self.assert_falls_back(self.late(DATA.replace(b'CAPS.', ' CAPS.'.encode())))
+
+    def test_control_bytes(self):
+        self.assert_falls_back(self.late(DATA.replace(b'CAPS.', b'CAPS.\x00')))
+        self.assert_falls_back(self.late(DATA.replace(b'CAPS. ', b'CAPS.\x1c')))
+
+    def test_long_line(self):
+        self.assert_falls_back(self.late(b' ' * txt_parser.TXT_MAX_LINE_BYTES + DATA))
+
+    def test_unparseable_number(self):
+        with self.assertRaises(ValueError):
+            list(txt_parser.iter_txt_sales_report(self.late(DATA.replace(b'32.14', b'1.2.3'))))
+        with self.assertRaises(ValueError):
+            list(txt_parser.iter_txt_sales_columns(self.late(DATA.replace(b'32.14', b'1.2.3'))))
+
+    def test_huge_free_quantity(self):
+        self.assert_falls_back(self.late(DATA_WITH_FREE.replace(b' 1 ', b' 99999999999999999999 ')))
@@ -1,174 +1,866 @@
 import pandas as pd
+import numpy as np
 import re
 import fitz  # PyMuPDF
+import contextlib
+import io
+import mmap
+import multiprocessing
 import os
 from datetime import datetime
+from pandas.api.types import union_categoricals
+
+from . import schema
+
+# Number of records handed downstream at a time by the iter_* parsers. Each
+# batch is standardized and inserted before the next one is read, so memory
+# use does not grow with the size of the file.
+DEFAULT_BATCH_SIZE = 5000
+
+# Bump whenever a parser change alters the batches produced for the same file;
+# parse_cache.py keys cached results by it.
+PARSER_VERSION = 1
+
+
+def _read_source(source):
+    """
+    Parser input as a path or bytes. Every parser takes a path (str or
+    PathLike), bytes, or a binary file object, which is read whole from the
+    start. Uploads already on disk give their path, and a BytesIO (e.g. a
+    small upload held in memory) gives its buffer without a copy.
+    """
+    if isinstance(source, (str, os.PathLike, bytes)):
+        return source
+    if isinstance(source, (bytearray, memoryview)):
+        return bytes(source)
+    if hasattr(source, 'temporary_file_path'):
+        return source.temporary_file_path()
+    stream = getattr(source, 'file', source)
+    if hasattr(stream, 'getvalue'):
+        return stream.getvalue()
+    if source.seekable():
+        source.seek(0)
+    return source.read()
+
+
+def _binary(source):
+    """What pandas and friends accept for a normalized source: the path, or the bytes wrapped in a file object."""
+    return io.BytesIO(source) if isinstance(source, bytes) else source
+
+
+def _describe(source):
+    if isinstance(source, bytes):
+        return f"<{len(source)} bytes in memory>"
+    return os.fspath(source) if isinstance(source, (str, os.PathLike)) else repr(source)
+
+
+def _chunked(records, batch_size):
+    """Splits an already materialized list of records into batches."""
+    for start in range(0, len(records), batch_size):
+        yield records[start:start + batch_size]
+
+
+def _collect(batches, label):
+    """Flattens a batch generator into one list, returning None on failure like the original parsers."""
+    try:
+        records = [record for batch in batches for record in batch]
+    except Exception as e:
+        print(f"A critical error occurred while parsing the {label} file: {e}")
+        return None
+    return records
 
 # ==============================================================================
-# TXT, PDF, CSV, and Excel Format 1 & 2 Parsers (Unchanged)
+# TXT, PDF, CSV, and Excel Format 1 & 2 Parsers
 # ==============================================================================
-def parse_txt_sales_report(file_path):
-    # ... (Your existing TXT parser code is unchanged) ...
-    customer_pattern = re.compile(r"^\x1bE?(.+?)\x1bF$")
-    data_pattern = re.compile(
-        r"^\s*(\d+)\s+" r"(\d{2}-\d{2}-\d{4})\s+" r"(.+?)\s+" r"([\d.]+)\s+" 
-        r"([\d.]+)\s+" r"([\d.]*)\s+" r"([\d.]+)$" 
-    )
-    expiry_pattern = re.compile(r"([A-Za-z]{3}-\d{2})$")
-    extracted_data = []
+TXT_EXPIRY_RE = re.compile(r"([A-Za-z]{3}-\d{2})$")
+TXT_CUSTOMER_RE = re.compile(r"^\x1bE?(.+?)\x1bF$")
+TXT_DATA_RE = re.compile(
+    r"^\s*(\d+)\s+" r"(\d{2}-\d{2}-\d{4})\s+" r"(.+?)\s+" r"([\d.]+)\s+" 
+    r"([\d.]+)\s+" r"([\d.]*)\s+" r"([\d.]+)$" 
+)
+
+
+def _split_txt_item(middle_chunk):
+    """Splits the 'ITEM NAME  BATCH  Mmm-yy' part of a TXT data line into (item, batch, expiry)."""
+    item_name, batch_no, expiry = "Unknown", "N/A", "N/A"
+    expiry_match = TXT_EXPIRY_RE.search(middle_chunk)
+    if expiry_match:
+        expiry = expiry_match.group(1)
+        item_batch_part = middle_chunk[:expiry_match.start()].strip()
+    else:
+        item_batch_part = middle_chunk
+    if ' ' in item_batch_part:
+        parts = item_batch_part.rsplit(None, 1); item_name, batch_no = parts
+    else: item_name = item_batch_part
+    return item_name.strip(), batch_no.strip(), expiry.strip()
+
+
+def _read_txt_line(clean_line):
+    """
+    Classifies one stripped TXT line: ('customer', name), ('data', record
+    without CustomerName) or None for anything else.
+    """
+    customer_match = TXT_CUSTOMER_RE.match(clean_line)
+    if customer_match:
+        return 'customer', customer_match.group(1).strip()
+    data_match = TXT_DATA_RE.match(clean_line)
+    if data_match:
+        bill_no, date, middle_chunk, ptr, nfree, free, value = data_match.groups()
+        item_name, batch_no, expiry = _split_txt_item(middle_chunk)
+        return 'data', {
+            "BillNo": bill_no.strip(), "Date": date.strip(),
+            "ItemName": item_name, "BatchNo": batch_no, "Expiry": expiry,
+            "PTR": float(ptr), "NFREE": int(float(nfree)) if nfree.strip() else 0,
+            "FREE": int(float(free)) if free.strip() else 0, "Value": float(value), "Region": "Thrissur"
+        }
+    return None
+
+
+def _open_text(source):
+    if isinstance(source, bytes):
+        return io.TextIOWrapper(io.BytesIO(source), encoding='utf-8', errors='ignore')
+    return open(source, 'r', encoding='utf-8', errors='ignore')
+
+
+def iter_txt_sales_report(source, batch_size=DEFAULT_BATCH_SIZE):
+    """Yields the records of a TXT customer-wise sales report in lists of at most batch_size."""
+    batch = []
     current_customer = "Unknown"
-    try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                clean_line = line.strip()
-                if not clean_line: continue
-                customer_match = customer_pattern.match(clean_line)
-                if customer_match:
-                    current_customer = customer_match.group(1).strip()
+    with _open_text(_read_source(source)) as f:
+        for line in f:
+            clean_line = line.strip()
+            if not clean_line: continue
+            parsed = _read_txt_line(clean_line)
+            if parsed is None: continue
+            kind, value = parsed
+            if kind == 'customer':
+                current_customer = value
+                continue
+            batch.append({"CustomerName": current_customer, **value})
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def parse_txt_sales_report(source):
+    return _collect(iter_txt_sales_report(source), "TXT")
+
+# Byte-level fast path for the same report.
+#
+# The file is memory-mapped (in-memory input is used as is) and cut into
+# windows of whole lines. Each window is split into whitespace-separated tokens with numpy (token edges are where
+# a byte > 0x20 meets a blank), without building a string per line. A data line is then checked token-wise. Its first token is all
+# digits, its second is a dd-dd-dddd date, and it ends in four [\d.] tokens,
+# or in three with at least two blanks before the last (an empty FREE
+# column). This is exactly when TXT_DATA_RE matches with a non-blank item
+# part. Fields are gathered from the window as fixed-width byte strings and
+# numbers are parsed from those bytes in bulk. Lines the token rules cannot settle (short
+# data lines, unusual customer headers) go through _read_txt_line. A file
+# where bytes and text could disagree (non-ASCII, NUL or separator control
+# characters, bare \r line breaks, very long lines) uses the line parser.
+TXT_WINDOW_BYTES = 4 * 1024 * 1024
+TXT_MAX_LINE_BYTES = 1024
+TXT_COLUMNS = ["CustomerName", "BillNo", "Date", "ItemName", "BatchNo", "Expiry", "PTR", "NFREE", "FREE", "Value", "Region"]
+_TXT_DATE_DIGITS = np.array([0, 1, 3, 4, 6, 7, 8, 9])
+# _TOKEN_MASKS[n] keeps the low n bytes of a little-endian uint64.
+_TOKEN_MASKS = np.array([(1 << (8 * n)) - 1 for n in range(9)], dtype=np.uint64)
+
+
+class _TxtFallback(Exception):
+    """The byte scanner cannot reproduce the line parser for this input."""
+
+
+def _words(padded):
+    """Every eight-byte run of padded as a little-endian uint64, one per byte offset (a view, not a copy)."""
+    return np.ndarray((len(padded) - 7,), dtype='<u8', buffer=padded, strides=(1,))
+
+
+def _factorize_tokens(padded, starts, stops, decode=False):
+    """
+    pd.factorize of the byte strings padded[start:stop]: returns (codes,
+    uniques) with the uniques as a zero-padded fixed-width byte-string array,
+    or decoded as ASCII. Tokens are read eight bytes at a time as integers,
+    masked to their length and hashed, without building Python objects.
+    """
+    lengths = stops - starts
+    count = max(-(-int(lengths.max(initial=0)) // 8), 1)
+    words = _words(padded)
+    # columns[i] holds bytes 8i to 8i + 7 of every token.
+    columns = [words[starts + offset] & _TOKEN_MASKS[np.clip(lengths - offset, 0, 8)] for offset in range(0, 8 * count, 8)]
+    key = columns[0]
+    for column in columns[1:]:
+        key = key * np.uint64(0x100000001b3) ^ column
+    codes, _ = pd.factorize(key)
+    # Codes are numbered in order of first appearance.
+    firsts = np.flatnonzero(codes == np.maximum.accumulate(np.concatenate(([-1], codes)))[:-1] + 1)
+    dtype = f'S{8 * count}'
+    # Up to eight bytes the key is the token itself; beyond that it may collide.
+    if count > 1 and any((column[firsts[codes]] != column).any() for column in columns):
+        codes, uniques = pd.factorize(np.stack(columns, axis=1).view(dtype).ravel().astype(object))
+        uniques = uniques.astype(dtype)
+    else:
+        uniques = np.stack([column[firsts] for column in columns], axis=1).view(dtype).ravel()
+    if decode:
+        uniques = np.array([u.decode('ascii') for u in uniques], dtype=object)
+    return codes, uniques
+
+
+def _used(codes, count):
+    """(which of ``count`` uniques codes refers to, codes renumbered over just those)."""
+    used = np.zeros(count, dtype=bool)
+    used[codes] = True
+    return used, (np.cumsum(used) - 1)[codes]
+
+
+def _byte_categorical(codes, uniques):
+    """
+    uniques[codes] for byte-string uniques from _factorize_tokens, as a
+    categorical of ASCII strings. Only the distinct values used are decoded.
+    """
+    used, codes = _used(codes, len(uniques))
+    uniques = uniques[used]
+    # ASCII bytes sort like the strings they decode to.
+    order = np.argsort(uniques, kind='stable')
+    rank = np.empty(len(order), dtype=np.intp)
+    rank[order] = np.arange(len(order))
+    categories = pd.Index([u.decode('ascii') for u in uniques[order]], dtype=object)
+    return pd.Categorical.from_codes(rank[codes], dtype=pd.CategoricalDtype(categories), validate=False)
+
+
+def _categorical(codes, values):
+    """
+    values[codes] as a pd.Categorical with sorted categories, the form
+    schema.to_batch keeps text columns in. ``values`` may repeat.
+    """
+    inner, uniques = pd.factorize(np.asarray(values, dtype=object))
+    order = np.argsort(uniques, kind='stable')
+    rank = np.empty(len(order), dtype=np.intp)
+    rank[order] = np.arange(len(order))
+    return pd.Categorical.from_codes(rank[inner][codes], dtype=pd.CategoricalDtype(pd.Index(uniques[order], dtype=object)))
+
+
+def _byte_columns(uniques):
+    """
+    A fixed-width byte-string array as a 2-D byte array with byte i of every
+    value in row i, so the per-position loops work on contiguous rows.
+    """
+    return np.ascontiguousarray(uniques.view(np.uint8).reshape(len(uniques), uniques.dtype.itemsize).T)
+
+
+def _parse_numbers(columns):
+    """
+    float() of each cell of _byte_columns() output. A cell with at most 15 digits
+    and one '.' is m / 10**k with both operands exact, which rounds the same
+    way float() does. Anything else goes through numpy's string parser.
+    """
+    digits = columns - ord('0')
+    is_digit = digits < 10
+    count = columns.shape[1]
+    mantissa = np.zeros(count, dtype=np.int64)
+    decimals = np.zeros(count, dtype=np.int64)
+    after_dot = np.zeros(count, dtype=bool)
+    for position in range(columns.shape[0]):
+        mantissa = np.where(is_digit[position], mantissa * 10 + digits[position], mantissa)
+        decimals += is_digit[position] & after_dot
+        after_dot |= columns[position] == ord('.')
+    digit_count = is_digit.sum(axis=0)
+    values = mantissa / 10.0 ** decimals
+    inexact = (digit_count == 0) | (digit_count > 15) | ((columns == ord('.')).sum(axis=0) > 1)
+    if inexact.any():
+        cells = np.ascontiguousarray(columns[:, inexact].T)
+        values[inexact] = cells.view(f'S{cells.shape[1]}').ravel().astype(np.float64)
+    return values
+
+
+def _is_number(columns, digits_only=False):
+    """Whether each cell of _byte_columns() output is [\\d.]+ (or \\d+), ignoring the zero padding."""
+    ok = ((columns - ord('0')) < 10) | (columns == 0)
+    if not digits_only:
+        ok |= columns == ord('.')
+    return ok.all(axis=0)
+
+
+def _txt_window(buffer, start, end):
+    """
+    buffer[start:end] as a uint8 array followed by TXT_MAX_LINE_BYTES + 8 zero
+    bytes, room to read the widest token eight bytes at a time past the end.
+    """
+    window = np.zeros(end - start + TXT_MAX_LINE_BYTES + 8, dtype=np.uint8)
+    window[:end - start] = np.frombuffer(buffer, dtype=np.uint8, count=end - start, offset=start)
+    return window
+
+
+def _scan_txt_window(padded, size):
+    """
+    Scans the lines of one window, the first size bytes of a _txt_window()
+    array. Returns (customer_lines, customer_names, data_lines, data) where
+    data is a dict of columns without CustomerName.
+    """
+    data = padded[:size]
+    # Non-ASCII bytes may decode to whitespace or be dropped by the text decoder.
+    if data.view(np.int8).min() < 0:
+        raise _TxtFallback()
+    controls = np.flatnonzero(data < 0x20)
+    control_bytes = data[controls]
+    # \x00 would be lost in fixed-width byte strings and \x1c-\x1f are whitespace to str.strip().
+    if (control_bytes == 0).any() or ((control_bytes - 0x1c) < 4).any():
+        raise _TxtFallback()
+    returns = controls[control_bytes == ord('\r')]
+    if len(returns) and (returns[-1] == len(data) - 1 or (data[returns + 1] != ord('\n')).any()):
+        raise _TxtFallback()
+    newlines = controls[control_bytes == ord('\n')]
+    line_starts = np.concatenate(([0], newlines + 1))
+    line_stops = np.concatenate((newlines, [len(data)]))
+    if (line_stops - line_starts).max() > TXT_MAX_LINE_BYTES:
+        raise _TxtFallback()
+
+    # Tokens are runs of non-blank bytes; space, \t, \n, \v, \f and \r are blank.
+    text = np.zeros(len(data) + 2, dtype=bool)
+    np.greater(data, ord(' '), out=text[1:-1])
+    text[controls[(control_bytes - ord('\t')) >= 5] + 1] = True
+    edges = np.flatnonzero(text[1:] != text[:-1])
+    starts, stops = edges[0::2], edges[1::2]
+    # No token spans a newline, so a line's tokens end where the next line's begin.
+    first = np.searchsorted(starts, line_starts)
+    count = np.diff(first, append=len(starts))
+    lines = np.flatnonzero(count)
+    first, count = first[lines], count[lines]
+    begin, end = starts[first], stops[first + count - 1]  # the stripped line
+    first_byte = data[begin]
+
+    # Customer headers: \x1bE<name>\x1bF once stripped.
+    is_header = first_byte == 0x1b
+    simple_header = (
+        is_header & (end - begin >= 5) & (data[np.minimum(begin + 1, len(data) - 1)] == ord('E'))
+        & (data[end - 2] == 0x1b) & (data[end - 1] == ord('F'))
+    )
+    header_lines = lines[simple_header]
+    header_names = _factorize_tokens(padded, begin[simple_header] + 2, end[simple_header] - 2, decode=True)
+    slow_lines = [lines[is_header & ~simple_header]]
+
+    # Data lines: a bill number and a date, then at least three more tokens.
+    # Tokens are factorized and checked (and later parsed) once per distinct value.
+    candidate = ((first_byte - ord('0')) < 10) & (count >= 5)
+    lines, count, first = lines[candidate], count[candidate], first[candidate]
+    last = first + count - 1
+    bills = _factorize_tokens(padded, starts[first], stops[first])
+    dates = _factorize_tokens(padded, starts[first + 1], starts[first + 1] + 10)
+    date_bytes = _byte_columns(dates[1].astype('S10'))
+    head_ok = (
+        _is_number(_byte_columns(bills[1]), digits_only=True)[bills[0]] & (stops[first + 1] - starts[first + 1] == 10)
+        & (_is_number(date_bytes[_TXT_DATE_DIGITS], digits_only=True) & (date_bytes[2] == ord('-')) & (date_bytes[5] == ord('-')))[dates[0]]
+    )
+    # The last four tokens, counted from the end of the line (row k is the k-th from the end).
+    tails = last - np.arange(4)[:, None]
+    tail_codes, tail_uniques = _factorize_tokens(padded, starts[tails].ravel(), stops[tails].ravel())
+    tail_codes = tail_codes.reshape(tails.shape)
+    is_numeric = _is_number(_byte_columns(tail_uniques))
+    numeric = is_numeric[tail_codes]
+    tail = count - 2
+    four_tail = head_ok & (tail >= 5) & numeric[0] & numeric[1] & numeric[2] & numeric[3]
+    three_tail = (head_ok & (tail >= 5) & ~four_tail & numeric[0] & numeric[1] & numeric[2]
+                  & (starts[last] - stops[last - 1] >= 2))
+    # With 3 or 4 tokens after the date the item part may be blank; let the regex decide.
+    slow_lines.append(lines[head_ok & ((tail == 3) | (tail == 4))])
+    is_data = four_tail | three_tail
+    data_lines = lines[is_data]
+
+    columns = {}
+    if len(data_lines):
+        rows = np.flatnonzero(is_data)
+        first, last, four = first[rows], last[rows], four_tail[rows]
+        # Every distinct number in the tails of data lines, parsed once.
+        tail_codes = tail_codes[:, rows]
+        used = np.zeros(len(tail_uniques), dtype=bool)
+        used[tail_codes] = True
+        used &= is_numeric
+        tail_numbers = np.zeros(len(tail_uniques))
+        tail_numbers[used] = _parse_numbers(_byte_columns(tail_uniques[used]))
+
+        def number(from_end_four, from_end_three):
+            """The tail number at this distance from the end of four- and three-number lines."""
+            values = np.zeros(len(rows))
+            for from_end, selected in ((from_end_four, four), (from_end_three, ~four)):
+                if from_end is not None:
+                    values[selected] = tail_numbers[tail_codes[from_end, selected]]
+            return values
+
+        nfree, free = number(2, 1), number(1, None)
+        if max(nfree.max(), free.max()) >= 2 ** 63:
+            raise _TxtFallback()  # int(float(x)) would not fit the column; let the line parser decide
+        middles, codes = _factorize_tokens(padded, starts[first + 2], stops[last - np.where(four, 4, 3)], decode=True)
+        items = np.array([_split_txt_item(middle) for middle in codes], dtype=object).reshape(len(codes), 3)
+        columns = {
+            "BillNo": _byte_categorical(bills[0][rows], bills[1]),
+            "Date": _byte_categorical(dates[0][rows], dates[1]),
+            "ItemName": _categorical(middles, items[:, 0]), "BatchNo": _categorical(middles, items[:, 1]),
+            "Expiry": _categorical(middles, items[:, 2]),
+            "PTR": number(3, 2), "NFREE": nfree.astype(np.int64),
+            "FREE": free.astype(np.int64), "Value": number(0, 0),
+        }
+
+    # Lines the token rules could not settle go through the line parser's own logic.
+    header_lines = list(header_lines)
+    if len(header_lines):
+        codes, uniques = header_names
+        names = list(np.array([name.strip() for name in uniques], dtype=object)[codes])
+    else:
+        names = []
+    slow_data_lines, slow_records = [], []
+    for line in np.sort(np.concatenate(slow_lines)):
+        parsed = _read_txt_line(data[line_starts[line]:line_stops[line]].tobytes().decode('ascii').strip())
+        if parsed is None: continue
+        if parsed[0] == 'customer':
+            header_lines.append(line); names.append(parsed[1])
+        else:
+            slow_data_lines.append(line); slow_records.append(parsed[1])
+    if slow_records:
+        merged = pd.concat([pd.DataFrame(columns, columns=TXT_COLUMNS[1:-1]) if columns else None,
+                            pd.DataFrame(slow_records)[TXT_COLUMNS[1:-1]]], ignore_index=True)
+        data_lines = np.concatenate((data_lines, slow_data_lines))
+        order = np.argsort(data_lines, kind='stable')
+        data_lines = data_lines[order]
+        columns = {col: merged[col].to_numpy()[order] for col in TXT_COLUMNS[1:-1]}
+        for col in ("BillNo", "Date", "ItemName", "BatchNo", "Expiry"):
+            columns[col] = _categorical(*pd.factorize(columns[col]))
+    order = np.argsort(np.array(header_lines, dtype=np.int64), kind='stable')
+    return np.array(header_lines, dtype=np.int64)[order], np.array(names, dtype=object)[order], data_lines, columns
+
+
+def _txt_window_frame(buffer, start, end, customer):
+    """DataFrame of the data lines in buffer[start:end] and the customer in effect after them."""
+    header_lines, names, data_lines, data = _scan_txt_window(_txt_window(buffer, start, end), end - start)
+    names = np.concatenate(([customer], names)).astype(object)
+    if not len(data_lines):
+        return None, names[-1]
+    # Each data line belongs to the last customer header above it.
+    customers = _categorical(np.searchsorted(header_lines, data_lines), names)
+    region = _categorical(np.zeros(len(data_lines), dtype=np.intp), ["Thrissur"])
+    data = {"CustomerName": customers, **data, "Region": region}
+    return pd.DataFrame(data, columns=TXT_COLUMNS, copy=False), names[-1]
+
+
+def _concat_frames(frames):
+    """pd.concat for window frames, merging the categories of text columns instead of falling back to object."""
+    if len(frames) == 1:
+        return frames[0]
+    columns = {}
+    for col in TXT_COLUMNS:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            columns[col] = union_categoricals([frame[col] for frame in frames], sort_categories=True)
+        else:
+            columns[col] = np.concatenate([frame[col].to_numpy() for frame in frames])
+    return pd.DataFrame(columns, columns=TXT_COLUMNS, copy=False)
+
+
+@contextlib.contextmanager
+def _txt_bytes(source):
+    """The report's bytes: in-memory input itself, or a read-only memory map of the file."""
+    if isinstance(source, bytes):
+        yield source
+        return
+    with open(source, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+def _iter_txt_frames(source, batch_size):
+    with _txt_bytes(source) as buffer:
+        customer, pending, start = "Unknown", None, 0
+        while start < len(buffer):
+            # Windows end right after a newline so every line is whole.
+            end = buffer.find(b'\n', min(start + TXT_WINDOW_BYTES, len(buffer)) - 1) + 1 or len(buffer)
+            try:
+                frame, customer = _txt_window_frame(buffer, start, end, customer)
+            except ValueError as e:  # e.g. '1.2.3' in a number column; the line parser reports it
+                raise _TxtFallback() from e
+            start = end
+            if frame is None:
+                continue
+            # Only the batch that spans two windows is concatenated; the rest are slices of one window.
+            head = 0
+            if pending is not None:
+                head = batch_size - len(pending)
+                pending = _concat_frames([pending, frame.iloc[:head]])
+                if len(pending) < batch_size:
                     continue
-                data_match = data_pattern.match(clean_line)
-                if data_match:
-                    bill_no, date, middle_chunk, ptr, nfree, free, value = data_match.groups()
-                    item_name, batch_no, expiry = "Unknown", "N/A", "N/A"
-                    expiry_match = expiry_pattern.search(middle_chunk)
-                    if expiry_match:
-                        expiry = expiry_match.group(1)
-                        item_batch_part = middle_chunk[:expiry_match.start()].strip()
-                    else:
-                        item_batch_part = middle_chunk
-                    if ' ' in item_batch_part:
-                        parts = item_batch_part.rsplit(None, 1); item_name, batch_no = parts
-                    else: item_name = item_batch_part
-                    extracted_data.append({
-                        "CustomerName": current_customer, "BillNo": bill_no.strip(), "Date": date.strip(),
-                        "ItemName": item_name.strip(), "BatchNo": batch_no.strip(), "Expiry": expiry.strip(),
-                        "PTR": float(ptr), "NFREE": int(float(nfree)) if nfree.strip() else 0,
-                        "FREE": int(float(free)) if free.strip() else 0, "Value": float(value), "Region": "Thrissur"
-                    })
+                yield pending
+            full = head + (len(frame) - head) // batch_size * batch_size
+            for offset in range(head, full, batch_size):
+                yield frame.iloc[offset:offset + batch_size].reset_index(drop=True)
+            pending = frame.iloc[full:].reset_index(drop=True) if full < len(frame) else None
+        if pending is not None:
+            yield pending
+
+
+def iter_txt_sales_columns(source, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Yields the TXT report as DataFrames of at most batch_size rows, with the
+    same columns and values as the records of iter_txt_sales_report. Uses the
+    memory-mapped byte scanner and falls back to the line parser for files
+    the scanner cannot handle exactly.
+    """
+    source, emitted = _read_source(source), 0
+    try:
+        for frame in _iter_txt_frames(source, batch_size):
+            emitted += len(frame)
+            yield frame
+        return
+    except _TxtFallback:
+        pass
+    # Continue with the line parser after the rows that were already handed out.
+    for batch in iter_txt_sales_report(source, batch_size):
+        if emitted >= len(batch):
+            emitted -= len(batch)
+            continue
+        batch, emitted = batch[emitted:], 0
+        yield pd.DataFrame(batch)
+
+PDF_DISTRIBUTOR = "M/S.PECHIYAPPA CHEMICALS"
+PDF_MANUFACTURER = "SHIRR PHARMACEUTICALA Pvt Ltd"
+PDF_DATE_RE = re.compile(r"^\d{2}/\d{2}/\d{2}$")
+PDF_NUMBER_RE = re.compile(r'^-?[\d,.]+$')
+# Text extraction is spread over the parse pool only for reports with at
+# least this many pages per worker; below that, process startup dominates.
+PDF_MIN_PAGES_PER_WORKER = 50
+
+
+def _open_pdf(source):
+    return fitz.open(stream=source, filetype='pdf') if isinstance(source, bytes) else fitz.open(source)
+
+
+def _pdf_pages_text(source, start, stop):
+    """Text of pages [start, stop); run in parse pool workers for big reports."""
+    with _open_pdf(source) as doc:
+        return "".join(doc[page].get_text("text") for page in range(start, stop))
+
+
+def extract_text_from_pdf(source):
+    """
+    Text of every page, in page order. Big reports are split into page ranges
+    that are extracted in parallel, unless we already run in a pool worker.
+    """
+    # Reported as given if reading the source fails.
+    path = source
+    try:
+        path = _read_source(source)
+        with _open_pdf(path) as doc:
+            page_count = doc.page_count
+        from . import parse_pool  # parse_pool imports this module
+        workers = min(parse_pool.pool_size(), page_count // PDF_MIN_PAGES_PER_WORKER)
+        if workers < 2 or multiprocessing.parent_process() is not None:
+            return _pdf_pages_text(path, 0, page_count)
+        bounds = [page_count * w // workers for w in range(workers + 1)]
+        executor = parse_pool.get_executor()
+        return "".join(executor.map(_pdf_pages_text, [path] * workers, bounds[:-1], bounds[1:]))
     except Exception as e:
-        print(f"A critical error occurred while parsing the TXT file: {e}")
+        print(f"Error reading PDF file at '{_describe(path)}': {e}")
         return None
-    return extracted_data
 
-def parse_pdf_sales_report(pdf_path):
-    # ... (Your existing PDF parser code is unchanged) ...
-    def extract_text_from_pdf(path):
-        try:
-            with fitz.open(path) as doc: return "".join(page.get_text("text") for page in doc)
-        except Exception as e:
-            print(f"Error reading PDF file at '{path}': {e}"); return None
-    distributor, manufacturer, records = "M/S.PECHIYAPPA CHEMICALS", "SHIRR PHARMACEUTICALA Pvt Ltd", []
+
+def _next_index(flags):
+    """For every position, the first index at or after it whose flag is set (len(flags) when none is)."""
+    following = [len(flags)] * (len(flags) + 1)
+    for j in range(len(flags) - 1, -1, -1):
+        following[j] = j if flags[j] else following[j + 1]
+    return following
+
+
+def _parse_float(text):
+    try: float(text); return True
+    except ValueError: return False
+
+
+def iter_pdf_sales_report(source, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Yields the records of a PDF area/party/billwise report in lists of at most batch_size.
+
+    A record is: item name, dd/mm/yy date, pack size, 3 or 4 numbers, a P25
+    bill number, MRP/discount numbers, and the manufacturer line. Every line
+    is classified once up front; the walk then finds the bill and manufacturer
+    line of a candidate record by lookup instead of scanning ahead, so a
+    malformed stretch costs linear rather than quadratic time.
+    """
+    distributor, manufacturer, records = PDF_DISTRIBUTOR, PDF_MANUFACTURER, []
     current_customer, current_area = "Unknown", "Unknown"
-    try:
-        raw_text = extract_text_from_pdf(pdf_path)
-        if not raw_text: return None
-        lines = [line.strip() for line in raw_text.strip().split('\n') if line.strip()]
-        i = 0
-        while i < len(lines):
-            line = lines[i]
-            if line == "Customer" and i > 0: current_customer = lines[i-1]; i += 1; continue
-            if line == "Area" and i > 0: current_area = lines[i-1]; i += 1; continue
-            if line == "Cus. Total": i += 2; continue
-            is_start_of_record = (i + 1 < len(lines)) and re.match(r"^\d{2}/\d{2}/\d{2}$", lines[i+1]) and "Customer" not in lines[i] and "Area" not in lines[i]
-            if is_start_of_record:
-                try:
-                    ItemName, date, pack_size = lines[i], lines[i+1], lines[i+2]
-                    num_block_end_idx = i + 3
-                    while num_block_end_idx < len(lines) and not lines[num_block_end_idx].startswith("P25"): num_block_end_idx += 1
-                    if num_block_end_idx >= len(lines): i += 1; continue
-                    bill_no = lines[num_block_end_idx]
-                    number_lines = [n.replace(',', '') for n in lines[i+3:num_block_end_idx]]
-                    qty, free_qty, value, rate = 0.0, 0.0, 0.0, 0.0
-                    if len(number_lines) == 4: qty, free_qty, value, rate = map(float, number_lines)
-                    elif len(number_lines) == 3: qty, value, rate = map(float, number_lines); free_qty = 0.0
-                    else: i += 1; continue
-                    mrp_block_end_idx = num_block_end_idx + 1
-                    while mrp_block_end_idx < len(lines) and manufacturer not in lines[mrp_block_end_idx]: mrp_block_end_idx += 1
-                    if mrp_block_end_idx >= len(lines): i += 1; continue
-                    mrp = [float(n.replace(',', '')) for n in lines[num_block_end_idx + 1:mrp_block_end_idx] if re.match(r'^-?[\d,.]+$', n)]
-                    i = mrp_block_end_idx
-                    records.append({
-                        "Distributor": distributor, "Area": current_area, "CustomerName": current_customer,
-                        "ItemName": ItemName, "Manufacturer": manufacturer, "Date": date, "BillNo": bill_no,
-                        "Pack_Size": pack_size, "Quantity": int(qty), "FREE": int(free_qty), "PTR": rate,
-                        "Value": value, "MRP": mrp[0] if mrp else 0.0,
-                    })
-                    continue
-                except (IndexError, ValueError) as e: i += 1
-            else: i += 1
-    except Exception as e:
-        print(f"A critical error occurred while parsing the PDF file: {e}"); return None
-    return records
+    raw_text = extract_text_from_pdf(source)
+    if not raw_text: return
+    lines = [line.strip() for line in raw_text.strip().split('\n') if line.strip()]
+    n = len(lines)
+    is_date = [PDF_DATE_RE.match(line) is not None for line in lines]
+    next_bill = _next_index([line.startswith("P25") for line in lines])
+    next_manufacturer = _next_index([manufacturer in line for line in lines])
+    is_number = [PDF_NUMBER_RE.match(line) is not None for line in lines]
+    next_number = _next_index(is_number)
+    next_bad_number = _next_index([number and not _parse_float(line.replace(',', '')) for line, number in zip(lines, is_number)])
+
+    def read_record(i):
+        """The record starting at line i and the index to continue from, or None if it is malformed."""
+        if i + 2 >= n: return None
+        bill_idx = next_bill[i + 3]
+        if bill_idx >= n or bill_idx - (i + 3) not in (3, 4): return None
+        try: numbers = [float(line.replace(',', '')) for line in lines[i + 3:bill_idx]]
+        except ValueError: return None
+        if len(numbers) == 4: qty, free_qty, value, rate = numbers
+        else: (qty, value, rate), free_qty = numbers, 0.0
+        manufacturer_idx = next_manufacturer[bill_idx + 1]
+        if manufacturer_idx >= n or next_bad_number[bill_idx + 1] < manufacturer_idx: return None
+        mrp_idx = next_number[bill_idx + 1]
+        return {
+            "Distributor": distributor, "Area": current_area, "CustomerName": current_customer,
+            "ItemName": lines[i], "Manufacturer": manufacturer, "Date": lines[i + 1], "BillNo": lines[bill_idx],
+            "Pack_Size": lines[i + 2], "Quantity": int(qty), "FREE": int(free_qty), "PTR": rate,
+            "Value": value, "MRP": float(lines[mrp_idx].replace(',', '')) if mrp_idx < manufacturer_idx else 0.0,
+        }, manufacturer_idx
+
+    i = 0
+    while i < n:
+        line = lines[i]
+        if line == "Customer" and i > 0: current_customer = lines[i-1]; i += 1; continue
+        if line == "Area" and i > 0: current_area = lines[i-1]; i += 1; continue
+        if line == "Cus. Total": i += 2; continue
+        is_start_of_record = i + 1 < n and is_date[i + 1] and "Customer" not in line and "Area" not in line
+        parsed = read_record(i) if is_start_of_record else None
+        if parsed is None: i += 1; continue
+        record, i = parsed
+        records.append(record)
+        if len(records) >= batch_size:
+            yield records
+            records = []
+    if records:
+        yield records
 
-def parse_csv_sales_report(file_path):
-    # ... (Your existing CSV parser code is unchanged) ...
+def parse_pdf_sales_report(source):
+    return _collect(iter_pdf_sales_report(source), "PDF")
+
+def iter_csv_sales_report(source, batch_size=DEFAULT_BATCH_SIZE):
+    """Yields a CSV export as DataFrames of batch_size rows, read incrementally by pandas."""
+    rename_map = {
+        'Customer': 'CustomerName', 'Bill': 'BillNo', 'TransactionDate': 'Date',
+        'Product': 'ItemName', 'Batch': 'BatchNo', 'ExpiryDate': 'Expiry',
+        'Rate': 'PTR', 'SaleQty': 'Quantity', 'FreeQty': 'FREE',
+        'Amount': 'Value', 'Territory': 'Region'
+    }
+    print("CSV Format identified. Starting parse...")
+    with pd.read_csv(_binary(_read_source(source)), chunksize=batch_size) as reader:
+        for chunk in reader:
+            yield chunk.rename(columns=rename_map)
+
+def parse_csv_sales_report(source):
     try:
-        df = pd.read_csv(file_path)
-        print("CSV Format identified. Starting parse...")
-        rename_map = {
-            'Customer': 'CustomerName', 'Bill': 'BillNo', 'TransactionDate': 'Date',
-            'Product': 'ItemName', 'Batch': 'BatchNo', 'ExpiryDate': 'Expiry',
-            'Rate': 'PTR', 'SaleQty': 'Quantity', 'FreeQty': 'FREE',
-            'Amount': 'Value', 'Territory': 'Region'
-        }
-        df.rename(columns=rename_map, inplace=True)
-        return df.to_dict('records')
+        return [record for batch in iter_csv_sales_report(source) for record in batch.to_dict('records')]
     except Exception as e:
         print(f"Could not read or parse CSV file: {e}")
         return None
 
-def parse_excel_sales_report_format1(file_path):
-    # ... (Your existing Excel format 1 parser code is unchanged) ...
-    try: df_raw = pd.read_excel(file_path, header=None)
-    except Exception as e: print(f"Could not read excel file: {e}"); return None
-    expected_identifiers = ["bill no", "product name"]
-    header_row_index = -1
-    header_row_values = []
-    for i, row in df_raw.iterrows():
-        if not row.isnull().all():
-            row_values = [str(v).lower().strip() for v in row.values if pd.notna(v)]
-            if all(identifier in row_values for identifier in expected_identifiers):
-                header_row_index, header_row_values = i, row.values
-                break
-    if header_row_index == -1: return None
+def read_excel_sheet(source):
+    """
+    Decodes the first worksheet once, without a header row. pandas reads .xlsx
+    through openpyxl in read-only (streaming) mode. The result is shared by
+    format detection and the format parsers.
+    """
+    return pd.read_excel(_binary(_read_source(source)), header=None)
+
+
+def _with_header_row(df_raw, header_row_index):
+    """
+    What ``pd.read_excel(header=header_row_index)`` returns, built from the
+    already loaded sheet: that row becomes the (mangled) column names.
+    """
+    names, seen = [], {}
+    for idx, value in enumerate(df_raw.iloc[header_row_index].tolist()):
+        name = f"Unnamed: {idx}" if pd.isna(value) else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    df = df_raw.iloc[header_row_index + 1:].reset_index(drop=True)
+    df.columns = names
+    return df.infer_objects()
+
+
+# Cell types read_excel produces for numbers and dates. Cells of these types
+# are converted a whole column at a time; any other cell (text, blanks, NaN)
+# goes through the per-cell conversion.
+_NUMBER_TYPES = [int, float, np.int64, np.float64]
+_DATETIME_TYPES = [datetime, pd.Timestamp]
+
+
+def _cells_of_type(cells, types):
+    return pd.Series(cells, dtype=object).map(type).isin(types).to_numpy()
+
+
+def _exact_numbers(cells):
+    """
+    Mask of the int/float cells (bool excluded) that are finite and below
+    2**53, on which float() and int(float()) agree with numpy's casts.
+    """
+    mask = _cells_of_type(cells, _NUMBER_TYPES)
+    mask[mask] = np.abs(cells[mask].astype(float)) < 2 ** 53
+    return mask
+
+
+def _convert_cells(cells, convert, columnwise=None, select=_exact_numbers):
+    """
+    Applies ``convert`` to every cell of the object array ``cells``. Returns
+    the converted values (an object array) and, per cell, the
+    ValueError/TypeError it raised (or None). The cells picked by ``select``,
+    normally the bulk of the column, are converted at once by
+    ``columnwise``, which must agree with ``convert`` on them.
+    """
+    values = np.full(len(cells), None, dtype=object)
+    errors = np.full(len(cells), None, dtype=object)
+    if columnwise is None:
+        rest = np.arange(len(cells))
+    else:
+        fast = select(cells)
+        try:
+            values[fast] = np.asarray(columnwise(cells[fast]), dtype=object)
+        except (ValueError, TypeError, OverflowError):
+            # e.g. a date outside the datetime64[ns] range; convert one by one instead.
+            fast[:] = False
+        rest = (~fast).nonzero()[0]
+    for pos in rest:
+        try:
+            values[pos] = convert(cells[pos])
+        except (ValueError, TypeError) as e:
+            errors[pos] = e
+    return values, errors
+
+
+def _to_timestamp(cells):
+    """pd.to_datetime on every cell: date cells column-wise, others once per distinct value."""
+    cache = {}
+
+    def convert(cell):
+        key = (type(cell), cell)
+        if key not in cache:
+            try: cache[key] = (pd.to_datetime(cell), None)
+            except (ValueError, TypeError) as e: cache[key] = (None, e)
+        value, error = cache[key]
+        if error is not None: raise error
+        return value
+
+    return _convert_cells(
+        cells, convert, lambda dates: pd.to_datetime(dates).astype(object),
+        lambda cells: _cells_of_type(cells, _DATETIME_TYPES),
+    )
+
+
+def _find_header_row(df_raw, identifiers, rows=64):
+    """
+    Index of the first row with a cell equal to each of ``identifiers`` once
+    stripped and lower-cased, or None. Compared a block of rows at a time, from
+    the top, since the header is normally among the first few rows.
+    """
+    start = 0
+    while start < len(df_raw):
+        block = df_raw.iloc[start:start + rows]
+        cells = block.apply(lambda col: col.map(str).str.lower().str.strip()).where(block.notna())
+        found = np.logical_and.reduce([(cells == identifier).any(axis=1).to_numpy() for identifier in identifiers])
+        if found.any():
+            return block.index[found.argmax()]
+        start, rows = start + rows, rows * 2
+    return None
+
+
+def _free_quantity(cell):
+    return int(float(cell)) if pd.notna(cell) and str(cell).strip() else 0
+
+
+def parse_excel_sales_report_format1(source, df_raw=None):
+    """
+    Parses the grouped layout: a customer line, then 'Company - <name>' lines
+    and numbered item rows, closed by a 'Sub Total' row. Rows are classified
+    column-wise and customer / manufacturer are forward-filled onto the item rows.
+    """
+    if df_raw is None:
+        try: df_raw = read_excel_sheet(source)
+        except Exception as e: print(f"Could not read excel file: {e}"); return None
+    header_row_index = _find_header_row(df_raw, ["bill no", "product name"])
+    if header_row_index is None: return None
+    header_row_values = df_raw.loc[header_row_index].values
     header_map = {str(h).strip().lower().replace(' ', '').replace('.', ''): idx for idx, h in enumerate(header_row_values) if pd.notna(h)}
     try:
         bill_no_idx, date_idx, item_name_idx = header_map['billno'], header_map['date'], header_map['productname']
         ptr_idx, qty_idx, value_idx = header_map['selrate'], header_map['qty'], header_map['amount']
         free_qty_idx = header_map.get('freeqty')
     except KeyError as e: print(f"Critical Error: Missing essential column in Excel header - {e}. Cannot parse file."); return None
-    initial_data, current_customer, current_manufacturer = [], "Unknown", "Unknown"
-    for i, row in df_raw.iloc[header_row_index + 1:].iterrows():
-        if row.isnull().all(): continue
-        first_cell, product_cell = str(row.iloc[0]).strip(), str(row.iloc[item_name_idx]).strip() if pd.notna(row.iloc[item_name_idx]) else ""
-        if product_cell.startswith("Company -"): current_manufacturer = product_cell.replace("Company -", "").strip()
-        elif first_cell.lower() == 'sub total': continue
-        elif re.match(r'^\d+(\.\d+)?$', first_cell):
-            try:
-                free_qty = int(float(row.iloc[free_qty_idx])) if free_qty_idx is not None and pd.notna(row.iloc[free_qty_idx]) and str(row.iloc[free_qty_idx]).strip() else 0
-                initial_data.append({
-                    "CustomerName": current_customer, "Manufacturer": current_manufacturer, "BillNo": str(row.iloc[bill_no_idx]).strip(), 
-                    "Date": pd.to_datetime(row.iloc[date_idx]), "ItemName": str(row.iloc[item_name_idx]).strip(), "PTR": float(row.iloc[ptr_idx]),
-                    "Quantity": int(float(row.iloc[qty_idx])), "FREE": free_qty, "Value": float(row.iloc[value_idx]), "Region": "Trivandrum"
-                })
-            except (ValueError, IndexError, TypeError) as e: print(f"Skipping malformed Excel row {i+1}: {e}")
-        else:
-            non_empty_cells = [str(c).strip() for c in row if pd.notna(c) and str(c).strip() != '']
-            if non_empty_cells: current_customer = ' '.join(non_empty_cells).replace('-', '').strip()
-    if not initial_data: return None
-    df_extracted = pd.DataFrame(initial_data)
+
+    body = df_raw.iloc[header_row_index + 1:]
+    # The same cell objects iterrows() would hand out, one object column per sheet column.
+    cells = body.values
+    not_null = pd.notna(cells)
+    column = lambda idx: pd.Series(cells[:, idx], index=body.index, dtype=object)
+    first_cell = column(0).map(str).str.strip()
+    product = column(item_name_idx)
+    product_cell = product.map(str).str.strip().where(not_null[:, item_name_idx], "")
+
+    # Row kinds, in the order the layout is checked.
+    is_blank = ~not_null.any(axis=1)
+    is_company = ~is_blank & product_cell.str.startswith("Company -")
+    is_sub_total = ~is_blank & ~is_company & (first_cell.str.lower() == 'sub total')
+    is_item = ~is_blank & ~is_company & ~is_sub_total & first_cell.str.match(r'^\d+(\.\d+)?$')
+    is_customer = ~is_blank & ~is_company & ~is_sub_total & ~is_item
+
+    manufacturer = product_cell.str.replace("Company -", "", regex=False).str.strip().where(is_company)
+    # A customer line is the row's non-empty cells joined, without dashes.
+    customer_cells = pd.DataFrame(cells[is_customer.to_numpy()], index=body.index[is_customer], dtype=object)
+    customer_text = customer_cells.apply(lambda col: col.map(str).str.strip()).where(customer_cells.notna(), '')
+    customer_words = customer_text.where(customer_text != '').stack()
+    customer = customer_words.groupby(level=0).agg(' '.join).str.replace('-', '').str.strip().reindex(body.index)
+    # An all-NaN object column becomes float first, or ffill would downcast it (deprecated in pandas).
+    manufacturer = manufacturer.infer_objects(copy=False).ffill().fillna("Unknown")[is_item]
+    customer = customer.infer_objects(copy=False).ffill().fillna("Unknown")[is_item]
+
+    items = body.index[is_item]
+    item_rows = cells[is_item.to_numpy()]
+    item_cells = lambda idx: item_rows[:, idx]
+    if free_qty_idx is not None:
+        free, free_errors = _convert_cells(item_cells(free_qty_idx), _free_quantity, lambda c: c.astype(float).astype(np.int64))
+    else:
+        free, free_errors = np.zeros(len(items), dtype=np.int64), np.full(len(items), None, dtype=object)
+    dates, date_errors = _to_timestamp(item_cells(date_idx))
+    ptr, ptr_errors = _convert_cells(item_cells(ptr_idx), float, lambda c: c.astype(float))
+    qty, qty_errors = _convert_cells(item_cells(qty_idx), lambda c: int(float(c)), lambda c: c.astype(float).astype(np.int64))
+    value, value_errors = _convert_cells(item_cells(value_idx), float, lambda c: c.astype(float))
+    # The first error of a row, in the order the row-wise parser converted its cells.
+    errors = np.stack([free_errors, date_errors, ptr_errors, qty_errors, value_errors], axis=1)
+    has_error = pd.notna(errors)
+    keep = ~has_error.any(axis=1)
+    for pos in (~keep).nonzero()[0]:
+        print(f"Skipping malformed Excel row {items[pos]+1}: {errors[pos, has_error[pos].argmax()]}")
+    if not keep.any(): return None
+    # tolist() so the columns get the dtypes a DataFrame infers from plain lists.
+    pick = lambda values: np.asarray(values, dtype=object)[keep].tolist()
+    text = lambda idx: pd.Series(item_cells(idx)[keep], dtype=object).map(str).str.strip().tolist()
+    df_extracted = pd.DataFrame({
+        "CustomerName": pick(customer), "Manufacturer": pick(manufacturer),
+        "BillNo": text(bill_no_idx), "Date": pick(dates),
+        "ItemName": text(item_name_idx), "PTR": pick(ptr),
+        "Quantity": pick(qty), "FREE": pick(free), "Value": pick(value), "Region": "Trivandrum",
+    })
     agg_keys = ['CustomerName', 'BillNo', 'Date', 'ItemName', 'PTR', 'Region', 'Manufacturer']
     df_aggregated = df_extracted.groupby(agg_keys).agg({'Quantity': 'sum', 'FREE': 'sum', 'Value': 'sum'}).reset_index()
-    df_aggregated['Date'] = df_aggregated['Date'].dt.strftime('%d-%m-%Y')
+    # Formatted once per distinct date.
+    codes, distinct_dates = pd.factorize(df_aggregated['Date'])
+    df_aggregated['Date'] = np.asarray(distinct_dates.strftime('%d-%m-%Y'), dtype=object)[codes]
     return df_aggregated.to_dict('records')
 
-def parse_excel_sales_report_format2(file_path):
-    # ... (Your existing Excel format 2 parser code is unchanged) ...
-    try:
-        df = pd.read_excel(file_path, header=0)
-    except Exception as e:
-        print(f"Could not read excel file (Format 2): {e}")
-        return None
+def parse_excel_sales_report_format2(source, df_raw=None):
+    if df_raw is None:
+        try:
+            df_raw = read_excel_sheet(source)
+        except Exception as e:
+            print(f"Could not read excel file (Format 2): {e}")
+            return None
+    df = _with_header_row(df_raw, 0)
     rename_map = {
         'date': 'Date', 'name of party': 'CustomerName', 'invoice no.': 'BillNo',
         'product': 'ItemName', 'pack': 'Pack_Size', 'batch': 'BatchNo', 'expiry': 'Expiry',
@@ -193,34 +885,24 @@ def parse_excel_sales_report_format2(file_path):
 # ==============================================================================
 # --- CORRECTED --- EXCEL PARSER (FORMAT 3)
 # ==============================================================================
-def parse_excel_sales_report_format3(file_path):
+def parse_excel_sales_report_format3(source, df_raw=None):
     """
     Parses an Excel format that has multiple header lines before the actual data.
     It dynamically finds the header row containing 'Sl.No', 'Date', 'Customer', etc.
     """
-    try:
-        df_raw = pd.read_excel(file_path, header=None)
-    except Exception as e:
-        print(f"Could not read excel file (Format 3 Raw): {e}")
-        return None
+    if df_raw is None:
+        try:
+            df_raw = read_excel_sheet(source)
+        except Exception as e:
+            print(f"Could not read excel file (Format 3 Raw): {e}")
+            return None
 
-    header_row_index = -1
-    expected_headers = ['sl.no', 'date', 'customer', 'route', 'product name']
-    for i, row in df_raw.iterrows():
-        row_values = [str(v).lower().strip() for v in row if pd.notna(v)]
-        if all(h in row_values for h in expected_headers):
-            header_row_index = i
-            break
-            
-    if header_row_index == -1:
+    header_row_index = _find_header_row(df_raw, ['sl.no', 'date', 'customer', 'route', 'product name'])
+    if header_row_index is None:
         print("Could not find the header row in Excel Format 3. Parsing aborted.")
         return None
 
-    try:
-        df = pd.read_excel(file_path, header=header_row_index)
-    except Exception as e:
-        print(f"Error reading Excel file with dynamic header at row {header_row_index}: {e}")
-        return None
+    df = _with_header_row(df_raw, header_row_index)
 
     # --- THIS IS THE CORRECTED PART ---
     # The keys here MUST match the column names AFTER normalization.
@@ -258,103 +940,121 @@ def parse_excel_sales_report_format3(file_path):
 
 
 # ==============================================================================
-# FINAL, UNIFIED BRIDGE FUNCTION (Unchanged)
+# FINAL, UNIFIED BRIDGE FUNCTIONS
 # ==============================================================================
-def parse_sales_file(file_path):
+def detect_excel_format(source, df_raw=None):
+    """Returns 1, 2 or 3 for the known Excel layouts, or None."""
+    if df_raw is None:
+        df_peek = pd.read_excel(_binary(_read_source(source)), header=None, nrows=20)
+    else:
+        df_peek = df_raw.head(20)
+
+    def normalize_header(header_str):
+        return str(header_str).lower().replace(' ', '').replace('.', '')
+
+    format1_identifiers = ["billno", "productname"]
+    format2_identifiers = ["nameofparty", "invoiceno"]
+    format3_identifiers = ["route", "sqty"]
+
+    for i, row in df_peek.iterrows():
+        row_values_normalized = [normalize_header(v) for v in row.values if pd.notna(v)]
+
+        if all(id_val in row_values_normalized for id_val in format1_identifiers):
+            return 1
+        if all(id_val in row_values_normalized for id_val in format2_identifiers):
+            return 2
+        if all(id_val in row_values_normalized for id_val in format3_identifiers):
+            return 3
+    return None
+
+
+def _extension(source, extension):
+    if extension is None:
+        if not isinstance(source, (str, os.PathLike)):
+            raise ValueError("The file extension is required to parse in-memory input.")
+        extension = os.path.splitext(source)[1]
+    return extension.lower()
+
+
+def iter_raw_batches(source, batch_size=DEFAULT_BATCH_SIZE, extension=None):
     """
-    Bridge function: Detects file type, calls the correct parser, and standardizes output.
-    Includes auto-detection for different Excel formats with robust header normalization.
+    Detects the file type and yields batches of raw parser records (lists of
+    dicts, or DataFrames for TXT and CSV, keyed by the parser's own column names). Yields nothing for
+    unsupported or unrecognised files; parse errors propagate to the caller.
+    ``source`` is a path, bytes or a binary file object; ``extension`` (e.g.
+    '.txt') is taken from the path when not given and is required otherwise.
     """
-    file_extension = os.path.splitext(file_path)[1].lower()
-    raw_data = None
-    print(f"Processing file: {file_path} (Type: {file_extension})")
+    file_extension = _extension(source, extension)
+    source = _read_source(source)
 
     if file_extension == '.txt':
-        raw_data = parse_txt_sales_report(file_path)
+        yield from iter_txt_sales_columns(source, batch_size)
     elif file_extension == '.pdf':
-        raw_data = parse_pdf_sales_report(file_path)
+        yield from iter_pdf_sales_report(source, batch_size)
     elif file_extension == '.csv':
-        raw_data = parse_csv_sales_report(file_path)
-    
-    elif file_extension in ['.xlsx', '.xls']:
-        try:
-            df_peek = pd.read_excel(file_path, header=None, nrows=20)
-            
-            def normalize_header(header_str):
-                return str(header_str).lower().replace(' ', '').replace('.', '')
+        yield from iter_csv_sales_report(source, batch_size)
 
-            format1_identifiers = ["billno", "productname"]
-            format2_identifiers = ["nameofparty", "invoiceno"]
-            format3_identifiers = ["route", "sqty"]
-            
-            detected_format = None
-            for i, row in df_peek.iterrows():
-                row_values_normalized = [normalize_header(v) for v in row.values if pd.notna(v)]
-                
-                if all(id_val in row_values_normalized for id_val in format1_identifiers):
-                    detected_format = 1
-                    break
-                if all(id_val in row_values_normalized for id_val in format2_identifiers):
-                    detected_format = 2
-                    break
-                if all(id_val in row_values_normalized for id_val in format3_identifiers):
-                    detected_format = 3
-                    break
-            
-            if detected_format == 1:
-                print("Excel format 1 detected (complex layout).")
-                raw_data = parse_excel_sales_report_format1(file_path)
-            elif detected_format == 2:
-                print("Excel format 2 detected (standard table with 'name of party').")
-                raw_data = parse_excel_sales_report_format2(file_path)
-            elif detected_format == 3:
-                print("Excel format 3 detected (dynamic header with 'route').")
-                raw_data = parse_excel_sales_report_format3(file_path)
-            else:
-                print("Could not determine Excel file format. No matching parser found.")
-                return pd.DataFrame()
+    elif file_extension in ['.xlsx', '.xls']:
+        # The Excel layouts need the whole sheet (format 1 aggregates across
+        # rows), so they are parsed in one go and handed on in batches. The
+        # workbook is decoded once and shared by detection and the parser.
+        df_raw = read_excel_sheet(source)
+        detected_format = detect_excel_format(source, df_raw)
+        if detected_format == 1:
+            print("Excel format 1 detected (complex layout).")
+            raw_data = parse_excel_sales_report_format1(source, df_raw)
+        elif detected_format == 2:
+            print("Excel format 2 detected (standard table with 'name of party').")
+            raw_data = parse_excel_sales_report_format2(source, df_raw)
+        elif detected_format == 3:
+            print("Excel format 3 detected (dynamic header with 'route').")
+            raw_data = parse_excel_sales_report_format3(source, df_raw)
+        else:
+            print("Could not determine Excel file format. No matching parser found.")
+            return
+        if raw_data:
+            yield from _chunked(raw_data, batch_size)
 
-        except Exception as e:
-            # This catch-all is what printed the misleading error message.
-            print(f"An error occurred during parsing: {e}")
-            return pd.DataFrame()
-            
     else:
         print(f"No parser available for unsupported file type: {file_extension}. It will be stored only.")
+
+
+def standardize_records(raw_data):
+    """Turns raw parser records into a typed batch (see schema.py) with exactly the SalesTransaction columns."""
+    return schema.to_batch(raw_data)
+
+
+def iter_sales_file(source, batch_size=DEFAULT_BATCH_SIZE, extension=None):
+    """
+    Streaming counterpart of parse_sales_file: yields typed batches (see
+    schema.py) of at most batch_size rows. Parse errors propagate to the caller.
+    """
+    file_extension = _extension(source, extension)
+    source = _read_source(source)
+    print(f"Processing file: {_describe(source)} (Type: {file_extension})")
+    for raw_batch in iter_raw_batches(source, batch_size, file_extension):
+        df = standardize_records(raw_batch)
+        if not df.empty:
+            yield df
+
+
+def parse_sales_file(source, extension=None):
+    """
+    Bridge function: Detects file type, calls the correct parser, and standardizes output.
+    Includes auto-detection for different Excel formats with robust header normalization.
+    Takes the same input as iter_raw_batches.
+    """
+    try:
+        source = _read_source(source)
+        batches = list(iter_sales_file(source, extension=extension))
+    except Exception as e:
+        print(f"An error occurred during parsing: {e}")
         return pd.DataFrame()
 
-    if not raw_data:
+    if not batches:
         print("Parsing returned no data.")
         return pd.DataFrame()
 
-    df = pd.DataFrame(raw_data)
-    if df.empty:
-        return df
-
-    df['Date'] = pd.to_datetime(df['Date'], errors='coerce', dayfirst=True)
-    df.dropna(subset=['Date'], inplace=True)
-
-    column_rename_map = {
-        'CustomerName': 'customer_name', 'BillNo': 'bill_no', 'Date': 'date', 'ItemName': 'item_name',
-        'BatchNo': 'batch_no', 'Expiry': 'expiry', 'PTR': 'ptr', 'Value': 'value',
-        'NFREE': 'quantity', 'Region': 'area', 'Quantity': 'quantity', 'FREE': 'free_quantity', 
-        'Area': 'area', 'Distributor': 'distributor', 'Manufacturer': 'manufacturer', 
-        'Pack_Size': 'pack_size', 'MRP': 'mrp',
-    }
-    df.rename(columns=column_rename_map, inplace=True)
-
-    model_columns = [
-        'customer_name', 'item_name', 'date', 'bill_no', 'quantity', 'free_quantity', 'ptr', 'value',
-        'batch_no', 'expiry', 'area', 'distributor', 'manufacturer', 'pack_size', 'mrp',
-        'product_discount_percent', 'discount_amount', 'customer_discount_percent'
-    ]
-    for col in model_columns:
-        if col not in df.columns:
-            if any(s in col for s in ['quantity', 'percent', 'amount', 'ptr', 'mrp', 'value']):
-                df[col] = 0
-            else:
-                df[col] = None
-
-    df = df[model_columns]
-    print(f"Successfully parsed and standardized {len(df)} records from {os.path.basename(file_path)}.")
-    return df
\ No newline at end of file
+    df = schema.concat_batches(batches)
+    print(f"Successfully parsed and standardized {len(df)} records from {os.path.basename(_describe(source))}.")
+    return df
@@ -0,0 +1,118 @@
+# shirr_data/upload_handlers.py
+"""
+Upload handlers: one that hashes files while they are written to disk, and
+one that keeps analyze-session uploads in memory.
+
+Each chunk is added to a SHA-256 digest and written to a partial file under
+``uploads/incoming/`` as it arrives. When the file is complete it is renamed
+(no copy) to its content-addressed name ``uploads/<sha256><ext>``, so the
+upload view can check for duplicates, create the DataFile and parse the file
+without reading it again.
+"""
+import hashlib
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, MemoryFileUploadHandler
+
+UPLOAD_DIR = 'uploads'
+INCOMING_DIR = os.path.join(UPLOAD_DIR, 'incoming')
+
+
+def content_addressed_name(file_hash, original_name):
+    extension = os.path.splitext(original_name)[1].lower()
+    return os.path.join(UPLOAD_DIR, f"{file_hash}{extension}")
+
+
+class HashedUploadedFile(UploadedFile):
+    """
+    An upload already stored under its content-addressed name, with its
+    SHA-256. ``created`` is False when another upload had stored the same
+    bytes first, so the stored copy is not this upload's to delete.
+    """
+
+    def __init__(self, stored_name, sha256, name, content_type, size, charset, content_type_extra=None, created=True):
+        self.stored_name = stored_name
+        self.sha256 = sha256
+        self.created = created
+        file = open(default_storage.path(stored_name), 'rb')
+        super().__init__(file, name, content_type, size, charset, content_type_extra)
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+class HashingFileUploadHandler(FileUploadHandler):
+    """
+    Streams every uploaded file to storage while hashing it. Install it per view
+    (``request.upload_handlers = [HashingFileUploadHandler(request)]``) before
+    request.POST or request.FILES is accessed.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.partial_path = default_storage.path(os.path.join(INCOMING_DIR, f"{uuid.uuid4().hex}.part"))
+        os.makedirs(os.path.dirname(self.partial_path), exist_ok=True)
+        self.partial_file = open(self.partial_path, 'wb')
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        self.partial_file.write(raw_data)
+        self.size += len(raw_data)
+        # Returning None stops later handlers from getting the chunk.
+        return None
+
+    def file_complete(self, file_size):
+        self.partial_file.close()
+        file_hash = self.sha256.hexdigest()
+        stored_name = content_addressed_name(file_hash, self.file_name)
+        final_path = default_storage.path(stored_name)
+        created = not os.path.exists(final_path)
+        if created:
+            os.replace(self.partial_path, final_path)
+        else:
+            # Same bytes already on disk (e.g. after clear-data, or a concurrent
+            # upload not yet in DataFile); keep that copy.
+            os.remove(self.partial_path)
+        return HashedUploadedFile(
+            stored_name, file_hash, self.file_name, self.content_type, self.size,
+            self.charset, self.content_type_extra, created=created,
+        )
+
+    def upload_interrupted(self):
+        if hasattr(self, 'partial_file'):
+            self.partial_file.close()
+            if os.path.exists(self.partial_path):
+                os.remove(self.partial_path)
+
+
+class AnalysisMemoryUploadHandler(MemoryFileUploadHandler):
+    """
+    Keeps the files of requests up to ``settings.SHIRR_ANALYZE_MEMORY_BYTES``
+    in memory, so they can be parsed without touching disk. Bigger requests go
+    to the next handler (a TemporaryFileUploadHandler), which spills them to
+    a temp file.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.activated = content_length <= settings.SHIRR_ANALYZE_MEMORY_BYTES
+
+
+def discard_duplicate(uploaded_file):
+    """
+    Removes the stored copy of an upload that is not kept (a duplicate or a
+    rejected request), if this upload created it and no DataFile points at
+    it. A copy the upload found already on disk may belong to a concurrent
+    upload whose DataFile is not created yet.
+    """
+    from .models import DataFile
+    stored_name = getattr(uploaded_file, 'stored_name', None)
+    if not stored_name or not uploaded_file.created:
+        return
+    if not DataFile.objects.filter(file=stored_name).exists():
+        default_storage.delete(stored_name)
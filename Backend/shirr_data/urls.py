@@ -4,6 +4,12 @@ from . import views
 urlpatterns = [
     # This is for the main data upload and persistence
     path('api/upload/', views.api_unified_upload_view, name='api_unified_upload'),
+    # Status of an upload queued with async=1
+    path('api/upload/jobs/<int:job_id>/', views.ingest_job_status, name='api_ingest_job_status'),
+    # Uploaded files: row counts and parse times, delete or reprocess a single file
+    path('api/files/', views.data_files_view, name='api_data_files'),
+    path('api/files/<int:file_id>/', views.data_file_view, name='api_data_file'),
+    path('api/files/<int:file_id>/reprocess/', views.reprocess_data_file_view, name='api_reprocess_data_file'),
     
     # This is for the main dashboard (fetches all data)
     path('api/sales-data/', views.sales_data_api, name='api_sales_data'),
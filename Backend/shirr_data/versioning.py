@@ -0,0 +1,91 @@
+# shirr_data/versioning.py
+"""
+Data-generation counter and the dashboard response cache built on it.
+
+Every change to the stored sales data bumps the generation inside the same
+transaction, so a cached response (or a client-side ETag) for an older
+generation can never be served for newer data.
+"""
+from django.core.cache import caches
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DataGeneration
+
+GENERATION_ID = 1
+CACHE_ALIAS = 'dashboard'
+
+
+def current_generation():
+    generation = DataGeneration.objects.filter(pk=GENERATION_ID).values_list('generation', flat=True).first()
+    return generation or 0
+
+
+async def acurrent_generation():
+    """current_generation for async views."""
+    generation = await DataGeneration.objects.filter(pk=GENERATION_ID).values_list('generation', flat=True).afirst()
+    return generation or 0
+
+
+def bump_generation(rewritten=False):
+    """
+    Increments the generation. Call inside the transaction that changes the
+    data; ``rewritten`` when stored rows were changed in place, not only
+    added or deleted.
+    """
+    changes = {'generation': F('generation') + 1, 'updated_at': timezone.now()}
+    if rewritten:
+        # F() reads the value before the update, so this is the new generation.
+        changes['rewritten_generation'] = F('generation') + 1
+    updated = DataGeneration.objects.filter(pk=GENERATION_ID).update(**changes)
+    if not updated:
+        DataGeneration.objects.get_or_create(
+            pk=GENERATION_ID, defaults={'generation': 1, 'rewritten_generation': 1 if rewritten else 0}
+        )
+
+
+def rewritten_generation():
+    """The last generation that changed stored rows in place (0 if none did)."""
+    generation = DataGeneration.objects.filter(pk=GENERATION_ID).values_list('rewritten_generation', flat=True).first()
+    return generation or 0
+
+
+def request_generation(request):
+    """The generation seen by this request; read once so the ETag and the body always agree."""
+    if not hasattr(request, '_data_generation'):
+        request._data_generation = current_generation()
+    return request._data_generation
+
+
+async def arequest_generation(request):
+    """request_generation for async views."""
+    if not hasattr(request, '_data_generation'):
+        request._data_generation = await acurrent_generation()
+    return request._data_generation
+
+
+def cached_response_body(key, generation, build):
+    """
+    Returns the cached body for ``key`` at ``generation``, calling ``build()``
+    (which must return bytes, or a picklable value such as a (bytes, encoding)
+    pair) on a miss. Old generations are never read again
+    and fall out of the size-bounded cache on their own.
+    """
+    cache = caches[CACHE_ALIAS]
+    cache_key = f"{key}:{generation}"
+    body = cache.get(cache_key)
+    if body is None:
+        body = build()
+        cache.set(cache_key, body)
+    return body
+
+
+async def acached_response_body(key, generation, build):
+    """cached_response_body for async views; ``build`` is awaited, and only on a miss."""
+    cache = caches[CACHE_ALIAS]
+    cache_key = f"{key}:{generation}"
+    body = await cache.aget(cache_key)
+    if body is None:
+        body = await build()
+        await cache.aset(cache_key, body)
+    return body
@@ -0,0 +1,91 @@
+# shirr_data/widgets.py
+"""
+Registry of the dashboard widgets.
+
+The widget methods of SalesAggregates (aggregations.py) and FrameAggregates
+(analytics.py) are marked with ``@widget(key, needs=...)``. ``key`` is the
+widget's key in the JSON response. ``needs`` lists the shared intermediates
+(cached properties of the instance) the method reads. ``compute`` runs only
+the selected widgets. Each intermediate is computed at most once per
+aggregates instance, i.e. per request, however many selected widgets need it.
+
+Clients select widgets with ``?widgets=kpiMetrics,revenueByArea``. Without a
+selection, every widget is returned, as before. ``totalRecords`` is always
+included.
+"""
+import hashlib
+
+# Response keys in their response order.
+WIDGET_KEYS = [
+    'totalRecords', 'kpiMetrics', 'salesReport', 'revenueByArea', 'salesTrendsByArea', 'topMedicinesByArea',
+    'growingMedicines', 'prescriberAnalysis', 'highFreeQuantity', 'weeklyGrowthTrends', 'areaPerformance',
+]
+ALWAYS_INCLUDED = {'totalRecords'}
+
+
+def widget(key, needs=()):
+    """Marks an aggregates method as the widget ``key``, computed from the intermediates in ``needs``."""
+    if key not in WIDGET_KEYS:
+        raise ValueError(f"Unknown widget key '{key}'.")
+
+    def register(method):
+        method.widget_key = key
+        method.widget_needs = tuple(needs)
+        return method
+    return register
+
+
+def _registry(cls):
+    """Widget key -> method of an aggregates class, collected once per class."""
+    if '_widget_methods' not in cls.__dict__:
+        cls._widget_methods = {
+            member.widget_key: member
+            for klass in reversed(cls.__mro__) for member in vars(klass).values()
+            if hasattr(member, 'widget_key')
+        }
+    return cls._widget_methods
+
+
+def parse_selection(value):
+    """
+    The widget keys named in a ``widgets=`` value (comma separated), or None
+    for all of them. Raises ValueError on unknown keys.
+    """
+    names = [name.strip() for name in (value or '').split(',') if name.strip()]
+    if not names:
+        return None
+    unknown = [name for name in names if name not in WIDGET_KEYS]
+    if unknown:
+        raise ValueError(f"Unknown widget(s): {', '.join(unknown)}. Available: {', '.join(WIDGET_KEYS)}.")
+    return frozenset(names) | ALWAYS_INCLUDED
+
+
+def selection_key(selected):
+    """Short stable key of a selection for cache keys and ETags; '' for all widgets."""
+    if selected is None:
+        return ''
+    return hashlib.sha1(','.join(sorted(selected)).encode()).hexdigest()[:12]
+
+
+def select(data, selected):
+    """The entries of an already built response dict for the selected widgets."""
+    if selected is None:
+        return data
+    return {key: value for key, value in data.items() if key in selected}
+
+
+def compute(aggregates, selected=None):
+    """The selected widgets (all when ``selected`` is None) computed from an aggregates instance."""
+    methods = _registry(type(aggregates))
+    data = {}
+    for key in WIDGET_KEYS:
+        if selected is not None and key not in selected:
+            continue
+        if key == 'totalRecords':
+            data[key] = aggregates.record_count
+            continue
+        method = methods[key]
+        for intermediate in method.widget_needs:
+            getattr(aggregates, intermediate)  # cached on the instance, shared with later widgets
+        data[key] = method(aggregates)
+    return data
@@ -0,0 +1,189 @@
+# shirr_data/wire.py
+"""
+Wire formats and content encodings of the dashboard JSON.
+
+``?format=compact`` (opt-in; the default stays the plain ``JsonResponse``
+body) sends every label once. Labels (areas, items, customers, week and
+month names, day numbers) are collected in a shared ``dictionary`` list.
+Widgets refer to them by index, and per-area maps and lists of records
+become columnar arrays:
+
+    revenueByArea       {name: [label], revenue: [value]}
+    salesTrendsByArea   {labels: [week label], areas: [label], data: [[value per week] per area]}
+    topMedicinesByArea  {areas: [label], labels: [[item label] per area], data: [[value] per area]}
+    salesReport, growingMedicines, prescriberAnalysis, highFreeQuantity,
+    weeklyGrowthTrends  same shape, with ``labels`` as indexes
+    areaPerformance     same shape, with ``name`` as indexes
+
+The compact body is serialized with orjson when it is installed. Bodies of
+either format are compressed with Brotli or gzip, whichever the client
+accepts (Brotli preferred).
+"""
+import gzip
+import json
+
+import numpy as np
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FORMATS = ['json', 'compact']
+# Smaller bodies are sent as they are; the encoding overhead is not worth it.
+MIN_COMPRESS_BYTES = 1024
+# Brotli 5 compresses about as fast as gzip 6 and noticeably smaller.
+BROTLI_QUALITY = 5
+GZIP_LEVEL = 6
+
+
+def parse_format(value):
+    """The requested format ('json' when not given); raises ValueError for unknown ones."""
+    value = (value or 'json').strip().lower()
+    if value not in FORMATS:
+        raise ValueError(f"Unknown format '{value}'. Available: {', '.join(FORMATS)}.")
+    return value
+
+
+class _Dictionary:
+    """The shared label list of a compact response."""
+
+    def __init__(self):
+        self.labels = []
+        self._index = {}
+
+    def encode(self, labels):
+        indexes = []
+        for label in labels:
+            index = self._index.get(label)
+            if index is None:
+                index = self._index[label] = len(self.labels)
+                self.labels.append(label)
+            indexes.append(index)
+        return indexes
+
+
+def _encode_keys(chart, dictionary, keys=('labels',)):
+    return {key: dictionary.encode(value) if key in keys else value for key, value in chart.items()}
+
+
+def _sales_report(report, dictionary):
+    return {period: _encode_keys(chart, dictionary) for period, chart in report.items()}
+
+
+def _revenue_by_area(rows, dictionary):
+    return {'name': dictionary.encode([row['name'] for row in rows]), 'revenue': [row['revenue'] for row in rows]}
+
+
+def _sales_trends_by_area(trends, dictionary):
+    areas = list(trends)
+    # Every area is charted over the same weeks, so the labels are sent once.
+    return {
+        'labels': dictionary.encode(trends[areas[0]]['labels']),
+        'areas': dictionary.encode(areas),
+        'data': [trends[area]['data'] for area in areas],
+    }
+
+
+def _top_medicines_by_area(top, dictionary):
+    areas = list(top)
+    return {
+        'areas': dictionary.encode(areas),
+        'labels': [dictionary.encode(top[area]['labels']) for area in areas],
+        'data': [top[area]['data'] for area in areas],
+    }
+
+
+COMPACT_ENCODERS = {
+    'salesReport': _sales_report,
+    'revenueByArea': _revenue_by_area,
+    'salesTrendsByArea': _sales_trends_by_area,
+    'topMedicinesByArea': _top_medicines_by_area,
+    'growingMedicines': _encode_keys,
+    'prescriberAnalysis': _encode_keys,
+    'highFreeQuantity': _encode_keys,
+    'weeklyGrowthTrends': _encode_keys,
+    'areaPerformance': lambda stats, dictionary: _encode_keys(stats, dictionary, keys=('name',)),
+}
+
+
+def compact(data):
+    """The compact form of a dashboard dict (see the module docstring)."""
+    dictionary = _Dictionary()
+    encoded = {'format': 'compact'}
+    for key, value in data.items():
+        encoder = COMPACT_ENCODERS.get(key)
+        # Empty widgets ({}, [], None) are sent as they are.
+        encoded[key] = encoder(value, dictionary) if encoder and value else value
+    encoded['dictionary'] = dictionary.labels
+    return encoded
+
+
+def _default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(data):
+    """Compact JSON bytes, with orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+def render(data, fmt):
+    """The response body of a dashboard dict in the given format."""
+    if fmt == 'compact':
+        return dumps(compact(data))
+    return JsonResponse(data).content
+
+
+def negotiate_encoding(request):
+    """'br', 'gzip' or '' from the request's Accept-Encoding header."""
+    accepted = set()
+    for token in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = token.partition(';')
+        name, _, quality = params.strip().partition('=')
+        try:
+            refused = name.strip() == 'q' and float(quality) == 0
+        except ValueError:
+            refused = False
+        if not refused:
+            accepted.add(coding.strip().lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return ''
+
+
+def encode(body, encoding):
+    """``(body, encoding)`` with the body compressed, or left as is when small or not accepted."""
+    if not encoding or len(body) < MIN_COMPRESS_BYTES:
+        return body, ''
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY), 'br'
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), 'gzip'
+
+
+def encoded_response(body, encoding, status=200):
+    """A JSON response for a body returned by ``encode``."""
+    response = HttpResponse(body, content_type='application/json', status=status)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def dashboard_response(request, data, fmt):
+    """Renders and compresses a dashboard dict for this request (uncached)."""
+    return encoded_response(*encode(render(data, fmt), negotiate_encoding(request)))